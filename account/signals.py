@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from account.token_user import UserCache
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Make the next websocket connect of the user read its saved state, e.g. a deactivation."""
+    UserCache.invalidate(instance.pk)
@@ -0,0 +1,70 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.token_user import CachedTokenUser, UserCache
+from facebook_business_automation.middlewares.websocket.jwtauthenticationmiddleweare import JWTAuthMiddleware
+
+User = get_user_model()
+
+
+class WebsocketJWTAuthTests(TransactionTestCase):
+    """
+    Access token in the query string gives a CachedTokenUser
+
+    Repeated connects read the user from the cache, one query per user
+
+    Saving or deleting the user invalidates the cache (deactivation)
+
+    Missing, malformed and refresh tokens are anonymous
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="wsuser@example.com", password="TestPass123!")
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access = str(self.refresh.access_token)
+        self.middleware = JWTAuthMiddleware(app=None)
+
+    def authenticate(self, token=None):
+        query_string = f"token={token}".encode() if token else b""
+        return async_to_sync(self.middleware.authenticate)({"query_string": query_string})
+
+    def test_access_token_gives_cached_token_user(self):
+        loads = UserCache.loads
+        user = self.authenticate(self.access)
+
+        self.assertIsInstance(user, CachedTokenUser)
+        self.assertEqual((user.id, user.email, user.is_authenticated), (self.user.id, "wsuser@example.com", True))
+        self.assertEqual(self.authenticate(self.access).id, self.user.id)
+        self.assertEqual(UserCache.loads - loads, 1)
+
+    def test_concurrent_connects_share_one_query(self):
+        async def storm():
+            return await asyncio.gather(*(self.middleware.authenticate(
+                {"query_string": f"token={self.access}".encode()}
+            ) for _ in range(50)))
+
+        loads = UserCache.loads
+        users = async_to_sync(storm)()
+
+        self.assertEqual({user.id for user in users}, {self.user.id})
+        self.assertEqual(UserCache.loads - loads, 1)
+
+    def test_deactivation_applies_to_the_next_connect(self):
+        self.assertIsInstance(self.authenticate(self.access), CachedTokenUser)
+
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertIsInstance(self.authenticate(self.access), AnonymousUser)
+
+        self.user.delete()
+        self.assertIsInstance(self.authenticate(self.access), AnonymousUser)
+
+    def test_invalid_tokens_are_anonymous(self):
+        for token in (None, "not-a-token", str(self.refresh), self.access[:-2] + "xx"):
+            self.assertIsInstance(self.authenticate(token), AnonymousUser, token)
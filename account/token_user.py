@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import Token
+
+
+class UserCache:
+    """
+    Short-lived cache of the account fields needed to trust an access token
+    without a query: whether the user still exists and is active, and what
+    CachedTokenUser exposes.
+
+    Entries live in the default cache for ``WEBSOCKET_AUTH_CACHE_TTL``
+    seconds and are deleted when the user is saved or deleted
+    (account.signals). In production that cache is the shared Redis cache
+    (settings.CACHES), so a deactivation applies to the next connect on
+    every worker. With the per-process cache used under DEBUG, a save in
+    another process, like a queryset ``update()`` (which sends no
+    signals), takes effect only when the entry expires: at most
+    ``WEBSOCKET_AUTH_CACHE_TTL`` seconds later.
+    Concurrent misses for the same user in one process share one query.
+    """
+
+    KEY = 'auth_user:{}'
+    FIELDS = ('email', 'is_active', 'is_staff', 'is_superuser', 'role')
+
+    _loading: Dict[Any, asyncio.Future] = {}
+    loads = 0  # queries issued by this process, for benchmark_websocket_connects
+
+    @classmethod
+    async def get(cls, user_id) -> Optional[Dict[str, Any]]:
+        """The cached fields of user ``user_id``, or None when there is no such user."""
+        fields = await cache.aget(cls.KEY.format(user_id))
+        if fields is None:
+            key = (asyncio.get_running_loop(), user_id)
+            loading = cls._loading.get(key)
+            if loading is None:
+                loading = cls._loading[key] = asyncio.ensure_future(cls._load(user_id))
+                loading.add_done_callback(lambda _: cls._loading.pop(key, None))
+            # Shielded: one connect giving up must not cancel the others' query.
+            fields = await asyncio.shield(loading)
+        return fields or None
+
+    @classmethod
+    def invalidate(cls, user_id):
+        cache.delete(cls.KEY.format(user_id))
+
+    @classmethod
+    async def _load(cls, user_id) -> Dict[str, Any]:
+        fields = await database_sync_to_async(cls._query)(user_id)
+        # Unknown users are cached too ({}), so forged ids cannot bypass the cache.
+        await cache.aset(cls.KEY.format(user_id), fields, timeout=settings.WEBSOCKET_AUTH_CACHE_TTL)
+        return fields
+
+    @classmethod
+    def _query(cls, user_id) -> Dict[str, Any]:
+        cls.loads += 1
+        return get_user_model().objects.filter(pk=user_id).values(*cls.FIELDS).first() or {}
+
+
+class CachedTokenUser(TokenUser):
+    """
+    The user of a validated access token, with its account fields taken
+    from UserCache instead of the database. Like TokenUser it is not a
+    model instance: query by ``user_id=user.id``, not ``user=user``.
+    """
+
+    def __init__(self, token: Token, fields: Dict[str, Any]):
+        super().__init__(token)
+        self.fields = fields
+
+    @cached_property
+    def email(self) -> str:
+        return self.fields['email']
+
+    @cached_property
+    def role(self) -> str:
+        return self.fields['role']
+
+    @property
+    def is_active(self) -> bool:
+        return self.fields['is_active']
+
+    @cached_property
+    def is_staff(self) -> bool:
+        return self.fields['is_staff']
+
+    @cached_property
+    def is_superuser(self) -> bool:
+        return self.fields['is_superuser']
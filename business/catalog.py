@@ -0,0 +1,226 @@
+"""
+Per-process, array-backed snapshots of a tenant's product catalog.
+
+Most shops have a few hundred products that change far less often than they
+are searched, so the agent tools and the product API can answer filters from
+numpy columns instead of a round trip to Postgres. A snapshot is rebuilt when
+the tenant's catalog version changes; ``business.signals`` bumps it on every
+Product/ProductCategory write. The version lives in the Django cache, which is
+Redis in production (settings.CACHES), so a bump reaches every worker. Writes
+that bypass the signals, or a version lost with the cache, are bounded by
+``CATALOG_SNAPSHOT_MAX_AGE``, after which a snapshot is rebuilt regardless.
+
+Snapshots are opt-in through ``settings.CATALOG_SNAPSHOT_ENABLED``. Name search
+on a snapshot matches word prefixes of the product name only; the database path
+(``ProductQuerySet.search``) also ranks descriptions and fixes typos.
+"""
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from business.search import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'catalog_version:{}'
+
+
+def snapshots_enabled() -> bool:
+    return getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', False)
+
+
+def catalog_version(user_id: int):
+    return cache.get(VERSION_CACHE_KEY.format(user_id))
+
+
+def bump_catalog_version(user_id: int):
+    """Invalidate every process's snapshot of ``user_id``'s catalog."""
+    bump_version(VERSION_CACHE_KEY.format(user_id))
+
+
+def bump_version(key: str):
+    """Increment the shared version counter ``key`` in the Django cache."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Seed from the clock so a counter lost to eviction never repeats an old version.
+        if not cache.add(key, time.time_ns(), timeout=None):
+            cache.incr(key)
+
+
+class CatalogSnapshot:
+    """
+    Columnar copy of one tenant's products.
+
+    Rows are kept in the model's default order (newest first). Numeric filters
+    are evaluated as numpy masks; name search looks word prefixes up in a sorted
+    token array with ``searchsorted``.
+    """
+
+    MAX_PRODUCTS = 20000
+    ORDERING_FIELDS = ('price', 'stock', 'created_at')
+
+    _snapshots: Dict[int, 'CatalogSnapshot'] = {}
+    _lock = Lock()
+
+    def __init__(self, user_id: int, version, rows: List[tuple]):
+        self.user_id = user_id
+        self.version = version
+        self.built_at = time.monotonic()
+        size = len(rows)
+
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=size)
+        self.names = [row[1] for row in rows]
+        self.descriptions = [row[2] for row in rows]
+        self.exact_prices = [row[3] for row in rows]
+        self.prices = np.fromiter((float(row[3]) for row in rows), dtype=np.float64, count=size)
+        self.stock = np.fromiter((row[4] for row in rows), dtype=np.int64, count=size)
+
+        self.category_ids: List[int] = []
+        self.category_names: List[str] = []
+        codes = {}
+        for row in rows:
+            if row[5] is not None and row[5] not in codes:
+                codes[row[5]] = len(self.category_ids)
+                self.category_ids.append(row[5])
+                self.category_names.append(row[6])
+        self.category_codes = np.fromiter(
+            (codes.get(row[5], -1) for row in rows), dtype=np.int32, count=size
+        )
+
+        normalized = [normalize_search_text(name) for name in self.names]
+        self.name_rank = np.empty(size, dtype=np.int64)
+        self.name_rank[np.argsort(np.array(normalized, dtype=str), kind='stable')] = np.arange(size)
+
+        pairs = sorted((token, position) for position, name in enumerate(normalized) for token in set(name.split()))
+        self.tokens = np.array([token for token, _ in pairs], dtype=str)
+        self.token_rows = np.fromiter((position for _, position in pairs), dtype=np.int64, count=len(pairs))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def for_tenant(cls, user_id: int) -> Optional['CatalogSnapshot']:
+        """Current snapshot of ``user_id``'s catalog, or ``None`` if it is too large to hold."""
+        version = catalog_version(user_id)
+        snapshot = cls._snapshots.get(user_id)
+        if snapshot is not None and snapshot.is_current(version):
+            return snapshot
+
+        from business.models import Product
+
+        with cls._lock:
+            snapshot = cls._snapshots.get(user_id)
+            if snapshot is not None and snapshot.is_current(version):
+                return snapshot
+            started = time.perf_counter()
+            rows = list(
+                Product.objects.filter(user_id=user_id)
+                .values_list('id', 'name', 'description', 'price', 'stock', 'category_id', 'category__name')
+                [:cls.MAX_PRODUCTS + 1]
+            )
+            if len(rows) > cls.MAX_PRODUCTS:
+                cls._snapshots.pop(user_id, None)
+                return None
+            snapshot = cls(user_id, version, rows)
+            cls._snapshots[user_id] = snapshot
+            logger.debug(
+                f"Built catalog snapshot for user {user_id}: {len(rows)} products "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return snapshot
+
+    def is_current(self, version) -> bool:
+        max_age = getattr(settings, 'CATALOG_SNAPSHOT_MAX_AGE', 300)
+        return self.version == version and time.monotonic() - self.built_at < max_age
+
+    def _name_matches(self, terms: List[str]) -> np.ndarray:
+        """Number of distinct query terms prefixing a word of each product name."""
+        counts = np.zeros(len(self), dtype=np.int64)
+        for term in terms:
+            start = np.searchsorted(self.tokens, term, side='left')
+            end = np.searchsorted(self.tokens, term + '\U0010ffff', side='left')
+            counts[np.unique(self.token_rows[start:end])] += 1
+        return counts
+
+    def search(
+        self,
+        name: Optional[str] = None,
+        category: Optional[str] = None,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: Optional[bool] = None,
+        stock: Optional[int] = None,
+        match_all_terms: bool = False,
+        ordering: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Positions of the matching rows, best first.
+
+        Name matches are ranked by how many query terms they contain, then by
+        name. Otherwise rows follow ``ordering`` ('name' or one of
+        ``ORDERING_FIELDS``, optionally prefixed with '-'), defaulting to newest
+        first.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if category:
+            needle = category.casefold()
+            codes = [code for code, title in enumerate(self.category_names) if needle in title.casefold()]
+            mask &= np.isin(self.category_codes, codes)
+        if category_id is not None:
+            code = self.category_ids.index(category_id) if category_id in self.category_ids else -2
+            mask &= self.category_codes == code
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        if in_stock:
+            mask &= self.stock > 0
+        if stock is not None:
+            mask &= self.stock == stock
+
+        terms = list(dict.fromkeys(normalize_search_text(name).split())) if name else []
+        if name and not terms:
+            return np.empty(0, dtype=np.int64)
+        counts = self._name_matches(terms) if terms else None
+        if counts is not None:
+            mask &= (counts == len(terms)) if match_all_terms else (counts > 0)
+        positions = np.flatnonzero(mask)
+
+        if counts is not None and not ordering:
+            positions = positions[np.lexsort((self.name_rank[positions], -counts[positions]))]
+        elif ordering:
+            field = ordering.lstrip('-')
+            if field == 'name':
+                keys = self.name_rank[positions]
+            elif field == 'created_at':
+                # Rows are stored newest first.
+                keys = -positions
+            else:
+                keys = getattr(self, 'prices' if field == 'price' else field)[positions]
+            order = np.argsort(keys, kind='stable')
+            positions = positions[order[::-1] if ordering.startswith('-') else order]
+
+        return positions[:limit] if limit else positions
+
+    def row(self, position: int) -> Dict[str, Any]:
+        code = self.category_codes[position]
+        return {
+            'id': int(self.ids[position]),
+            'name': self.names[position],
+            'description': self.descriptions[position],
+            'price': self.exact_prices[position],
+            'stock': int(self.stock[position]),
+            'category_id': self.category_ids[code] if code >= 0 else None,
+            'category_name': self.category_names[code] if code >= 0 else None,
+        }
+
+    def rows(self, positions) -> List[Dict[str, Any]]:
+        return [self.row(position) for position in positions]
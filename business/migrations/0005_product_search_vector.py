@@ -0,0 +1,45 @@
+# Generated by Django 5.2.2 on 2026-10-19 12:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+# pg_trgm ships with the pgvector/pgvector image (postgres contrib) but is not
+# guaranteed on every server, so the extension and the trigram index are only
+# created when available. Product search checks for it at runtime.
+CREATE_TRIGRAM_INDEX = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS business_product_name_trgm
+            ON business_product USING gin (name gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+DROP_TRIGRAM_INDEX = "DROP INDEX IF EXISTS business_product_name_trgm;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0004_facebookintegration_app_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='business_product_search_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGRAM_INDEX, reverse_sql=DROP_TRIGRAM_INDEX),
+    ]
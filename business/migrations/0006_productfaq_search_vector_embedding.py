@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-19 12:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import pgvector.django.extensions
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0005_product_search_vector'),
+    ]
+
+    operations = [
+        pgvector.django.extensions.VectorExtension(),
+        migrations.AddField(
+            model_name='productfaq',
+            name='embedding',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=768, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='productfaq',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('question', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('answer', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='productfaq',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='business_productfaq_search_gin'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 13:05
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0006_productfaq_search_vector_embedding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productfaq',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='business_pfaq_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
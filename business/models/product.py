@@ -1,7 +1,37 @@
 from django.db import models
+from django.db.models import F, Q, Value
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchRank, SearchVector, SearchVectorField, TrigramWordSimilarity
 from django.contrib.auth import get_user_model
 User = get_user_model()
 from .product_category import ProductCategory
+from business.search import SEARCH_CONFIG, build_prefix_query, normalize_search_text, trigram_enabled
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def search(self, text: str):
+        """
+        Rank products against free text using the stored ``search_vector``.
+
+        Products match on any prefix term (name weighted above description) or,
+        when ``pg_trgm`` is available, on trigram word similarity of the name so
+        misspellings like "iphon" still hit. Results are annotated with ``rank``
+        and ordered best first.
+        """
+        query = build_prefix_query(text)
+        if query is None:
+            return self.none()
+
+        rank = SearchRank(F('search_vector'), query)
+        condition = Q(search_vector=query)
+        if trigram_enabled():
+            normalized = normalize_search_text(text)
+            rank = rank + TrigramWordSimilarity(Value(normalized), 'name')
+            condition |= Q(name__trigram_word_similar=normalized)
+
+        return self.filter(condition).annotate(rank=rank).order_by('-rank', 'name')
+
 
 class Product(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
@@ -12,9 +42,27 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Updated")
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='business_product_search_gin'),
+        ]
+
+    @property
+    def document_text(self) -> str:
+        """Text that is embedded for semantic search."""
+        return f"{self.name}\n{self.description}".strip()
 
 def __str__(self):
-    return f"{self.name} ({self.category.name if self.category else 'No Category'})"
\ No newline at end of file
+    return f"{self.name} ({self.category.name if self.category else 'No Category'})"
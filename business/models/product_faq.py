@@ -1,13 +1,71 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchRank, SearchVector, SearchVectorField
+from pgvector.django import CosineDistance, HnswIndex, VectorField
+from business.search import SEARCH_CONFIG, build_prefix_query
 from .product import Product
 
+
+class ProductFAQQuerySet(models.QuerySet):
+
+    def for_owner(self, user):
+        return self.filter(product__user=user)
+
+    def nearest(self, query_embedding):
+        """Embedded FAQs ordered by cosine distance to ``query_embedding``, annotated with ``similarity``."""
+        distance = CosineDistance('embedding', query_embedding)
+        return (
+            self.filter(embedding__isnull=False)
+            .annotate(similarity=1 - distance)
+            .order_by(distance)
+        )
+
+    def lexical(self, text: str):
+        """Full-text matches on any query term, question weighted above answer."""
+        query = build_prefix_query(text)
+        if query is None:
+            return self.none()
+        return (
+            self.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'question')
+        )
+
+
 class ProductFAQ(models.Model):
     product = models.ForeignKey(Product, related_name='faqs', on_delete=models.CASCADE)
     question = models.CharField(max_length=255)
     answer = models.TextField()
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('question', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('answer', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Embedding of ``document_text``; refreshed by the vector indexer after
+    # each committed edit.
+    embedding = VectorField(dimensions=settings.EMBEDDING_DIMENSIONS, null=True, blank=True, editable=False)
+
+    objects = ProductFAQQuerySet.as_manager()
 
     class Meta:
         ordering = ['question']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='business_productfaq_search_gin'),
+            HnswIndex(
+                fields=['embedding'], name='business_pfaq_embedding_hnsw', opclasses=['vector_cosine_ops'],
+                m=settings.VECTOR_HNSW_M, ef_construction=settings.VECTOR_HNSW_EF_CONSTRUCTION,
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.product.name} - {self.question}"
\ No newline at end of file
+        return f"{self.product.name} - {self.question}"
+
+    @property
+    def document_text(self) -> str:
+        """Text that is embedded for semantic search."""
+        return f"Q: {self.question}\nA: {self.answer}"
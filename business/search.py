@@ -0,0 +1,61 @@
+"""
+Helpers for ranked catalog search on PostgreSQL.
+
+Product text is indexed with the ``simple`` text search configuration: it only
+lowercases and splits words, so Bangla, English and mixed "Banglish" queries are
+tokenized the same way (Postgres ships no Bangla dictionary and English stemming
+would mangle Bangla words). Typos are handled by ``pg_trgm`` word similarity on
+the product name when the extension is installed.
+"""
+import logging
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'simple'
+
+# Characters with a meaning in tsquery syntax, plus common punctuation
+# (including the Bangla danda) that should only separate words.
+_QUERY_SEPARATORS = str.maketrans({c: ' ' for c in "&|!():*<>'\"\\,.;?/-_+=[]{}।॥"})
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    Lowercase and strip tsquery operators from user input.
+
+    No Unicode normalization: the stored ``search_vector`` and the trigram index
+    hold the raw text, and NFKC would decompose letters such as Bangla ড়
+    (U+09DC) that the catalog stores precomposed.
+    """
+    text = (text or '').lower()
+    return ' '.join(text.translate(_QUERY_SEPARATORS).split())
+
+
+def build_prefix_query(text: str):
+    """
+    Build an OR-of-prefixes tsquery (``iphone:* | 14:*``) from free text.
+
+    Chat queries mix product words with filler ("iphone 14 er dam koto"), so any
+    matching term qualifies a product and ``ts_rank`` rewards products matching
+    more of them. Returns ``None`` when nothing searchable is left.
+    """
+    terms = normalize_search_text(text).split()
+    if not terms:
+        return None
+    raw = ' | '.join(f'{term}:*' for term in dict.fromkeys(terms))
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+@lru_cache(maxsize=None)
+def trigram_enabled() -> bool:
+    """Whether the ``pg_trgm`` extension is installed in the current database."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            return cursor.fetchone() is not None
+    except Exception as e:
+        logger.warning(f"Could not check for pg_trgm extension: {str(e)}")
+        return False
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from chatbot.services import vector_index
+from chatbot.services.tool_result_cache import ToolResultCache
+from .catalog import bump_catalog_version
+from .models import Product, ProductCategory, ProductFAQ
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductFAQ)
+def queue_vector_upsert(sender, instance, update_fields=None, **kwargs):
+    """Queue the row for (re-)embedding in the same transaction as the edit."""
+    vector_index.queue_upsert(instance, update_fields)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=ProductFAQ)
+def queue_vector_delete(sender, instance, **kwargs):
+    vector_index.queue_delete(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+def invalidate_catalog_caches(sender, instance, **kwargs):
+    """Drop the owner's catalog snapshot and memoized tool results once the change is committed."""
+    transaction.on_commit(lambda: bump_catalog_version(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=ProductFAQ)
+def invalidate_product_faq_tool_results(sender, instance, **kwargs):
+    owner_id = Product.objects.filter(pk=instance.product_id).values_list('user_id', flat=True).first()
+    # A cascade from a deleted product has no owner left; the product's own signal covers it.
+    if owner_id is not None:
+        transaction.on_commit(lambda: ToolResultCache.invalidate_faqs(owner_id))
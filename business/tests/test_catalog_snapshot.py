@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from ..catalog import CatalogSnapshot
+from ..models import Product, ProductCategory
+from chatbot.langgraph.tools.product_search_tool import ProductSearchTool
+from llm_integration.utils.query_utils import DatabaseQueryTool
+
+User = get_user_model()
+
+
+def create_catalog(user):
+    phones = ProductCategory.objects.create(user=user, name='Smartphones')
+    audio = ProductCategory.objects.create(user=user, name='Audio')
+    return {
+        'iphone': Product.objects.create(user=user, category=phones, name='iPhone 14 Pro', price='999.00', stock=2),
+        'galaxy': Product.objects.create(user=user, category=phones, name='Samsung Galaxy S23', price='799.00', stock=0),
+        'sony': Product.objects.create(user=user, category=audio, name='Sony WH-1000XM4', price='278.00', stock=5),
+        'cable': Product.objects.create(user=user, name='USB-C Cable', price='9.99', stock=40),
+    }
+
+
+@override_settings(CATALOG_SNAPSHOT_ENABLED=True)
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        CatalogSnapshot._snapshots.clear()
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.products = create_catalog(self.user)
+        Product.objects.create(
+            user=User.objects.create_user(email='other@example.com', password='testpass123'),
+            name='iPhone 13', price=500, stock=1
+        )
+
+    def _ids(self, snapshot, **filters):
+        return snapshot.ids[snapshot.search(**filters)].tolist()
+
+    def test_vectorized_filters(self):
+        snapshot = CatalogSnapshot.for_tenant(self.user.id)
+        p = self.products
+        self.assertEqual(len(snapshot), 4)
+        self.assertEqual(self._ids(snapshot, min_price=100, max_price=900, ordering='price'), [p['sony'].id, p['galaxy'].id])
+        self.assertEqual(self._ids(snapshot, category='phone', in_stock=True), [p['iphone'].id])
+        self.assertEqual(self._ids(snapshot, category_id=p['sony'].category_id), [p['sony'].id])
+        self.assertEqual(self._ids(snapshot, ordering='-stock', limit=2), [p['cable'].id, p['sony'].id])
+        self.assertEqual(self._ids(snapshot), [p['cable'].id, p['sony'].id, p['galaxy'].id, p['iphone'].id])
+
+    def test_prefix_token_name_match(self):
+        snapshot = CatalogSnapshot.for_tenant(self.user.id)
+        p = self.products
+        self.assertEqual(self._ids(snapshot, name='IPHO'), [p['iphone'].id])
+        self.assertEqual(self._ids(snapshot, name='galaxy iphone 14'), [p['iphone'].id, p['galaxy'].id])
+        self.assertEqual(self._ids(snapshot, name='galaxy iphone', match_all_terms=True), [])
+        self.assertEqual(self._ids(snapshot, name='?!'), [])
+
+    def test_catalog_writes_rebuild_the_snapshot(self):
+        snapshot = CatalogSnapshot.for_tenant(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertIs(CatalogSnapshot.for_tenant(self.user.id), snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductCategory.objects.filter(name='Audio').get().delete()
+        rebuilt = CatalogSnapshot.for_tenant(self.user.id)
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertIsNone(rebuilt.row(rebuilt.search(name='sony')[0])['category_name'])
+
+    def test_snapshots_expire_without_a_version_bump(self):
+        snapshot = CatalogSnapshot.for_tenant(self.user.id)
+        # A bulk update sends no signals; the snapshot is replaced once it is too old.
+        Product.objects.filter(user=self.user).update(stock=0)
+        self.assertIs(CatalogSnapshot.for_tenant(self.user.id), snapshot)
+        with override_settings(CATALOG_SNAPSHOT_MAX_AGE=0):
+            rebuilt = CatalogSnapshot.for_tenant(self.user.id)
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(self._ids(rebuilt, in_stock=True), [])
+
+    def test_agent_tools_use_the_snapshot(self):
+        CatalogSnapshot.for_tenant(self.user.id)
+        tool = ProductSearchTool(user=self.user)
+        with self.assertNumQueries(0):
+            results = tool._search_products_raw(name='sony')
+            rows = DatabaseQueryTool.query_products(self.user, 'iphone')
+        self.assertEqual([r.category for r in results], ['Audio'])
+        self.assertEqual([row['name'] for row in rows], ['iPhone 14 Pro'])
+
+
+@override_settings(CATALOG_SNAPSHOT_ENABLED=True)
+class ProductViewSetSnapshotTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        CatalogSnapshot._snapshots.clear()
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123', is_email_verified=True)
+        self.products = create_catalog(self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('product-list')
+
+    def test_list_matches_the_database_path(self):
+        for params in (
+            {}, {'ordering': '-price', 'page_size': 2}, {'stock': 0}, {'category': self.products['sony'].category_id},
+            # Searches and unusual orderings are left to SearchFilter and OrderingFilter.
+            {'search': 'sony'}, {'search': 'phone'}, {'search': 'audio'}, {'search': 'phone', 'ordering': 'price'},
+            {'ordering': 'stock,-price'}, {'ordering': 'name'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                with override_settings(CATALOG_SNAPSHOT_ENABLED=False):
+                    expected = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
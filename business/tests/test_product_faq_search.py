@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from ..models import Product, ProductFAQ
+from chatbot.langgraph.tools.product_faq_search import ProductFAQSearchTool
+from chatbot.models import VectorIndexOutbox
+from chatbot.services.vector_index import VectorIndexer
+from knowledge_base.tests import FakeEmbedder
+
+User = get_user_model()
+
+
+@mock.patch('chatbot.services.vector_index.Thread')
+class ProductFAQEmbeddingTest(TestCase):
+    def setUp(self):
+        VectorIndexer._worker = None
+        self.embedder = FakeEmbedder()
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.phone = Product.objects.create(user=self.user, name='iPhone 14', price=999, stock=2)
+        self.headphones = Product.objects.create(user=self.user, name='Sony WH-1000XM4', price=278, stock=5)
+        self.other_product = Product.objects.create(user=self.other_user, name='iPhone 14', price=900, stock=1)
+
+    def _create_faqs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.battery = ProductFAQ.objects.create(
+                product=self.phone, question='How long does the battery last?',
+                answer='About 20 hours of video playback.'
+            )
+            self.pairing = ProductFAQ.objects.create(
+                product=self.headphones, question='How do I pair the headphones?',
+                answer='Hold the power button for 7 seconds to enter pairing mode.'
+            )
+            ProductFAQ.objects.create(
+                product=self.other_product, question='How long does the battery last?',
+                answer='Another shop answer.'
+            )
+        VectorIndexer.process(embedder=self.embedder, store_for=lambda owner_id: None)
+
+    def test_saves_are_queued_and_embedded_in_batches(self, thread):
+        self._create_faqs()
+        self.assertFalse(ProductFAQ.objects.filter(embedding__isnull=True).exists())
+        self.assertFalse(VectorIndexOutbox.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.battery.answer = 'Up to 26 hours of video playback.'
+            self.battery.save()
+            self.battery.save()
+        self.assertEqual(
+            list(VectorIndexOutbox.objects.values_list('source_type', 'source_id', 'operation')),
+            [('business.ProductFAQ', self.battery.pk, VectorIndexOutbox.Operation.UPSERT)]
+        )
+        thread.return_value.start.assert_called()
+
+    def test_deleted_faq_replaces_its_pending_update(self, thread):
+        self._create_faqs()
+        pairing_id = self.pairing.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pairing.question = 'Pairing steps?'
+            self.pairing.save()
+            self.pairing.delete()
+        self.assertEqual(
+            list(VectorIndexOutbox.objects.values_list('source_id', 'owner_id', 'operation')),
+            [(pairing_id, self.user.id, VectorIndexOutbox.Operation.DELETE)]
+        )
+
+    def test_vector_search_is_scoped_and_filterable_by_product(self, thread):
+        self._create_faqs()
+        tool = ProductFAQSearchTool(user=self.user, embedder=self.embedder)
+
+        results = tool._search_product_faqs('how long does the battery last', None, 5)
+        self.assertEqual(results[0], self.battery)
+        self.assertTrue(all(faq.product.user_id == self.user.id for faq in results))
+
+        results = tool._search_product_faqs('how long does the battery last', self.headphones.id, 5)
+        self.assertTrue(all(faq.product_id == self.headphones.id for faq in results))
+
+    def test_lexical_fallback_without_embeddings(self, thread):
+        self._create_faqs()
+
+        class BrokenEmbedder:
+            def embed_text(self, text):
+                raise ConnectionError("embedding API unavailable")
+
+        tool = ProductFAQSearchTool(user=self.user, embedder=BrokenEmbedder())
+        self.assertEqual(tool._search_product_faqs('pairing mode', None, 5), [self.pairing])
@@ -0,0 +1,73 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from ..models import Product, ProductCategory
+from ..search import build_prefix_query, normalize_search_text, trigram_enabled
+from chatbot.langgraph.tools.product_search_tool import ProductSearchTool
+
+User = get_user_model()
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        phones = ProductCategory.objects.create(user=self.user, name='Phones')
+
+        self.iphone = Product.objects.create(
+            user=self.user, category=phones, name='iPhone 14 Pro',
+            description='Apple smartphone with A16 chip', price=1200, stock=3
+        )
+        self.case = Product.objects.create(
+            user=self.user, name='Silicone Case',
+            description='Protective case for iPhone 14', price=15, stock=0
+        )
+        self.saree = Product.objects.create(
+            user=self.user, name='জামদানি শাড়ি',
+            description='Handwoven Jamdani saree from Dhaka', price=85, stock=5
+        )
+        Product.objects.create(
+            user=self.other_user, name='iPhone 14',
+            description='Another shop', price=1000, stock=1
+        )
+        trigram_enabled()  # warm the per-process extension check
+
+    def test_normalize_strips_tsquery_operators(self):
+        self.assertEqual(normalize_search_text("iPhone & (14)!"), 'iphone 14')
+        self.assertIsNone(build_prefix_query('  !!  '))
+
+    def test_precomposed_bangla_name_matches_the_same_word(self):
+        # ড় as the single code point U+09DC, which NFKC would decompose.
+        name = '\u09ac\u09dc \u09ac\u09cd\u09af\u09be\u0997'
+        bag = Product.objects.create(user=self.user, name=name, price=50, stock=1)
+        self.assertEqual(normalize_search_text(name), name)
+        self.assertEqual(list(Product.objects.filter(user=self.user).search(name)), [bag])
+        self.assertEqual(list(Product.objects.filter(user=self.user).search('\u09ac\u09dc')), [bag])
+
+    def test_name_matches_rank_above_description_matches(self):
+        results = list(Product.objects.filter(user=self.user).search('iphone 14'))
+        self.assertEqual(results[0], self.iphone)
+        self.assertIn(self.case, results)
+        self.assertNotIn(self.saree, results)
+
+    def test_prefix_and_bangla_terms(self):
+        self.assertEqual(list(Product.objects.filter(user=self.user).search('iph')), [self.iphone, self.case])
+        self.assertEqual(list(Product.objects.filter(user=self.user).search('শাড়ি দাম কত')), [self.saree])
+        self.assertEqual(list(Product.objects.filter(user=self.user).search('jamdani')), [self.saree])
+
+    def test_misspelled_name_matches_with_trigram(self):
+        if not trigram_enabled():
+            self.skipTest("pg_trgm extension is not installed")
+        self.assertIn(self.iphone, Product.objects.filter(user=self.user).search('iphnoe'))
+
+    def test_tool_runs_one_scoped_query(self):
+        tool = ProductSearchTool(user=self.user)
+        with self.assertNumQueries(1):
+            results = tool._search_products_raw(name='iphone', in_stock=True)
+        self.assertEqual([r.id for r in results], [self.iphone.id])
+        self.assertEqual(results[0].category, 'Phones')
+
+    def test_tool_general_query_returns_newest_first(self):
+        tool = ProductSearchTool(user=self.user)
+        results = tool._search_products_raw(limit=2)
+        self.assertEqual([r.id for r in results], [self.saree.id, self.case.id])
+        self.assertEqual(results[1].category, 'Uncategorized')
@@ -2,6 +2,7 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework import filters
 
 from utils.pagination import CustomPageNumberPagination
+from ..catalog import CatalogSnapshot, snapshots_enabled
 from ..models import ProductCategory, Product
 from ..serializers import ProductCategorySerializer, ProductSerializer
 from account.renderers import UserRenderer
@@ -39,7 +40,35 @@ class ProductViewSet(ModelViewSet):
 
     
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        return Product.objects.filter(user=self.request.user).select_related('category')
+
+    def list(self, request, *args, **kwargs):
+        """
+        With catalog snapshots enabled, filter, order and count in memory and
+        only load the products of the requested page from the database.
+        Searches and orderings other than one of ``ordering_fields`` go to the
+        database, so SearchFilter and OrderingFilter keep their semantics.
+        """
+        params = request.query_params
+        ordering = params.get('ordering')
+        if params.get('search') or (ordering and ordering.lstrip('-') not in self.ordering_fields):
+            return super().list(request, *args, **kwargs)
+        snapshot = CatalogSnapshot.for_tenant(request.user.id) if snapshots_enabled() else None
+        if snapshot is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            category_id = int(params['category']) if params.get('category') else None
+            stock = int(params['stock']) if params.get('stock') else None
+        except ValueError:
+            # Let the filterset report invalid values.
+            return super().list(request, *args, **kwargs)
+
+        positions = snapshot.search(category_id=category_id, stock=stock, ordering=ordering)
+        page_ids = self.paginate_queryset(snapshot.ids[positions].tolist())
+        products = self.get_queryset().in_bulk(page_ids)
+        serializer = self.get_serializer([products[pk] for pk in page_ids if pk in products], many=True)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
\ No newline at end of file
@@ -12,7 +12,7 @@ class LLMResponseGenerator:
     def __init__(self, ai_config: AIConfiguration):
         self.ai_config = ai_config
         self.llm = self._initialize_llm()
-        self.faq_search = FAQVectorSearch()
+        self.faq_search = FAQVectorSearch(ai_config.user_id)
         self.prompt_template = self._create_prompt_template()
         self.chain = self.prompt_template | self.llm | StrOutputParser()
 
@@ -80,8 +80,7 @@ class LLMResponseGenerator:
         """Use vector search for FAQ retrieval"""
         results = self.faq_search.search(user_input)
         return [
-            FAQ.objects.get(id=result['id'])
-            for result in results
+            result for result in results
             if result['score'] > 0.5  # Only include reasonably good matches
         ][:3]  # Return top 3 matches
     
@@ -92,7 +91,7 @@ class LLMResponseGenerator:
         # Get relevant FAQs
         relevant_faqs = self._get_relevant_faqs(user_input)
         faq_context = "\n\n".join(
-            [f"Q: {faq.question}\nA: {faq.answer}" for faq in relevant_faqs]
+            [f"Q: {faq['question']}\nA: {faq['answer']}" for faq in relevant_faqs]
         ) if relevant_faqs else "No relevant FAQs found"
         
         context = {
@@ -158,49 +157,29 @@ class LLMResponseGenerator:
 
 
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-import numpy as np
+from chatbot.services.embedding_cache import CachedEmbeddings
 
 class FAQVectorSearch:
-    def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
+    """FAQ search over the owner's persistent FAISS index (see TenantFAISSIndex)."""
+
+    def __init__(self, user_id):
+        from chatbot.services.faiss_index import TenantFAISSIndex
+        self.embeddings = CachedEmbeddings(HuggingFaceEmbeddings(
             model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        self.vectorstore = None
-        
+        ))
+        self.index = TenantFAISSIndex(self.embeddings, user_id)
+
     def initialize_vectorstore(self):
-        """Initialize FAQ vector store"""
-        faqs = FAQ.objects.all()
-        texts = [f"Q: {faq.question}\nA: {faq.answer}" for faq in faqs]
-        metadatas = [{"id": faq.id, "category": faq.category.name} for faq in faqs]
-        
-        if texts:
-            self.vectorstore = FAISS.from_texts(
-                texts, 
-                embedding=self.embeddings,
-                metadatas=metadatas
-            )
-    
+        """Build or incrementally update the owner's FAQ index"""
+        return self.index.sync()
+
     def search(self, query, k=3):
-        """Search FAQs using vector similarity"""
-        if not self.vectorstore:
-            self.initialize_vectorstore()
-        
-        if not self.vectorstore:
-            return []
-        
-        docs = self.vectorstore.similarity_search(query, k=k)
+        """Search FAQs using vector similarity; scores are cosine similarities"""
+        hits = self.index.search(query, k=k)
+        faqs = FAQ.objects.in_bulk([faq_id for faq_id, _ in hits])
         return [{
-            'id': doc.metadata['id'],
-            'question': FAQ.objects.get(id=doc.metadata['id']).question,
-            'answer': FAQ.objects.get(id=doc.metadata['id']).answer,
-            'score': self._calculate_score(query, doc.page_content)
-        } for doc in docs]
-    
-    def _calculate_score(self, query, text):
-        """Calculate similarity score (simplified example)"""
-        query_embedding = self.embeddings.embed_query(query)
-        text_embedding = self.embeddings.embed_query(text)
-        return np.dot(query_embedding, text_embedding)
-    
-    
\ No newline at end of file
+            'id': faq_id,
+            'question': faqs[faq_id].question,
+            'answer': faqs[faq_id].answer,
+            'score': score
+        } for faq_id, score in hits if faq_id in faqs]
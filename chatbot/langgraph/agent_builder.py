@@ -15,7 +15,7 @@ class AgentBuilder:
             # checkpointer.setup()
 
         call_llm_node = make_call_llm(system_prompt, llm)
-        take_action_node = make_take_action(tools)
+        take_action_node = make_take_action(tools, user)
         should_continue_node = make_should_continue(user)
             
         graph = StateGraph(AgentState)
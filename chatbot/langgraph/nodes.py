@@ -1,5 +1,6 @@
 from .state import AgentState
 from langchain_core.messages import SystemMessage, ToolMessage
+from chatbot.services.tool_result_cache import ToolResultCache
 
 
 def make_call_llm(system_prompt, llm):
@@ -11,7 +12,9 @@ def make_call_llm(system_prompt, llm):
     return call_llm
 
 # Retriever Agent
-def make_take_action(tools):
+def make_take_action(tools, user=None):
+    tenant_id = user.id if user is not None else None
+
     def take_action(state: AgentState) -> AgentState:
         tool_calls = state['messages'][-1].tool_calls
         tools_dict = {tool.name: tool for tool in tools}
@@ -19,7 +22,10 @@ def make_take_action(tools):
 
         for t in tool_calls:
             tool = tools_dict.get(t['name'])
-            result = tool.invoke(t['args']) if tool else "Invalid tool name"
+            if tool:
+                result = ToolResultCache.invoke(tool, t['args'], tenant_id, lambda: tool.invoke(t['args']))
+            else:
+                result = "Invalid tool name"
             results.append(ToolMessage(
                 tool_call_id=t['id'], name=t['name'], content=str(result)))
         
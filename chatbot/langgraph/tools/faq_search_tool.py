@@ -1,8 +1,9 @@
 from langchain_core.tools import BaseTool
 from typing import List, Type, Optional, Dict, Any
-from pydantic import BaseModel, Field
-from django.db.models import Q
+from pydantic import BaseModel, Field, PrivateAttr
 from knowledge_base.models import FAQ
+from knowledge_base.retrieval import HybridFAQRetriever
+from account.models import User
 import logging
 from enum import Enum
 
@@ -19,7 +20,8 @@ class FAQSearchTool(BaseTool):
     Enhanced FAQ search tool for business knowledge bases with multiple search modes.
     
     Features:
-    - Standard keyword search
+    - Full-text, semantic (embedding) and hybrid rank-fusion search
+    - Results limited to the business owner's FAQs
     - Category filtering
     - Search mode selection
     - Result relevance scoring
@@ -34,11 +36,19 @@ class FAQSearchTool(BaseTool):
     name: str = "enhanced_business_faq_search"
     description: str = (
         "Advanced FAQ search tool for business knowledge bases. "
-        "Supports keyword search, category filtering, and multiple search modes. "
+        "Supports keyword, semantic and hybrid search modes, plus category filtering. "
         "Use 'category:<name>' to filter by category. "
         "Results include relevance scores and smart-truncated answers."
     )
 
+    _user: User = PrivateAttr()
+    _retriever: HybridFAQRetriever = PrivateAttr()
+
+    def __init__(self, user: User, **kwargs):
+        super().__init__(**kwargs)
+        self._user = user
+        self._retriever = HybridFAQRetriever(user)
+
     class InputSchema(BaseModel):
         query: str = Field(
             ...,
@@ -51,7 +61,7 @@ class FAQSearchTool(BaseTool):
             le=10
         )
         mode: Optional[SearchMode] = Field(
-            SearchMode.STANDARD,
+            SearchMode.HYBRID,
             description="Search mode: 'standard', 'semantic', or 'hybrid'."
         )
         min_relevance: Optional[float] = Field(
@@ -71,7 +81,7 @@ class FAQSearchTool(BaseTool):
         self,
         query: str,
         limit: int = 5,
-        mode: SearchMode = SearchMode.STANDARD,
+        mode: SearchMode = SearchMode.HYBRID,
         min_relevance: float = 0.3,
         include_metadata: bool = True
     ) -> str:
@@ -120,81 +130,21 @@ class FAQSearchTool(BaseTool):
         mode: SearchMode,
         min_relevance: float
     ) -> List[Dict[str, Any]]:
-        """Core search logic with multiple modes."""
+        """Core search logic with multiple modes, scoped to the business owner."""
         # Category-specific search
         if query.lower().startswith('category:'):
             category_name = query[9:].strip()
             return self._search_by_category(category_name, limit)
-        
-        # Determine search mode
-        if mode == SearchMode.SEMANTIC:
-            return self._semantic_search(query, limit, min_relevance)
-        elif mode == SearchMode.HYBRID:
-            return self._hybrid_search(query, limit, min_relevance)
-        else:
-            return self._standard_search(query, limit)
-
-    def _standard_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
-        """Traditional keyword-based search."""
-        faqs = FAQ.objects.filter(
-            Q(question__icontains=query) | 
-            Q(answer__icontains=query) |
-            Q(keywords__icontains=query)
-        ).select_related('category').order_by('-last_updated')[:limit]
-        
-        return [self._prepare_faq_result(faq) for faq in faqs]
 
-    def _semantic_search(self, query: str, limit: int, min_score: float) -> List[Dict[str, Any]]:
-        """Semantic/vector search implementation."""
-        # Placeholder for actual vector search implementation
-        # In practice, you would use a vector DB or embedding service
-        from django.db.models import F, ExpressionWrapper, FloatField
-        from django.db.models.functions import Greatest
-        
-        # Simulate semantic scoring
-        faqs = FAQ.objects.annotate(
-            question_score=ExpressionWrapper(
-                Greatest(0.1, 0.8 - (0.1 * F('question__search'))),
-                output_field=FloatField()
-            ),
-            answer_score=ExpressionWrapper(
-                Greatest(0.1, 0.7 - (0.1 * F('answer__search'))),
-                output_field=FloatField()
-            ),
-            relevance=ExpressionWrapper(
-                (F('question_score') * 0.6 + F('answer_score') * 0.4),
-                output_field=FloatField()
-            )
-        ).filter(
-            relevance__gte=min_score
-        ).select_related('category').order_by('-relevance')[:limit]
-        
-        return [self._prepare_faq_result(faq) for faq in faqs]
-
-    def _hybrid_search(self, query: str, limit: int, min_score: float) -> List[Dict[str, Any]]:
-        """Combine keyword and semantic search."""
-        keyword_results = self._standard_search(query, limit)
-        semantic_results = self._semantic_search(query, limit, min_score)
-        
-        # Combine and deduplicate results
-        seen_ids = set()
-        combined = []
-        
-        for result in semantic_results + keyword_results:
-            if result['id'] not in seen_ids:
-                combined.append(result)
-                seen_ids.add(result['id'])
-                if len(combined) >= limit:
-                    break
-                    
-        return combined
+        results = self._retriever.search(query, limit=limit, mode=SearchMode(mode or SearchMode.HYBRID).value)
+        return [result for result in results if result['relevance'] >= min_relevance]
 
     def _search_by_category(self, category_name: str, limit: int) -> List[Dict[str, Any]]:
         """Search within a specific category."""
         faqs = FAQ.objects.filter(
-            Q(category__name__icontains=category_name) |
-            Q(category__slug__iexact=category_name)
-        ).select_related('category').order_by('-view_count')[:limit]
+            category__user=self._user,
+            category__name__icontains=category_name
+        ).select_related('category').order_by('question')[:limit]
         
         return [self._prepare_faq_result(faq) for faq in faqs]
 
@@ -206,8 +156,6 @@ class FAQSearchTool(BaseTool):
             'answer': faq.answer,
             'category': faq.category.name if faq.category else None,
             'relevance': getattr(faq, 'relevance', 0.8),  # Default for non-scored results
-            'last_updated': faq.last_updated,
-            'view_count': faq.view_count
         }
 
     def _format_results(
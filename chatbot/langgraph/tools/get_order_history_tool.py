@@ -1,6 +1,7 @@
 from langchain_core.tools import BaseTool
-from typing import Optional, Type, List
-from pydantic import BaseModel, Field
+from typing import Dict, Optional, Type, List
+from pydantic import BaseModel, Field, PrivateAttr
+from django.db.models import Prefetch
 import logging
 
 from account.models import User
@@ -9,6 +10,9 @@ from messaging.models import SocialMediaUser
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on the orders loaded for a customer; also the size of the "full history" answer.
+ORDER_HISTORY_LIMIT = 10
+
 class GetOrderHistoryTool(BaseTool):
     name: str = "get_order_history_tool"
     description: str = (
@@ -21,6 +25,9 @@ class GetOrderHistoryTool(BaseTool):
 
     _user: User
     _social_user: SocialMediaUser
+    # Tools are built per incoming message, so these caches live for one conversation turn.
+    _customers: Dict[tuple, Customer] = PrivateAttr(default_factory=dict)
+    _orders: Dict[int, List[Order]] = PrivateAttr(default_factory=dict)
 
     def __init__(self, user: User, social_user: SocialMediaUser = None, **kwargs):
         super().__init__(**kwargs)
@@ -39,7 +46,9 @@ class GetOrderHistoryTool(BaseTool):
         try:
             # 1. Direct Order Number Lookup
             if order_number:
-                order = Order.objects.filter(order_number__iexact=order_number, customer__user=self._user).first()
+                order = self._with_items(
+                    Order.objects.filter(order_number__iexact=order_number, customer__user=self._user)
+                ).first()
                 if not order:
                     return f"❌ I couldn't find any order with the number '{order_number}'. Would you like to search by the phone number you used to place the order?"
                 return self._format_order_details(order)
@@ -50,27 +59,54 @@ class GetOrderHistoryTool(BaseTool):
                 return "I couldn't find any customer profile. Could you please provide the phone number you used when placing your order?"
 
             # 3. Fetch Orders
-            orders = Order.objects.filter(customer=customer).order_by('-created_at')
-            if not orders.exists():
+            orders = self._recent_orders(customer)
+            if not orders:
                 return f"✅ It looks like {customer.name} (ID: {customer.id}) hasn't placed any orders yet. Would you like to place a new order?"
 
             # 4. Format Response
             if show_more:
-                return self._format_multiple_orders(orders[:10], customer)
+                return self._format_multiple_orders(orders, customer)
             else:
-                last_order = orders.first()
+                last_order = orders[0]
                 response = f"I found your last order, {last_order.order_number}.\n"
                 response += self._format_order_details(last_order, include_header=False)
-                if orders.count() > 1:
-                    response += "\nWould you like to see your full history for the last 10 orders?"
+                if len(orders) > 1:
+                    response += f"\nWould you like to see your full history for the last {ORDER_HISTORY_LIMIT} orders?"
                 return response
 
         except Exception as e:
             logger.error(f"Failed to retrieve order history: {str(e)}", exc_info=True)
             return f"❌ An unexpected error occurred while fetching order history. Reason: {str(e)}"
 
+    @staticmethod
+    def _with_items(orders):
+        """Loads order items and their products alongside the orders, in one extra query."""
+        return orders.prefetch_related(
+            Prefetch('order_items', queryset=OrderItem.objects.select_related('product').only(
+                'order_id', 'quantity', 'product__name'
+            ))
+        )
+
+    def _recent_orders(self, customer: Customer) -> List[Order]:
+        """Newest orders of ``customer`` (at most ORDER_HISTORY_LIMIT), cached for this turn."""
+        if customer.id not in self._orders:
+            self._orders[customer.id] = list(
+                self._with_items(Order.objects.filter(customer=customer)).order_by('-created_at')[:ORDER_HISTORY_LIMIT]
+            )
+        return self._orders[customer.id]
+
     def _find_customer(self, customer_id: Optional[int], customer_phone: Optional[str]) -> Optional[Customer]:
-        """Finds a customer based on social ID, explicit ID, or phone."""
+        """Finds a customer based on social ID, explicit ID, or phone, cached for this turn."""
+        key = (customer_id, customer_phone)
+        if key not in self._customers:
+            customer = self._lookup_customer(customer_id, customer_phone)
+            if customer is None:
+                # Not cached: the profile may get linked later in the same turn.
+                return None
+            self._customers[key] = customer
+        return self._customers[key]
+
+    def _lookup_customer(self, customer_id: Optional[int], customer_phone: Optional[str]) -> Optional[Customer]:
         # Priority 1: Customer is already linked to the social profile
         if self._social_user and self._social_user.customer:
             return self._social_user.customer
@@ -104,8 +140,7 @@ class GetOrderHistoryTool(BaseTool):
             f"Date: {order.created_at.strftime('%Y-%m-%d %H:%M')}\n"
             f"Items:\n"
         )
-        order_items = order.items.all()
-        for item in order_items:
+        for item in order.order_items.all():
             details += f"  - {item.product.name} (x{item.quantity})\n"
         return details
 
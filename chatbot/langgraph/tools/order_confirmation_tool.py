@@ -2,14 +2,12 @@ from langchain_core.tools import BaseTool
 from typing import List, Optional, Type
 from pydantic import BaseModel, Field, model_validator
 from django.db import transaction
-from django.utils import timezone
-import uuid
 import logging
 
 from account.models import User
-from customer.models import Customer
-from business.models import Product
-from customer.models import Order, OrderItem  # Adjust import if your app name differs
+from customer.models import Customer, Order
+from customer.exceptions import OrderPlacementError
+from customer.services.order_service import place_order
 
 logger = logging.getLogger(__name__)
 
@@ -76,42 +74,14 @@ class OrderConfirmationTool(BaseTool):
                 if not order_items_data:
                     return "❌ Error: Order items list cannot be empty."
 
-                total_items = 0
-                total_price = 0
-                products_cache = {}
-
-                # Validate product existence and stock
-                for item in order_items_data:
-                    product = Product.objects.filter(id=item.product_id, user=self._user).first()
-                    if not product:
-                        return f"❌ Error: Product with ID {item.product_id} not found."
-                    if product.stock < item.quantity:
-                        return f"❌ Error: Not enough stock for product '{product.name}'. Available: {product.stock}."
-                    products_cache[item.product_id] = product
-                    total_items += item.quantity
-                    total_price += product.price * item.quantity
-
-                # Create order
-                order_number = f"ORD-{timezone.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
-                order = Order.objects.create(
-                    order_number=order_number,
+                # Locks the products, reserves stock and creates the order in one go
+                order = place_order(
+                    user=self._user,
                     customer=customer,
-                    items=total_items,
-                    total=total_price,
-                    status=Order.Status.PENDING,
-                    payment_status=Order.PaymentStatus.PENDING,
+                    items=[(item.product_id, item.quantity) for item in order_items_data],
                     source=Order.Source.MANUAL,
                 )
 
-                # Create order items
-                order_items_bulk = [
-                    OrderItem(order=order, product=products_cache[item.product_id], quantity=item.quantity)
-                    for item in order_items_data
-                ]
-                OrderItem.objects.bulk_create(order_items_bulk)
-
-                logger.info(f"Order {order_number} created for customer {customer.id}.")
-
                 return (
                     f"✅ Order confirmed!\n"
                     f"Order Number: {order.order_number}\n"
@@ -121,6 +91,8 @@ class OrderConfirmationTool(BaseTool):
                     f"Status: {order.status}"
                 )
 
+        except OrderPlacementError as e:
+            return f"❌ Error: {str(e)}"
         except Exception as e:
             logger.error(f"Order creation failed: {str(e)}", exc_info=True)
             return f"❌ Error: Failed to create order. Reason: {str(e)}"
@@ -1,14 +1,18 @@
 from langchain_core.tools import BaseTool
 from typing import List, Type, Optional
-from pydantic import BaseModel, Field
-from django.db.models import Q
+from pydantic import BaseModel, Field, PrivateAttr
 from business.models import ProductFAQ
+from chatbot.services.vector_search import nearest
 from django.contrib.auth import get_user_model
 import logging
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Below this cosine similarity the nearest FAQs are treated as unrelated and the
+# lexical search is tried instead.
+MIN_SIMILARITY = 0.35
+
 class ProductFAQSearchTool(BaseTool):
     """Tool specifically for searching FAQs related to products."""
     
@@ -19,38 +23,56 @@ class ProductFAQSearchTool(BaseTool):
         "Examples: 'iPhone battery life', 'how to pair headphones', 'warranty coverage'"
     )
     
+    _user: User = PrivateAttr()
+    _embedder = PrivateAttr(default=None)
+
+    def __init__(self, user: User, embedder=None, **kwargs):
+        super().__init__(**kwargs)
+        self._user = user
+        self._embedder = embedder
+
     class InputSchema(BaseModel):
         query: str = Field(..., description="Search query for product FAQs")
         product_id: Optional[int] = Field(None, description="Optional specific product ID to filter")
-        user_id: Optional[int] = Field(None, description="Optional user ID to filter by business owner")
         limit: Optional[int] = Field(5, description="Maximum number of FAQ results to return")
         include_product_info: Optional[bool] = Field(True, description="Whether to include full product details")
     
     args_schema: Type[BaseModel] = InputSchema
     
-    def _run(self, query: str, product_id: Optional[int] = None, 
-             user_id: Optional[int] = None, limit: int = 5,
-             include_product_info: bool = True) -> str:
+    def _run(self, query: str, product_id: Optional[int] = None,
+             limit: int = 5, include_product_info: bool = True) -> str:
         try:
-            query = query.lower().strip()
-            results = self._search_product_faqs(query, product_id, user_id, limit)
+            query = query.strip()
+            results = self._search_product_faqs(query, product_id, limit)
             return self._format_results(results, query, include_product_info)
         except Exception as e:
             logger.error(f"Product FAQ search failed for query '{query}': {str(e)}")
             return f"Error searching product FAQs: {str(e)}"
 
-    def _search_product_faqs(self, query: str, product_id: Optional[int],
-                           user_id: Optional[int], limit: int) -> List[ProductFAQ]:
-        queryset = ProductFAQ.objects.select_related('product', 'product__category')
-        
+    def _search_product_faqs(self, query: str, product_id: Optional[int], limit: int) -> List[ProductFAQ]:
+        """Vector top-k over the owner's product FAQs, with a full-text fallback."""
+        queryset = ProductFAQ.objects.for_owner(self._user).select_related('product')
         if product_id:
             queryset = queryset.filter(product_id=product_id)
-        if user_id:
-            queryset = queryset.filter(product__user_id=user_id)
-            
-        return list(queryset.filter(
-            Q(question__icontains=query) | Q(answer__icontains=query)
-        ).order_by('-product__stock')[:limit])
+
+        query_embedding = self._embed_query(query)
+        if query_embedding is not None:
+            closest = nearest(queryset.nearest(query_embedding), limit)
+            relevant = [faq for faq in closest if faq.similarity >= MIN_SIMILARITY]
+            if relevant:
+                return relevant
+
+        return list(queryset.lexical(query)[:limit])
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        try:
+            if self._embedder is None:
+                from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+                self._embedder = HuggingFaceEmbeddingService()
+            return self._embedder.embed_text(query)
+        except Exception as e:
+            logger.warning(f"Product FAQ query embedding failed, using lexical search: {str(e)}")
+            return None
 
     def _format_results(self, faqs: List[ProductFAQ], query: str, include_product_info: bool) -> str:
         if not faqs:
@@ -2,12 +2,18 @@ from langchain_core.tools import BaseTool
 from typing import List, Type, Optional
 import logging
 from pydantic import BaseModel, Field, PrivateAttr, model_validator # ✅ Use model_validator
-from django.db.models import Q
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Left
+from business.catalog import CatalogSnapshot, snapshots_enabled
 from business.models import Product, ProductCategory
 from account.models import User
 
 logger = logging.getLogger(__name__)
 
+# Characters of the description shown to the model; only one more is fetched
+# so the formatter can tell whether to add an ellipsis.
+DESCRIPTION_PREVIEW_LENGTH = 100
+
 
 # Pydantic model for a structured Product result
 class ProductSearchResult(BaseModel):
@@ -83,72 +89,92 @@ class ProductSearchTool(BaseTool):
     def _search_products_raw(self, **kwargs) -> List[ProductSearchResult]:
         """
         Handles the product search and returns Pydantic models.
-        For general queries, it returns the newest products.
+        Name searches are ranked by full-text/trigram relevance, other filtered
+        queries are ordered by name, and general queries return the newest products.
+        Only the columns the formatter uses are fetched, in a single query, or
+        the tenant's in-memory catalog snapshot answers when enabled.
         """
-        queryset = Product.objects.select_related('category').filter(user=self._user)
-        
-        
-        # --- Start of new logic ---
         filters_applied = any([
-            kwargs.get('name'),
             kwargs.get('category'),
             kwargs.get('min_price') is not None,
             kwargs.get('max_price') is not None,
             kwargs.get('in_stock') is not None
         ])
-        # --- End of new logic ---
-        
-        if kwargs.get('name'):
-            queryset = queryset.filter(Q(name__icontains=kwargs['name']) | Q(description__icontains=kwargs['name']))
-        
-        if kwargs.get('category'):
-            queryset = queryset.filter(category__name__icontains=kwargs['category'])
-            
-        if kwargs.get('min_price') is not None:
-            queryset = queryset.filter(price__gte=kwargs['min_price'])
-            
-        if kwargs.get('max_price') is not None:
-            queryset = queryset.filter(price__lte=kwargs['max_price'])
-            
-        if kwargs.get('in_stock'):
-            queryset = queryset.filter(stock__gt=0)
-            
-        limit = kwargs.get('limit', 10)
-        results = list(queryset.order_by('name')[:limit])
-        
-        
-        # --- Modified result fetching ---
-        if not filters_applied:
-        # For general queries, use the default ordering ('-created_at') to get the newest products.
-            results = list(queryset[:limit])
+        limit = kwargs.get('limit') or 10
+
+        snapshot = CatalogSnapshot.for_tenant(self._user.id) if snapshots_enabled() else None
+        if snapshot is not None:
+            positions = snapshot.search(
+                name=kwargs.get('name'),
+                category=kwargs.get('category'),
+                min_price=kwargs.get('min_price'),
+                max_price=kwargs.get('max_price'),
+                in_stock=kwargs.get('in_stock'),
+                ordering='name' if filters_applied and not kwargs.get('name') else None,
+                limit=limit,
+            )
+            rows = [
+                dict(row, category_name=row['category_name'] or 'Uncategorized',
+                     description_preview=row['description'][:DESCRIPTION_PREVIEW_LENGTH + 1])
+                for row in snapshot.rows(positions)
+            ]
         else:
-        # For specific searches, order by name for predictable results.
-            results = list(queryset.order_by('name')[:limit])
-        # --- End of modified logic --
-            
+            rows = self._query_products(kwargs, filters_applied, limit)
+
         return [
             ProductSearchResult(
-                id=p.id,
-                name=p.name,
-                price=float(p.price),
-                stock=p.stock,
-                category=p.category.name if p.category else "Uncategorized",
-                description=p.description
-            ) for p in results
+                id=row['id'],
+                name=row['name'],
+                price=float(row['price']),
+                stock=row['stock'],
+                category=row['category_name'],
+                description=row['description_preview']
+            ) for row in rows
         ]
 
+    def _query_products(self, filters: dict, filters_applied: bool, limit: int):
+        queryset = Product.objects.filter(user=self._user)
+
+        if filters.get('name'):
+            queryset = queryset.search(filters['name'])
+
+        if filters.get('category'):
+            queryset = queryset.filter(category__name__icontains=filters['category'])
+            
+        if filters.get('min_price') is not None:
+            queryset = queryset.filter(price__gte=filters['min_price'])
+            
+        if filters.get('max_price') is not None:
+            queryset = queryset.filter(price__lte=filters['max_price'])
+            
+        if filters.get('in_stock'):
+            queryset = queryset.filter(stock__gt=0)
+
+        # search() already orders by rank; general queries keep the default
+        # ordering ('-created_at') to get the newest products.
+        if filters_applied and not filters.get('name'):
+            queryset = queryset.order_by('name')
+
+        return queryset.values(
+            'id', 'name', 'price', 'stock',
+            category_name=Coalesce('category__name', Value('Uncategorized')),
+            description_preview=Left('description', DESCRIPTION_PREVIEW_LENGTH + 1),
+        )[:limit]
+
     def _format_results(self, results: List[ProductSearchResult]) -> str:
         """Format the search results from a list of Pydantic models"""
         formatted_list = [f"Found {len(results)} products matching your criteria:"]
         
         for product in results:
             stock_status = "In Stock" if product.stock > 0 else "Out of Stock"
+            description = product.description[:DESCRIPTION_PREVIEW_LENGTH]
+            ellipsis = '...' if len(product.description) > DESCRIPTION_PREVIEW_LENGTH else ''
             formatted_list.append(
                 f"\n- Product Name: {product.name}"
                 f"\n  Price: ${product.price:.2f}"
                 f"\n  Category: {product.category}"
                 f"\n  Stock: {product.stock} ({stock_status})"
-                f"\n  Description: {product.description[:100]}{'...' if len(product.description) > 100 else ''}"
+                f"\n  Description: {description}{ellipsis}"
                 f"\n  ID: {product.id}"
             )
         
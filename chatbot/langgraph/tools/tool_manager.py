@@ -21,8 +21,8 @@ class ToolManager:
         """Get all available tools with initialization checks"""
         try:
             return [
-                FAQSearchTool(),
-                ProductFAQSearchTool(),
+                FAQSearchTool(user=user),
+                ProductFAQSearchTool(user=user),
                 ProductSearchTool(user=user),
                 OrderConfirmationTool(user=user),
                 GetOrderHistoryTool(user=user, social_user=social_user)
@@ -0,0 +1,85 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+from knowledge_base.models import FAQ
+from business.models import Product
+"""
+python manage.py benchmark_embeddings
+python manage.py benchmark_embeddings --backends endpoint onnx --texts 256 --concurrency 16
+"""
+
+SAMPLE_QUERIES = [
+    "how long does delivery take inside Dhaka",
+    "iphone 14 er dam koto",
+    "do you have cash on delivery",
+    "is the sony headphone in stock",
+    "what is your return policy for damaged items",
+    "ami ekta saree order korte chai",
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Compare latency and throughput of the embedding backends"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', default=['endpoint', 'sentence-transformers', 'onnx'],
+            help="EMBEDDING_BACKEND values to compare"
+        )
+        parser.add_argument('--texts', type=int, default=128, help="Number of texts embedded per measurement")
+        parser.add_argument('--concurrency', type=int, default=8, help="Threads calling embed_text at once")
+
+    def handle(self, *args, **options):
+        texts = self._sample_texts(options['texts'])
+        self.stdout.write(f"{len(texts)} texts, {options['concurrency']} concurrent callers")
+
+        for backend in options['backends']:
+            try:
+                started = time.perf_counter()
+                # Uncached, so every call reaches the model.
+                service = HuggingFaceEmbeddingService.create(backend, use_cache=False)
+                service.embed_text(texts[0])  # warm-up, and the first model call for local backends
+                load_time = time.perf_counter() - started
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"{backend:<22} unavailable: {e}"))
+                continue
+
+            latencies = []
+            for text in texts[:32]:
+                started = time.perf_counter()
+                service.embed_text(text)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                list(executor.map(service.embed_text, texts))
+            concurrent_rate = len(texts) / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            service.embed_batch(texts)
+            batch_rate = len(texts) / (time.perf_counter() - started)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{backend:<22} load={load_time:.1f}s "
+                f"single p50={statistics.median(latencies):.1f}ms p95={percentile(latencies, 0.95):.1f}ms "
+                f"concurrent={concurrent_rate:.1f} texts/s batch={batch_rate:.1f} texts/s"
+            ))
+
+    def _sample_texts(self, count):
+        """FAQ and product texts from the database, padded with sample chat queries."""
+        texts = [faq.document_text for faq in FAQ.objects.all()[:count]]
+        texts += [
+            f"{name}\n{description}" for name, description
+            in Product.objects.values_list('name', 'description')[:count - len(texts)]
+        ]
+        while len(texts) < count:
+            texts.append(f"{SAMPLE_QUERIES[len(texts) % len(SAMPLE_QUERIES)]} #{len(texts)}")
+        return texts
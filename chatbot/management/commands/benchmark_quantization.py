@@ -0,0 +1,212 @@
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pgvector.psycopg import register_vector
+from business.models import Product, ProductFAQ
+from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+from chatbot.services.faiss_index import QUANTIZERS, build_index
+from chatbot.services.vector_search import (
+    QUANTIZED_TYPES, ann_search, check_quantization_support, index_method_sql, quantized_column,
+)
+from knowledge_base.benchmark import FAQ_QUERIES
+from knowledge_base.models import FAQ
+
+User = get_user_model()
+"""
+python manage.py seed_faqs && python manage.py seed_products
+python manage.py benchmark_quantization
+python manage.py benchmark_quantization --scale 100000 --k 10 --rescore-factor 1 4 10
+"""
+
+TABLE = 'vector_quantization_benchmark'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare float32, float16 and int8 vector storage on the seeded FAQs and products: "
+        "memory, index size, latency and recall@k with and without full-precision re-scoring"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='t@t.com', help="Business owner whose documents are used")
+        parser.add_argument('--k', type=int, default=3)
+        parser.add_argument(
+            '--scale', type=int, default=0,
+            help="Pad the corpus to this many vectors with perturbed copies of the seeded ones"
+        )
+        parser.add_argument('--rescore-factor', type=int, nargs='+', default=[1, settings.VECTOR_RESCORE_FACTOR])
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.k, self.repeat = options['k'], options['repeat']
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f"No user {options['email']}; run the seed commands first")
+        texts = (
+            [faq.document_text for faq in FAQ.objects.filter(category__user=user)]
+            + [faq.document_text for faq in ProductFAQ.objects.filter(product__user=user)]
+            + [product.document_text for product in Product.objects.filter(user=user)]
+        )
+        if not texts:
+            raise CommandError("No seeded FAQs or products found. Run `seed_faqs` and `seed_products` first.")
+        queries = [query for query, _ in FAQ_QUERIES] + [text.split('\n')[0] for text in texts]
+
+        embedder = HuggingFaceEmbeddingService()
+        vectors = self._normalized(embedder.embed_batch(texts))
+        queries = self._normalized(embedder.embed_batch(queries))
+        if options['scale'] > len(vectors):
+            rng = np.random.default_rng(options['seed'])
+            copies = vectors[rng.integers(len(vectors), size=options['scale'] - len(vectors))]
+            noise = rng.normal(scale=0.3 / np.sqrt(vectors.shape[1]), size=copies.shape).astype(np.float32)
+            vectors = np.vstack([vectors, self._normalized(copies + noise)])
+        ids = np.arange(len(vectors), dtype=np.int64)
+        self.stdout.write(
+            f"{len(vectors):,} vectors of {vectors.shape[1]} dimensions ({len(texts)} seeded), "
+            f"{len(queries)} queries, recall@{self.k} against exact float32 search"
+        )
+
+        truth = [set(row) for row in np.argsort(-(queries @ vectors.T), axis=1)[:, :self.k]]
+        self._benchmark_faiss(vectors, ids, queries, truth, options['rescore_factor'])
+        self._benchmark_pgvector(vectors, queries, truth, options['rescore_factor'])
+
+    @staticmethod
+    def _normalized(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _report(self, label, results, latencies, truth, memory):
+        recall = statistics.mean(len(set(found) & expected) / len(expected) for found, expected in zip(results, truth))
+        self.stdout.write(self.style.SUCCESS(
+            f"  {label:<28} {memory:<38} recall@{self.k}={recall:.3f} "
+            f"p50={statistics.median(latencies):.3f}ms p99={percentile(latencies, 0.99):.3f}ms"
+        ))
+
+    def _timed(self, queries, search):
+        results, latencies = [], []
+        for query in queries:
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                found = search(query)
+                latencies.append((time.perf_counter() - started) * 1000)
+            results.append(found)
+        return results, latencies
+
+    def _benchmark_faiss(self, vectors, ids, queries, truth, factors):
+        try:
+            import faiss
+        except ImportError:
+            self.stdout.write(self.style.WARNING("\nFAISS: skipped (faiss-cpu is not installed)"))
+            return
+        self.stdout.write("\nFAISS (in-process FAQ indexes)")
+        for quantization in [''] + list(QUANTIZERS):
+            for factor in (factors if quantization else [1]):
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, 'index.faiss')
+                    faiss.write_index(build_index(vectors, ids, quantization, rescore_factor=factor), path)
+                    file_size = os.path.getsize(path)
+                    # Loaded as TenantFAISSIndex serves it: the heap is paid by every worker, the pages
+                    # of the file mapped in by the searches are shared page cache.
+                    before = self._resident()
+                    index = faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+                    loaded = self._resident()
+                    results, latencies = self._timed(
+                        queries, lambda query: index.search(query[None, :], self.k)[1][0].tolist()
+                    )
+                    searched = self._resident()
+                    del index
+                if before is None:
+                    memory = f"file {file_size / 2**20:.1f}MiB"
+                else:
+                    memory = (
+                        f"heap {(loaded[0] - before[0]) / 2**20:.1f}MiB, mapped "
+                        f"{(searched[1] - before[1]) / 2**20:.1f}/{file_size / 2**20:.1f}MiB"
+                    )
+                if quantization:
+                    label = f"{quantization} re-score x{factor}" if factor > 1 else f"{quantization} no re-score"
+                else:
+                    label = "float32"
+                self._report(label, results, latencies, truth, memory)
+
+    @staticmethod
+    def _resident():
+        """(private heap, mapped file) bytes resident in this process, or None off Linux."""
+        try:
+            with open('/proc/self/status') as status:
+                fields = dict(line.split(':', 1) for line in status)
+        except OSError:
+            return None
+        return tuple(int(fields[name].split()[0]) * 1024 for name in ('RssAnon', 'RssFile'))
+
+    def _benchmark_pgvector(self, vectors, queries, truth, factors):
+        try:
+            check_quantization_support('float16')
+        except ImproperlyConfigured as e:
+            self.stdout.write(self.style.WARNING(f"\npgvector: skipped ({e})"))
+            return
+        self.stdout.write("\npgvector (langchain_pg_embedding, HNSW)")
+        dimensions = vectors.shape[1]
+        connection.ensure_connection()
+        register_vector(connection.connection)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+                cursor.execute(f"CREATE UNLOGGED TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({dimensions}))")
+                with cursor.copy(f"COPY {TABLE} (id, embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                    copy.set_types(['int8', 'vector'])
+                    for row_id, vector in enumerate(vectors):
+                        copy.write_row((row_id, vector))
+                cursor.execute(f"SELECT pg_size_pretty(pg_table_size('{TABLE}'))")
+                self.stdout.write(f"  table (float32 vectors kept for re-scoring): {cursor.fetchone()[0]}")
+
+            for quantization in [''] + list(QUANTIZED_TYPES):
+                with connection.cursor() as cursor:
+                    cursor.execute("SET maintenance_work_mem = '1GB'")
+                    cursor.execute(
+                        f"CREATE INDEX {TABLE}_ann ON {TABLE} "
+                        f"{index_method_sql('hnsw', quantization=quantization, dimensions=dimensions)}"
+                    )
+                    cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('{TABLE}_ann'))")
+                    memory = f"index {cursor.fetchone()[0]}"
+                for factor in (factors if quantization else [1]):
+                    label = (f"{quantization} re-score x{factor}" if factor > 1 else f"{quantization} no re-score") \
+                        if quantization else "float32"
+                    results, latencies = self._pg_search(queries, quantization, dimensions, factor)
+                    self._report(label, results, latencies, truth, memory)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP INDEX {TABLE}_ann")
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def _pg_search(self, queries, quantization, dimensions, factor):
+        if quantization:
+            sql = (
+                f"SELECT id FROM (SELECT id, embedding FROM {TABLE} "
+                f"ORDER BY {quantized_column('embedding', quantization, dimensions)} "
+                f"<=> %s::{QUANTIZED_TYPES[quantization]}({dimensions}) LIMIT %s) candidates "
+                f"ORDER BY embedding <=> %s LIMIT %s"
+            )
+            params = lambda query: [query, self.k * factor, query, self.k]  # noqa: E731
+        else:
+            sql = f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s LIMIT %s"
+            params = lambda query: [query, self.k]  # noqa: E731
+
+        with ann_search(ef_search=max(settings.VECTOR_HNSW_EF_SEARCH, self.k * factor)), connection.cursor() as cursor:
+            def search(query):
+                cursor.execute(sql, params(query))
+                return [row_id for (row_id,) in cursor.fetchall()]
+            return self._timed(queries, search)
@@ -0,0 +1,142 @@
+import statistics
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from pgvector.psycopg import register_vector
+from chatbot.services.vector_search import ann_search, index_method_sql
+"""
+python manage.py benchmark_vector_index
+python manage.py benchmark_vector_index --sizes 10000 100000 --queries 200 --k 10
+python manage.py benchmark_vector_index --sizes 1000000 --index hnsw --ef-search 40 100 200 --m 24
+"""
+
+TABLE = 'vector_index_benchmark'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Measure recall@k against query latency of the ANN indexes on synthetic embeddings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--dimensions', type=int, default=settings.EMBEDDING_DIMENSIONS)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--index', nargs='+', choices=['hnsw', 'ivfflat'], default=['hnsw', 'ivfflat'])
+        parser.add_argument('--m', type=int, default=settings.VECTOR_HNSW_M)
+        parser.add_argument('--ef-construction', type=int, default=settings.VECTOR_HNSW_EF_CONSTRUCTION)
+        parser.add_argument('--ef-search', type=int, nargs='+', default=[10, 20, 40, 80, 160, 320])
+        parser.add_argument('--probes', type=int, nargs='+', default=[1, 5, 10, 20, 50])
+        parser.add_argument(
+            '--tenants', type=int, default=100,
+            help="Rows are spread over this many tenants; the 'filtered' recall searches one of them"
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.k = options['k']
+        self.rng = np.random.default_rng(options['seed'])
+        # Embeddings of real texts cluster by topic; uniform random vectors would flatter the indexes.
+        self.centers = self.rng.normal(size=(256, options['dimensions'])).astype(np.float32)
+        connection.ensure_connection()
+        register_vector(connection.connection)
+
+        self.stdout.write(
+            f"k={self.k}, {options['queries']} queries, {options['dimensions']} dimensions, "
+            f"filtered = one tenant of {options['tenants']}, as planned by Postgres without the exact fallback"
+        )
+        for size in options['sizes']:
+            try:
+                self._benchmark(size, options)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def _vectors(self, count):
+        vectors = self.centers[self.rng.integers(len(self.centers), size=count)]
+        vectors = vectors + self.rng.normal(scale=0.6, size=vectors.shape).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _load(self, size, options):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {TABLE} "
+                f"(id bigint PRIMARY KEY, tenant integer NOT NULL, embedding vector({options['dimensions']}) NOT NULL)"
+            )
+            with cursor.copy(f"COPY {TABLE} (id, tenant, embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                copy.set_types(['int8', 'int4', 'vector'])
+                for start in range(0, size, 10_000):
+                    for offset, vector in enumerate(self._vectors(min(10_000, size - start))):
+                        row_id = start + offset
+                        copy.write_row((row_id, row_id % options['tenants'], vector))
+            cursor.execute(f"CREATE INDEX ON {TABLE} (tenant)")
+            cursor.execute(f"ANALYZE {TABLE}")
+        self.stdout.write(f"\n{size:,} vectors loaded in {time.perf_counter() - started:.1f}s")
+
+    def _search(self, queries, tenant=None, **search):
+        where = "WHERE tenant = %s" if tenant is not None else ""
+        sql = f"SELECT id FROM {TABLE} {where} ORDER BY embedding <=> %s LIMIT %s"
+        results, latencies = [], []
+        with ann_search(**search), connection.cursor() as cursor:
+            for query in queries:
+                params = ([tenant] if tenant is not None else []) + [query, self.k]
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                results.append({row_id for (row_id,) in cursor.fetchall()})
+                latencies.append((time.perf_counter() - started) * 1000)
+        return results, latencies
+
+    def _recall(self, results, truth):
+        return statistics.mean(len(found & expected) / max(1, len(expected)) for found, expected in zip(results, truth))
+
+    def _report(self, label, results, latencies, truth, filtered=None, filtered_truth=None):
+        line = (
+            f"  {label:<28} recall@{self.k}={self._recall(results, truth):.3f} "
+            f"p50={statistics.median(latencies):.2f}ms p99={percentile(latencies, 0.99):.2f}ms"
+        )
+        if filtered is not None:
+            line += f" filtered recall@{self.k}={self._recall(filtered, filtered_truth):.3f}"
+        self.stdout.write(self.style.SUCCESS(line))
+
+    def _benchmark(self, size, options):
+        self._load(size, options)
+        queries = self._vectors(options['queries'])
+
+        truth, latencies = self._search(queries, exact=True)
+        filtered_truth, _ = self._search(queries, tenant=0, exact=True)
+        self._report('exact scan', truth, latencies, truth)
+
+        for index_type in options['index']:
+            params = (
+                {'m': options['m'], 'ef_construction': options['ef_construction']} if index_type == 'hnsw'
+                # pgvector's guidance: rows / 1000 lists up to 1M rows.
+                else {'lists': max(1, size // 1000)}
+            )
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute("SET maintenance_work_mem = '1GB'")
+                cursor.execute(f"CREATE INDEX {TABLE}_ann ON {TABLE} {index_method_sql(index_type, **params)}")
+                cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('{TABLE}_ann'))")
+                (index_size,) = cursor.fetchone()
+            self.stdout.write(
+                f" {index_type} {params}: built in {time.perf_counter() - started:.1f}s, {index_size}"
+            )
+
+            sweep = options['ef_search'] if index_type == 'hnsw' else options['probes']
+            setting = 'ef_search' if index_type == 'hnsw' else 'probes'
+            for value in sweep:
+                results, latencies = self._search(queries, **{setting: value})
+                filtered, _ = self._search(queries, tenant=0, **{setting: value})
+                self._report(f"{setting}={value}", results, latencies, truth, filtered, filtered_truth)
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP INDEX {TABLE}_ann")
@@ -0,0 +1,77 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.apps import apps
+from chatbot.langchain import FAQVectorSearch
+from chatbot.services.vector_index import INDEXED_SOURCES, bulk_index
+"""
+python manage.py bulk_index_vectors
+python manage.py bulk_index_vectors --source knowledge_base.FAQ --user 3
+python manage.py bulk_index_vectors --workers 8 --batch-size 128 --restart
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed and index every FAQ, product and product FAQ, resuming an interrupted run, "
+        "then build the FAISS FAQ indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', choices=sorted(INDEXED_SOURCES),
+            help="Only index this model (repeatable)"
+        )
+        parser.add_argument('--user', type=int, help="Only index this business owner's rows")
+        parser.add_argument('--batch-size', type=int, default=64, help="Texts per embedding call")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows fetched per database round trip")
+        parser.add_argument('--workers', type=int, default=4, help="Embedding calls in flight")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of an interrupted run")
+        parser.add_argument('--skip-faiss', action='store_true', help="Do not build the FAISS FAQ indexes")
+
+    def handle(self, *args, **options):
+        labels = options['source'] or list(INDEXED_SOURCES)
+        for label in labels:
+            self.stdout.write(f"Indexing {label}...")
+            self._reported_at = -5
+            started = time.perf_counter()
+            written = bulk_index(
+                label,
+                owner_id=options['user'],
+                batch_size=options['batch_size'],
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                restart=options['restart'],
+                progress=self._progress,
+            )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {written} documents indexed in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.1f} docs/sec)"
+            ))
+
+        if 'knowledge_base.FAQ' in labels and not options['skip_faiss']:
+            self._build_faiss_indexes(options['user'])
+
+    def _progress(self, written, elapsed):
+        # About one line every five seconds.
+        if elapsed - self._reported_at < 5:
+            return
+        self._reported_at = elapsed
+        self.stdout.write(f"  {written} documents, {written / max(elapsed, 1e-9):.1f} docs/sec")
+
+    def _build_faiss_indexes(self, user_id):
+        owners = (
+            apps.get_model('knowledge_base.FAQ').objects
+            .annotate(owner_id=F(INDEXED_SOURCES['knowledge_base.FAQ']))
+            .values_list('owner_id', flat=True).distinct().order_by('owner_id')
+        )
+        if user_id is not None:
+            owners = owners.filter(owner_id=user_id)
+        try:
+            for owner_id in owners:
+                added, removed = FAQVectorSearch(owner_id).initialize_vectorstore()
+                self.stdout.write(f"FAISS index of user {owner_id}: {added} FAQs embedded, {removed} removed")
+        except ImproperlyConfigured as e:
+            self.stdout.write(self.style.WARNING(f"Skipping the FAISS FAQ indexes: {e}"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from chatbot.models import VectorIndexOutbox
+from chatbot.services.vector_index import INDEXED_SOURCES, VectorIndexer
+"""
+python manage.py reconcile_vector_index
+python manage.py reconcile_vector_index --source knowledge_base.FAQ --user 3 --process
+python manage.py reconcile_vector_index --dry-run
+"""
+
+
+class Command(BaseCommand):
+    help = "Queue re-indexing for rows whose vectors are missing or stale, and deletion of orphaned vectors"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', choices=sorted(INDEXED_SOURCES),
+            help="Only reconcile this model (repeatable)"
+        )
+        parser.add_argument('--user', type=int, action='append', help="Only reconcile this business owner (repeatable)")
+        parser.add_argument('--dry-run', action='store_true', help="Report the differences without queueing them")
+        parser.add_argument('--process', action='store_true', help="Apply the outbox in this process afterwards")
+
+    def handle(self, *args, **options):
+        if options['dry_run'] and options['process']:
+            raise CommandError("--dry-run and --process cannot be combined")
+
+        pending = VectorIndexOutbox.objects.count()
+        counts = VectorIndexer.reconcile(
+            source_types=options['source'], owner_ids=options['user'], dry_run=options['dry_run']
+        )
+        verb = "Found" if options['dry_run'] else "Queued"
+        self.stdout.write(
+            f"{verb} {counts['upsert']} upserts and {counts['delete']} deletes "
+            f"({pending} entries were already pending)"
+        )
+
+        if options['process']:
+            applied = VectorIndexer.process()
+            failed = VectorIndexOutbox.objects.filter(attempts__gt=0).count()
+            self.stdout.write(self.style.SUCCESS(f"Applied {applied} entries, {failed} failing"))
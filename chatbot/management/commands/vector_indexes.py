@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from chatbot.services.llm.vector_store import VectorStoreManager
+"""
+python manage.py vector_indexes
+python manage.py vector_indexes --rebuild --m 24 --ef-construction 128
+python manage.py vector_indexes --rebuild --type ivfflat --lists 1000
+python manage.py vector_indexes --rebuild --quantization float16
+"""
+
+
+class Command(BaseCommand):
+    help = "Create or rebuild the ANN index on langchain_pg_embedding and list the vector indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=['hnsw', 'ivfflat'], default=settings.VECTOR_INDEX_TYPE)
+        parser.add_argument('--rebuild', action='store_true', help="Drop and rebuild the ANN index")
+        parser.add_argument('--m', type=int, default=settings.VECTOR_HNSW_M)
+        parser.add_argument('--ef-construction', type=int, default=settings.VECTOR_HNSW_EF_CONSTRUCTION)
+        parser.add_argument('--lists', type=int, default=settings.VECTOR_IVFFLAT_LISTS)
+        parser.add_argument(
+            '--quantization', choices=['', 'float16'], default=settings.VECTOR_QUANTIZATION,
+            help="Index halfvec copies of the vectors; searches must run with the same VECTOR_QUANTIZATION"
+        )
+        parser.add_argument(
+            '--maintenance-work-mem', default='1GB',
+            help="Index build memory; HNSW builds are much faster when the graph fits"
+        )
+
+    def handle(self, *args, **options):
+        params = (
+            {'m': options['m'], 'ef_construction': options['ef_construction']}
+            if options['type'] == 'hnsw' else {'lists': options['lists']}
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('maintenance_work_mem', %s, false)", [options['maintenance_work_mem']])
+        statements = VectorStoreManager.ensure_indexes(
+            options['type'], rebuild=options['rebuild'], quantization=options['quantization'], **params
+        )
+        if not statements:
+            self.stdout.write("langchain_pg_embedding does not exist yet; it is indexed when first created")
+        for statement in statements:
+            self.stdout.write(statement)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relname, t.relname, pg_size_pretty(pg_relation_size(c.oid)), pg_get_indexdef(c.oid)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE am.amname IN ('hnsw', 'ivfflat')
+                ORDER BY t.relname
+                """
+            )
+            for name, table, size, definition in cursor.fetchall():
+                self.stdout.write(self.style.SUCCESS(f"{table}.{name} ({size}): {definition}"))
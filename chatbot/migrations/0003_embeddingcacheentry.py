@@ -0,0 +1,26 @@
+# Generated by Django 5.2.2 on 2026-10-19 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_aiconfiguration_total_input_tokens_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255)),
+                ('text_hash', models.CharField(help_text='sha256 of the normalized text', max_length=64)),
+                ('vector', models.BinaryField(help_text='float16 components')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model_name', 'text_hash'), name='unique_embedding_cache_entry')],
+            },
+        ),
+    ]
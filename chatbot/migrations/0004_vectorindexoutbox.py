@@ -0,0 +1,31 @@
+# Generated by Django 5.2.2 on 2026-10-19 12:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_embeddingcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VectorIndexOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(help_text="Model label, e.g. 'knowledge_base.FAQ'", max_length=100)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('owner_id', models.PositiveBigIntegerField(help_text='Business owner whose collection holds the vector', null=True)),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['enqueued_at'],
+                'constraints': [models.UniqueConstraint(fields=('source_type', 'source_id'), name='unique_vector_index_outbox_source')],
+            },
+        ),
+    ]
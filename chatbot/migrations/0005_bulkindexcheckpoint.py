@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0004_vectorindexoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkIndexCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_key', models.CharField(help_text='Source model label and owner filter', max_length=200, unique=True)),
+                ('last_id', models.PositiveBigIntegerField(default=0, help_text='Highest primary key already indexed')),
+                ('indexed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
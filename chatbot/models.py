@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -118,4 +119,60 @@ class AIConfiguration(models.Model):
             'output_tokens': self.total_output_tokens,
             'total_tokens': self.total_tokens,
         }
-    
\ No newline at end of file
+    
+
+class EmbeddingCacheEntry(models.Model):
+    """An embedding computed once for a given model and text (see chatbot.services.embedding_cache)."""
+    model_name = models.CharField(max_length=255)
+    text_hash = models.CharField(max_length=64, help_text="sha256 of the normalized text")
+    vector = models.BinaryField(help_text="float16 components")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'text_hash'], name='unique_embedding_cache_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name}:{self.text_hash[:12]}"
+
+
+class VectorIndexOutbox(models.Model):
+    """
+    A pending change to the vector index, written in the same transaction as
+    the change to the source row (see chatbot.services.vector_index).
+    """
+    class Operation(models.TextChoices):
+        UPSERT = 'upsert', 'Upsert'
+        DELETE = 'delete', 'Delete'
+
+    source_type = models.CharField(max_length=100, help_text="Model label, e.g. 'knowledge_base.FAQ'")
+    source_id = models.PositiveBigIntegerField()
+    owner_id = models.PositiveBigIntegerField(null=True, help_text="Business owner whose collection holds the vector")
+    operation = models.CharField(max_length=10, choices=Operation.choices)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['enqueued_at']
+        constraints = [
+            models.UniqueConstraint(fields=['source_type', 'source_id'], name='unique_vector_index_outbox_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} {self.source_type}:{self.source_id}"
+
+
+class BulkIndexCheckpoint(models.Model):
+    """
+    Progress of a bulk_index run over one source (and owner), so an
+    interrupted run resumes after ``last_id``. Removed when the run completes.
+    """
+    run_key = models.CharField(max_length=200, unique=True, help_text="Source model label and owner filter")
+    last_id = models.PositiveBigIntegerField(default=0, help_text="Highest primary key already indexed")
+    indexed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.run_key} after {self.last_id}"
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from typing import Callable, Dict, List
+import logging
+import unicodedata
+
+import numpy as np
+from django.db import transaction
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize and collapse whitespace; texts equal after this share an embedding."""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def text_hash(text: str) -> str:
+    return sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model name, sha256 of the normalized text).
+
+    Vectors are persisted as float16 blobs in ``EmbeddingCacheEntry`` so every
+    worker and every re-index shares them, with an in-process LRU in front.
+    float16 keeps ~3 significant digits, far below what moves a cosine ranking.
+    Cache failures never fail an embedding call; they only cost a model call.
+    """
+
+    LRU_SIZE = 4096
+
+    _lru: 'OrderedDict[tuple, List[float]]' = OrderedDict()
+    _lock = Lock()
+
+    @staticmethod
+    def encode(vector) -> bytes:
+        return np.asarray(vector, dtype=np.float16).tobytes()
+
+    @staticmethod
+    def decode(blob) -> List[float]:
+        return np.frombuffer(bytes(blob), dtype=np.float16).astype(np.float32).tolist()
+
+    @classmethod
+    def get_many(cls, model_name: str, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with cls._lock:
+            for digest in hashes:
+                vector = cls._lru.get((model_name, digest))
+                if vector is not None:
+                    cls._lru.move_to_end((model_name, digest))
+                    found[digest] = vector
+
+        missing = [digest for digest in hashes if digest not in found]
+        if missing:
+            from chatbot.models import EmbeddingCacheEntry
+            try:
+                # A savepoint, so a failing lookup cannot break the caller's transaction.
+                with transaction.atomic():
+                    rows = list(EmbeddingCacheEntry.objects.filter(
+                        model_name=model_name, text_hash__in=missing
+                    ).values_list('text_hash', 'vector'))
+                stored = {digest: cls.decode(blob) for digest, blob in rows}
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {str(e)}")
+                stored = {}
+            cls._remember(model_name, stored)
+            found.update(stored)
+        return found
+
+    @classmethod
+    def set_many(cls, model_name: str, vectors: Dict[str, List[float]]):
+        from chatbot.models import EmbeddingCacheEntry
+        # Store what readers will get back from the database, so LRU and DB hits agree.
+        rounded = {digest: cls.decode(cls.encode(vector)) for digest, vector in vectors.items()}
+        cls._remember(model_name, rounded)
+        try:
+            with transaction.atomic():
+                EmbeddingCacheEntry.objects.bulk_create(
+                    [
+                        EmbeddingCacheEntry(model_name=model_name, text_hash=digest, vector=cls.encode(vector))
+                        for digest, vector in vectors.items()
+                    ],
+                    ignore_conflicts=True,
+                )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    @classmethod
+    def _remember(cls, model_name: str, vectors: Dict[str, List[float]]):
+        with cls._lock:
+            for digest, vector in vectors.items():
+                cls._lru[(model_name, digest)] = vector
+                cls._lru.move_to_end((model_name, digest))
+            while len(cls._lru) > cls.LRU_SIZE:
+                cls._lru.popitem(last=False)
+
+    @classmethod
+    def embed(cls, model_name: str, texts: List[str], compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Embed ``texts``, calling ``compute`` only for texts never embedded with
+        ``model_name`` before (each distinct text once).
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = cls.get_many(model_name, list(dict.fromkeys(hashes)))
+
+        pending: Dict[str, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found:
+                pending.setdefault(digest, text)
+        if pending:
+            computed = dict(zip(pending, compute(list(pending.values()))))
+            cls.set_many(model_name, computed)
+            found.update(computed)
+        return [found[digest] for digest in hashes]
+
+    @classmethod
+    def clear_local(cls):
+        """Empty this process's LRU (the database entries stay)."""
+        with cls._lock:
+            cls._lru.clear()
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` wrapper that serves repeated texts from ``EmbeddingCache``."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str = None):
+        self.embeddings = embeddings
+        self.model_name = (
+            model_name
+            or getattr(embeddings, 'model_name', None)
+            or getattr(embeddings, 'model', None)
+            or type(embeddings).__name__
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return EmbeddingCache.embed(self.model_name, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some providers embed queries differently from documents, so they get their own namespace.
+        return EmbeddingCache.embed(
+            f"{self.model_name}#query", [text], lambda texts: [self.embeddings.embed_query(texts[0])]
+        )[0]
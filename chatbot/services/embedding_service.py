@@ -1,25 +1,153 @@
-from typing import List
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import Callable, List, Tuple
 from django.conf import settings
-# from langchain_huggingface import HuggingFaceEmbeddings
+from django.core.exceptions import ImproperlyConfigured
 from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from chatbot.services.embedding_cache import EmbeddingCache
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+MAX_TEXT_LENGTH = 8192
+
+# EMBEDDING_BACKEND values that run the model inside this process.
+LOCAL_BACKENDS = {
+    'sentence-transformers': 'torch',
+    'onnx': 'onnx',
+}
+
+
+class LocalEmbeddings:
+    """
+    ``EMBEDDING_MODEL`` loaded in-process on CPU through sentence-transformers,
+    either with PyTorch or with ONNX Runtime (``pip install sentence-transformers[onnx]``).
+    Vectors are L2-normalized, which leaves cosine distances unchanged.
+    """
+
+    def __init__(self, model_name: str, backend: str = 'torch', batch_size: int = 32):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                "The local embedding backends require the sentence-transformers package."
+            ) from e
+        started = time.perf_counter()
+        self.model = SentenceTransformer(model_name, device='cpu', backend=backend)
+        self.batch_size = batch_size
+        logger.info(f"Loaded {model_name} ({backend}) in {time.perf_counter() - started:.1f}s")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-text requests into one forward pass.
+
+    The worker takes the first waiting text, then keeps collecting for at most
+    ``max_wait_ms`` or until ``max_batch_size`` texts are queued, and encodes
+    them together. A lone request therefore pays at most ``max_wait_ms`` extra.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], max_batch_size: int = 32, max_wait_ms: float = 5):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Queue = Queue()
+        self._worker = Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
 
 class HuggingFaceEmbeddingService:
-    """Production-ready HuggingFace embeddings service"""
+    """
+    Production-ready HuggingFace embeddings service.
+
+    ``settings.EMBEDDING_BACKEND`` selects the remote inference endpoint
+    ('endpoint') or an in-process model ('sentence-transformers' or 'onnx'),
+    which is loaded once per process. With a local model, concurrent
+    ``embed_text`` calls are micro-batched into one forward pass. Texts embedded
+    before, by any worker, are served from ``EmbeddingCache``.
+    """
 
     _instance = None
+    _lock = Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.model = cls._initialize_model()
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls.create(getattr(settings, 'EMBEDDING_BACKEND', 'endpoint'))
         return cls._instance
 
+    @classmethod
+    def create(cls, backend: str, use_cache: bool = True) -> 'HuggingFaceEmbeddingService':
+        """Build a service for ``backend`` that is not shared (the benchmark compares several)."""
+        service = super().__new__(cls)
+        service.backend = backend
+        service.use_cache = use_cache
+        service.model = cls._initialize_model(backend)
+        service._batcher = None
+        if backend in LOCAL_BACKENDS:
+            service._batcher = MicroBatcher(
+                service.model.embed_documents,
+                max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS,
+            )
+        return service
+
     @staticmethod
-    def _initialize_model():
+    def _initialize_model(backend: str):
+        if backend in LOCAL_BACKENDS:
+            return LocalEmbeddings(
+                settings.EMBEDDING_MODEL,
+                backend=LOCAL_BACKENDS[backend],
+                batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+            )
+        if backend != 'endpoint':
+            raise ImproperlyConfigured(f"Unknown EMBEDDING_BACKEND '{backend}'")
 
         return HuggingFaceEndpointEmbeddings(
             model=settings.EMBEDDING_MODEL,
@@ -28,40 +156,47 @@ class HuggingFaceEmbeddingService:
             # timeout=120,  # timeout for API calls
         )
 
-        # device = "cuda" if torch.cuda.is_available() else "cpu"
-        # return HuggingFaceEmbeddings(
-        #     model_name=settings.EMBEDDING_MODEL,
-        #     model_kwargs={'device': device},
-        #     encode_kwargs={
-        #         'normalize_embeddings': True,
-        #         'batch_size': 32  # Optimized for throughput
-        #     }
-        # )
-
     def embed_text(self, text: str) -> List[float]:
         """Get embeddings for a single text with proper validation"""
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
-        
+
+        text = text[:MAX_TEXT_LENGTH]  # Safe truncation
         try:
-            return self.model.embed_query(text[:8192])  # Safe truncation
+            if not self.use_cache:
+                return self._embed_one(text)
+            return EmbeddingCache.embed(settings.EMBEDDING_MODEL, [text], lambda texts: [self._embed_one(texts[0])])[0]
         except Exception as e:
             logger.error(f"Embedding failed for text: {e}")
             raise
-    
+
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """Batch process multiple texts efficiently"""
         if not texts:
             return []
-        
+
+        texts = [t[:MAX_TEXT_LENGTH] for t in texts]
         try:
-            # Process in chunks to avoid hitting API limits
-            batch_size = 32  # Adjust based on your API plan
-            results = []
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                results.extend(self.model.embed_documents([t[:8192] for t in batch]))
-            return results
+            if not self.use_cache:
+                return self._embed_many(texts)
+            return EmbeddingCache.embed(settings.EMBEDDING_MODEL, texts, self._embed_many)
         except Exception as e:
             logger.error(f"Batch embedding failed: {e}")
             raise
+
+    # LangChain Embeddings interface, used by the PGVector store.
+    embed_query = embed_text
+    embed_documents = embed_batch
+
+    def _embed_one(self, text: str) -> List[float]:
+        if self._batcher is not None:
+            return self._batcher.submit(text).result()
+        return self.model.embed_query(text)
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        # Process in chunks to avoid hitting API limits (and to bound memory locally)
+        batch_size = settings.EMBEDDING_MAX_BATCH_SIZE
+        results = []
+        for i in range(0, len(texts), batch_size):
+            results.extend(self.model.embed_documents(texts[i:i + batch_size]))
+        return results
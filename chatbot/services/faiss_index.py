@@ -0,0 +1,244 @@
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Tuple
+import fcntl
+import json
+import logging
+import os
+import re
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from langchain_core.embeddings import Embeddings
+from chatbot.services.embedding_cache import text_hash
+
+logger = logging.getLogger(__name__)
+
+
+def _faiss():
+    try:
+        import faiss
+    except ImportError as e:
+        raise ImproperlyConfigured("FAISS FAQ search requires the faiss-cpu package.") from e
+    return faiss
+
+
+# settings.FAISS_QUANTIZATION values and the scalar quantizer storing them.
+QUANTIZERS = {
+    'float16': 'QT_fp16',
+    'int8': 'QT_8bit',
+}
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, quantization: str = '', rescore_factor: int = None):
+    """
+    An ID-mapped inner-product index of normalized ``vectors``.
+
+    Without ``quantization`` the vectors are stored as float32. With 'float16'
+    or 'int8' a scalar quantizer stores 2 or 1 bytes per dimension (int8 learns
+    each dimension's range from ``vectors``) and searches scan those codes for
+    ``k * rescore_factor`` candidates, which are re-scored from a float32 copy.
+    """
+    faiss = _faiss()
+    if not quantization:
+        index = faiss.IndexFlatIP(vectors.shape[1])
+    elif quantization in QUANTIZERS:
+        qtype = getattr(faiss.ScalarQuantizer, QUANTIZERS[quantization])
+        index = faiss.IndexRefineFlat(
+            faiss.IndexScalarQuantizer(vectors.shape[1], qtype, faiss.METRIC_INNER_PRODUCT)
+        )
+        index.k_factor = rescore_factor or settings.VECTOR_RESCORE_FACTOR
+        index.train(vectors)
+    else:
+        raise ImproperlyConfigured(f"Unknown FAISS_QUANTIZATION '{quantization}'")
+    index = faiss.IndexIDMap2(index)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+class TenantFAISSIndex:
+    """
+    One business owner's FAQs in a FAISS index on disk, per embedding model.
+
+    Files live under ``settings.FAISS_INDEX_DIR/<model>/``: ``user_<id>.faiss``
+    (an ID map over a flat inner-product index of normalized vectors, so search
+    scores are cosine similarities and IDs are FAQ primary keys) and
+    ``user_<id>.json`` (the content hash indexed for each FAQ). The index is
+    memory-mapped read-only on first search (``IO_FLAG_MMAP_IFC``): its vectors
+    stay in the page cache, shared by every worker process, and only the ID
+    map is copied into each process. FAQ edits touch ``user_<id>.stale`` (see
+    ``mark_stale``); the next search then re-embeds only the changed FAQs,
+    rewrites the files atomically under a file lock, and every process remaps
+    them.
+
+    With ``quantization`` ('float16' or 'int8', default
+    ``settings.FAISS_QUANTIZATION``) searches scan scalar-quantized codes and
+    re-score the top candidates at full precision (see ``build_index``). The
+    codes and the float32 copy are both mapped, so neither costs per-worker
+    memory; re-scoring reads only the candidates' rows of the copy, with the
+    kernel's read-ahead around them. Such an index cannot remove vectors; each
+    sync rebuilds it from the stored vectors, embedding only the changed FAQs.
+    """
+
+    _loaded: Dict[Path, Tuple[int, object]] = {}
+    _lock = Lock()
+
+    def __init__(self, embeddings: Embeddings, user_id: int, model_name: str = None, quantization: str = None):
+        self.embeddings = embeddings
+        self.user_id = user_id
+        self.quantization = settings.FAISS_QUANTIZATION if quantization is None else quantization
+        model_name = model_name or getattr(embeddings, 'model_name', None) or type(embeddings).__name__
+        self.directory = self.model_directory(model_name)
+        self.index_path = self.directory / f"user_{user_id}.faiss"
+        self.state_path = self.directory / f"user_{user_id}.json"
+
+    @staticmethod
+    def model_directory(model_name: str) -> Path:
+        return Path(settings.FAISS_INDEX_DIR) / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+
+    @classmethod
+    def mark_stale(cls, user_id: int):
+        """Flag ``user_id``'s indexes of every model for an incremental update."""
+        root = Path(settings.FAISS_INDEX_DIR)
+        if not root.is_dir():
+            return
+        for directory in root.iterdir():
+            marker = directory / f"user_{user_id}.stale"
+            if directory.is_dir():
+                marker.touch()
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[int, float]]:
+        """(FAQ id, cosine similarity) pairs of the ``k`` closest FAQs, best first."""
+        index = self._current_index()
+        if index is None or index.ntotal == 0:
+            return []
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        _faiss().normalize_L2(vector)
+        scores, ids = index.search(vector, min(k, index.ntotal))
+        return [(int(faq_id), float(score)) for faq_id, score in zip(ids[0], scores[0]) if faq_id != -1]
+
+    def sync(self) -> Tuple[int, int]:
+        """
+        Bring the files in line with the owner's FAQs, embedding only new or
+        edited ones. Returns the number of FAQs added and removed.
+        """
+        from knowledge_base.models import FAQ
+        faiss = _faiss()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with self._file_lock():
+            marker_mtime = self._marker_mtime()
+            state = self._read_state()
+            faqs = {
+                faq.id: faq.document_text
+                for faq in FAQ.objects.filter(category__user_id=self.user_id).only('question', 'answer')
+            }
+            hashes = {faq_id: text_hash(text) for faq_id, text in faqs.items()}
+
+            indexed = {int(faq_id): digest for faq_id, digest in state.get('hashes', {}).items()}
+            index = faiss.read_index(str(self.index_path)) if self.index_path.exists() else None
+            if state.get('quantization', '') != self.quantization:
+                # Stored in another format: start over.
+                indexed, index = {}, None
+            removed = [faq_id for faq_id, digest in indexed.items() if hashes.get(faq_id) != digest]
+            added = [faq_id for faq_id, digest in hashes.items() if indexed.get(faq_id) != digest]
+
+            if (removed or added) and index is not None:
+                # Added IDs too: after a crash between the two file writes they may already be indexed.
+                stale = np.asarray(sorted(set(removed) | set(added)), dtype=np.int64)
+                index = self._without(index, stale)
+            if added:
+                vectors = self._embed([faqs[faq_id] for faq_id in added])
+                if index is not None and index.d != vectors.shape[1]:
+                    # The model's output size changed: start over.
+                    index, removed, added = None, list(indexed), list(faqs)
+                    vectors = self._embed([faqs[faq_id] for faq_id in added])
+                index = self._with(index, vectors, np.asarray(added, dtype=np.int64))
+
+            if index is not None and (added or removed or not self.index_path.exists()):
+                self._replace(self.index_path, lambda path: faiss.write_index(index, path))
+            self._replace(self.state_path, lambda path: Path(path).write_text(json.dumps({
+                'hashes': {str(faq_id): digest for faq_id, digest in hashes.items()},
+                'marker_mtime': marker_mtime,
+                'quantization': self.quantization,
+            })))
+        if added or removed:
+            logger.info(f"FAISS FAQ index of user {self.user_id}: +{len(added)} -{len(removed)}")
+        return len(added), len(removed)
+
+    def _without(self, index, ids: np.ndarray):
+        if not self.quantization:
+            index.remove_ids(ids)
+            return index
+        # Rebuilt from the full-precision copy: the scalar quantizer may need new ranges anyway.
+        stored_ids = _faiss().vector_to_array(index.id_map)
+        keep = ~np.isin(stored_ids, ids)
+        if not keep.any():
+            return None
+        vectors = _faiss().downcast_index(index.index).refine_index.reconstruct_n(0, index.ntotal)
+        return build_index(vectors[keep], stored_ids[keep], self.quantization)
+
+    def _with(self, index, vectors: np.ndarray, ids: np.ndarray):
+        if index is None:
+            return build_index(vectors, ids, self.quantization)
+        if not self.quantization:
+            index.add_with_ids(vectors, ids)
+            return index
+        stored_ids = _faiss().vector_to_array(index.id_map)
+        stored = _faiss().downcast_index(index.index).refine_index.reconstruct_n(0, index.ntotal)
+        return build_index(np.vstack([stored, vectors]), np.concatenate([stored_ids, ids]), self.quantization)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        _faiss().normalize_L2(vectors)
+        return vectors
+
+    def _current_index(self):
+        if not self._is_fresh():
+            self.sync()
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(self.index_path)
+            if loaded is None or loaded[0] != mtime:
+                faiss = _faiss()
+                # IO_FLAG_MMAP maps only IVF lists; MMAP_IFC maps the codes of flat and
+                # scalar-quantized indexes too, so workers share the pages and read them on demand.
+                index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+                loaded = self._loaded[self.index_path] = (mtime, index)
+        return loaded[1]
+
+    def _is_fresh(self) -> bool:
+        state = self._read_state()
+        return bool(state) and state.get('marker_mtime') == self._marker_mtime()
+
+    def _marker_mtime(self) -> int:
+        try:
+            return (self.directory / f"user_{self.user_id}.stale").stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _read_state(self) -> dict:
+        try:
+            return json.loads(self.state_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @staticmethod
+    def _replace(path: Path, write):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        write(str(tmp))
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.directory / f"user_{self.user_id}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -39,11 +39,7 @@ class ChatAgent:
                 model_code=self.config.ai_model.code,
                 api_key=self.config.api_key
             )
-            self.vector_store = VectorStoreManager.create_vector_store(
-                connection_string=settings.DATABASE_URL,
-                collection_name=f"user_{self.user.id}_docs",
-                embedding_dim=1536
-            )
+            self.vector_store = VectorStoreManager.for_tenant(self.user.id)
             self.tool_manager = ToolManager(self.user, self.vector_store)
         except Exception as e:
             logger.critical(f"Agent initialization failed: {str(e)}")
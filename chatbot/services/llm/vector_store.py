@@ -1,8 +1,14 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
 from django.db import connection
+import json
 
 
 from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+from chatbot.services.vector_search import (
+    QUANTIZED_TYPES, ann_search, check_quantization_support, index_method_sql, quantization_of_index,
+    quantized_column,
+)
 from langchain_postgres import PGVector
 from langchain.docstore.document import Document
 
@@ -12,18 +18,144 @@ logger = logging.getLogger(__name__)
 
 class VectorStoreManager:
     """Factory for creating and managing vector stores"""
-    
+
+    ANN_INDEX_NAME = 'langchain_pg_embedding_ann'
+
+    _tenant_stores: Dict[int, 'PGVectorStore'] = {}
+    _indexes_checked = False
+    # Quantization of the existing ANN index (read by check_indexes), which searches must match.
+    index_quantization = ''
+
     @staticmethod
-    def create_vector_store(connection_string: str, collection_name: str, embedding_dim: int = 1536) -> 'PGVectorStore':
+    def create_vector_store(connection_string: str, collection_name: str, embedding_dim: int = 1536,
+                            user_id: Optional[int] = None) -> 'PGVectorStore':
         """Factory method for creating vector stores"""
-        return PGVectorStore(connection_string, collection_name, embedding_dim)
+        return PGVectorStore(connection_string, collection_name, embedding_dim, user_id=user_id)
+
+    @classmethod
+    def ensure_indexes(cls, index_type: Optional[str] = None, rebuild: bool = False,
+                       quantization: Optional[str] = None, **params) -> List[str]:
+        """
+        Create the indexes similarity search on langchain_pg_embedding relies on.
+
+        Run by ``manage.py vector_indexes`` (at deploy, see entrypoint.sh), never
+        on the request path. Indexes are built CONCURRENTLY, so writes continue
+        during the build; a table created without dimensions is still converted
+        with an ALTER TABLE, which rewrites it under an exclusive lock.
+
+        Args:
+            index_type: 'hnsw' or 'ivfflat' (default settings.VECTOR_INDEX_TYPE)
+            rebuild: Drop the ANN index first, to apply new parameters or another type
+            quantization: '' or 'float16' (default settings.VECTOR_QUANTIZATION)
+            **params: m / ef_construction (HNSW) or lists (IVFFlat) overriding the settings
+
+        Returns:
+            The statements executed; empty if the table does not exist yet
+        """
+        quantization = settings.VECTOR_QUANTIZATION if quantization is None else quantization
+        check_quantization_support(quantization)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+                WHERE attrelid = to_regclass('langchain_pg_embedding') AND attname = 'embedding'
+                """
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return []
+
+            statements = []
+            if row[0] == 'vector':
+                # Tables created without embedding_length have no dimensions, which ANN indexes require.
+                statements.append(
+                    f"ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector({settings.EMBEDDING_DIMENSIONS})"
+                )
+            # A failed concurrent build leaves an invalid index that IF NOT EXISTS would keep.
+            cursor.execute(
+                """
+                SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = to_regclass('langchain_pg_embedding') AND NOT i.indisvalid
+                """
+            )
+            statements += [f"DROP INDEX CONCURRENTLY IF EXISTS {name}" for (name,) in cursor.fetchall()]
+            statements += [
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS langchain_pg_embedding_collection_idx "
+                "ON langchain_pg_embedding (collection_id)",
+                # Tenant filter of shared collections, see PGVectorStore.search_by_vector.
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS langchain_pg_embedding_user_idx "
+                "ON langchain_pg_embedding ((cmetadata ->> 'user_id'))",
+            ]
+            if rebuild:
+                statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {cls.ANN_INDEX_NAME}")
+            statements.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {cls.ANN_INDEX_NAME} ON langchain_pg_embedding "
+                f"{index_method_sql(index_type or settings.VECTOR_INDEX_TYPE, quantization=quantization, **params)}"
+            )
+            for statement in statements:
+                cursor.execute(statement)
+        if cls.check_indexes() and cls.index_quantization != quantization:
+            # IF NOT EXISTS kept an index built with other settings.
+            logger.warning(
+                f"{cls.ANN_INDEX_NAME} stores {cls.index_quantization or 'plain'} vectors, not "
+                f"{quantization or 'plain'} ones; pass --rebuild to replace it"
+            )
+        return statements
+
+    @classmethod
+    def check_indexes(cls) -> bool:
+        """
+        Whether the ANN index exists; read-only, so it is safe on the request path.
+
+        Searches order by the expression the existing index serves, so
+        ``index_quantization`` is taken from its definition rather than from
+        settings.VECTOR_QUANTIZATION, which would otherwise force sequential
+        scans whenever the two differ.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", [cls.ANN_INDEX_NAME])
+            row = cursor.fetchone()
+        cls._indexes_checked = True
+        if row is None:
+            logger.warning(
+                f"{cls.ANN_INDEX_NAME} does not exist; vector searches are exact scans until "
+                f"'python manage.py vector_indexes' creates it"
+            )
+            return False
+        cls.index_quantization = quantization_of_index(row[0])
+        if cls.index_quantization != settings.VECTOR_QUANTIZATION:
+            logger.error(
+                f"VECTOR_QUANTIZATION is '{settings.VECTOR_QUANTIZATION}' but {cls.ANN_INDEX_NAME} stores "
+                f"{cls.index_quantization or 'plain'} vectors; searching with the index's quantization. "
+                f"Run 'python manage.py vector_indexes --rebuild' to apply the setting"
+            )
+        return True
+
+    @staticmethod
+    def tenant_collection_name(user_id: int) -> str:
+        return f"user_{user_id}_docs"
+
+    @classmethod
+    def for_tenant(cls, user_id: int) -> Optional['PGVectorStore']:
+        """The tenant's document collection, reused per process; None without DATABASE_URL."""
+        if not settings.DATABASE_URL:
+            return None
+        if user_id not in cls._tenant_stores:
+            cls._tenant_stores[user_id] = cls.create_vector_store(
+                connection_string=settings.DATABASE_URL,
+                collection_name=cls.tenant_collection_name(user_id),
+                embedding_dim=settings.EMBEDDING_DIMENSIONS,
+                user_id=user_id,
+            )
+        return cls._tenant_stores[user_id]
     
 
 
 class PGVectorStore:
     """Production-ready pgvector store implementation with error handling"""
 
-    def __init__(self, connection_string: str, collection_name: str, embedding_dim: int = 1536):
+    def __init__(self, connection_string: str, collection_name: str, embedding_dim: int = 1536,
+                 user_id: Optional[int] = None):
         """
         Initialize the PGVector store.
 
@@ -31,10 +163,12 @@ class PGVectorStore:
             connection_string: PostgreSQL connection string
             collection_name: Name of the collection/table to use
             embedding_dim: Dimension of the embeddings (default 1536 for OpenAI)
+            user_id: Business owner whose documents searches are restricted to
         """
         self.connection_string = connection_string
         self.collection_name = collection_name
         self.embedding_dim = embedding_dim
+        self.user_id = user_id
 
         self.embeddings = HuggingFaceEmbeddingService()
 
@@ -44,12 +178,20 @@ class PGVectorStore:
                 connection=connection_string,
                 embeddings=self.embeddings,
                 collection_name=collection_name,
+                embedding_length=embedding_dim,
                 use_jsonb=True,
             )
         except Exception as e:
             logger.critical(f"PGVectorStore initialization failed: {str(e)}")
             raise
 
+        if not VectorStoreManager._indexes_checked:
+            try:
+                VectorStoreManager.check_indexes()
+            except Exception as e:
+                # Searches still work, as exact scans.
+                logger.error(f"Failed to check vector indexes: {str(e)}")
+
     def _ensure_extension(self):
         """Ensure pgvector extension is enabled in the database"""
         try:
@@ -81,12 +223,91 @@ class PGVectorStore:
         Returns:
             List of document IDs
         """
+        if self.user_id is not None:
+            # Searches of a tenant's store only see documents tagged with the tenant.
+            for document in documents:
+                document.metadata = {**document.metadata, 'user_id': self.user_id}
         try:
             return self.store.add_documents(documents, **kwargs)
         except Exception as e:
             logger.error(f"Failed to store documents: {str(e)}")
             raise
 
+    def search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                         ef_search: Optional[int] = None, exact: bool = False) -> List[Tuple[Document, float]]:
+        """
+        Nearest documents of this collection (and tenant) by cosine distance.
+
+        With a quantized ANN index (see ``VectorStoreManager.ensure_indexes``)
+        ``k * settings.VECTOR_RESCORE_FACTOR`` candidates are taken from it and
+        re-ranked by their full-precision distance.
+
+        Args:
+            embedding: Query vector
+            k: Number of results to return
+            filter: Metadata the documents must contain (served by the cmetadata GIN index)
+            ef_search: HNSW candidate list size for this query (default settings.VECTOR_HNSW_EF_SEARCH)
+            exact: Skip the ANN index
+
+        Returns:
+            List of tuples (Document, cosine distance)
+        """
+        vector = '[' + ','.join(str(float(value)) for value in embedding) + ']'
+        conditions = ["e.collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = %s)"]
+        params: List[Any] = [self.collection_name]
+        if self.user_id is not None:
+            conditions.append("(e.cmetadata ->> 'user_id') = %s")
+            params.append(str(self.user_id))
+        if filter:
+            conditions.append("e.cmetadata @> %s::jsonb")
+            params.append(json.dumps(filter))
+        exact_sql = f"""
+            SELECT e.id, e.document, e.cmetadata, e.embedding <=> %s::vector AS distance
+            FROM langchain_pg_embedding e
+            WHERE {' AND '.join(conditions)}
+            ORDER BY e.embedding <=> %s::vector
+            LIMIT %s
+        """
+        sql, sql_params, candidates = exact_sql, [vector, *params, vector, k], k
+        quantization = VectorStoreManager.index_quantization
+        if quantization:
+            candidates = k * settings.VECTOR_RESCORE_FACTOR
+            column = quantized_column('e.embedding', quantization, self.embedding_dim)
+            sql = f"""
+                SELECT id, document, cmetadata, embedding <=> %s::vector AS distance
+                FROM (
+                    SELECT e.id, e.document, e.cmetadata, e.embedding
+                    FROM langchain_pg_embedding e
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY {column} <=> %s::{QUANTIZED_TYPES[quantization]}({int(self.embedding_dim)})
+                    LIMIT %s
+                ) candidates
+                ORDER BY distance
+                LIMIT %s
+            """
+            sql_params = [vector, *params, vector, candidates, k]
+
+        def run(query, query_params, **search):
+            with ann_search(**search), connection.cursor() as cursor:
+                cursor.execute(query, query_params)
+                return cursor.fetchall()
+
+        ef_search = max(ef_search or settings.VECTOR_HNSW_EF_SEARCH, candidates)
+        rows = [] if exact else run(sql, sql_params, ef_search=ef_search)
+        if len(rows) < k:
+            # The filters are applied after the index scan and may have left too few rows.
+            rows = run(exact_sql, [vector, *params, vector, k], exact=True)
+        return [
+            (
+                Document(
+                    id=doc_id, page_content=document or '',
+                    metadata=json.loads(metadata) if isinstance(metadata, str) else (metadata or {}),
+                ),
+                float(distance),
+            )
+            for doc_id, document, metadata, distance in rows
+        ]
+
     def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
         """
         Perform similarity search on stored vectors.
@@ -94,16 +315,12 @@ class PGVectorStore:
         Args:
             query: The query string
             k: Number of results to return
-            **kwargs: Additional search parameters
+            **kwargs: Additional search parameters (see search_by_vector)
 
         Returns:
             List of matching Documents
         """
-        try:
-            return self.store.similarity_search(query, k=k, **kwargs)
-        except Exception as e:
-            logger.error(f"Similarity search failed: {str(e)}")
-            raise
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
 
     def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[tuple]:
         """
@@ -112,13 +329,13 @@ class PGVectorStore:
         Args:
             query: The query string
             k: Number of results to return
-            **kwargs: Additional search parameters
+            **kwargs: Additional search parameters (see search_by_vector)
 
         Returns:
-            List of tuples (Document, score)
+            List of tuples (Document, cosine distance)
         """
         try:
-            return self.store.similarity_search_with_score(query, k=k, **kwargs)
+            return self.search_by_vector(self.embeddings.embed_query(query), k=k, **kwargs)
         except Exception as e:
             logger.error(f"Similarity search with score failed: {str(e)}")
             raise
@@ -134,18 +351,66 @@ class PGVectorStore:
             True if successful, False otherwise
         """
         try:
-            # Implementation depends on how you want to handle deletions
-            # This is a placeholder implementation
+            # langchain_pg_embedding.collection_id references langchain_pg_collection.uuid,
+            # so the collection has to be matched by name through a join.
             with connection.cursor() as cursor:
                 cursor.execute(
-                    "DELETE FROM langchain_pg_embedding WHERE collection_id = %s AND id = ANY(%s)",
-                    [self.collection_name, ids]
+                    """
+                    DELETE FROM langchain_pg_embedding e
+                    USING langchain_pg_collection c
+                    WHERE e.collection_id = c.uuid AND c.name = %s AND e.id = ANY(%s)
+                    """,
+                    [self.collection_name, list(ids)]
                 )
             return True
         except Exception as e:
             logger.error(f"Failed to delete documents: {str(e)}")
             return False
 
+    def upsert_embeddings(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                          metadatas: List[Dict[str, Any]]) -> List[str]:
+        """
+        Insert or replace precomputed vectors under stable document IDs.
+        Metadata should carry the owner's ``user_id`` for tenant stores.
+
+        Args:
+            ids: Document IDs; an existing row with the same ID is overwritten
+            texts: Document contents
+            embeddings: One vector per document
+            metadatas: One metadata dict per document
+
+        Returns:
+            List of document IDs
+        """
+        try:
+            return self.store.add_embeddings(texts=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+        except Exception as e:
+            logger.error(f"Failed to upsert embeddings: {str(e)}")
+            raise
+
+    def indexed_metadata(self, id_prefix: str = '', key: str = 'content_hash') -> Dict[str, Any]:
+        """
+        Map document ID to one metadata value for the documents of this collection.
+
+        Args:
+            id_prefix: Only documents whose ID starts with this prefix
+            key: Metadata key to read
+
+        Returns:
+            Dictionary of document ID to metadata value
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT e.id, e.cmetadata ->> %s
+                FROM langchain_pg_embedding e
+                JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                WHERE c.name = %s AND e.id LIKE %s
+                """,
+                [key, self.collection_name, id_prefix.replace('%', r'\%').replace('_', r'\_') + '%']
+            )
+            return dict(cursor.fetchall())
+
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the vector collection.
@@ -160,8 +425,9 @@ class PGVectorStore:
                     SELECT 
                         COUNT(*) as document_count,
                         pg_size_pretty(pg_total_relation_size('langchain_pg_embedding')) as size
-                    FROM langchain_pg_embedding
-                    WHERE collection_id = %s
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = %s
                     """,
                     [self.collection_name]
                 )
@@ -0,0 +1,133 @@
+from collections import Counter, OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import logging
+import time
+
+from django.core.cache import cache
+
+from business.catalog import VERSION_CACHE_KEY, bump_version
+
+logger = logging.getLogger(__name__)
+
+
+class ToolResultCache:
+    """
+    Process-wide memo of read-only agent tool results.
+
+    Entries are keyed by tool name, canonical arguments, tenant id and the
+    tenant's shared catalog and FAQ versions, and live for ``TTL_SECONDS``,
+    which covers repeated calls inside one turn and across consecutive turns of
+    a conversation. The versions are counters in the Django cache, which is
+    Redis in production (settings.CACHES): catalog writes and orders bump the
+    catalog version (business.catalog), FAQ and product FAQ writes bump the FAQ
+    version (``invalidate_faqs``), so an edit committed in any worker makes
+    every worker miss. Writes that bypass the signals are served stale for at
+    most ``TTL_SECONDS``.
+
+    The hit/miss counters of ``stats`` are those of the serving worker only.
+    """
+
+    TTL_SECONDS = 60
+    MAX_ENTRIES = 1024
+    # Only tools whose result depends on nothing but their arguments and the tenant.
+    CACHEABLE_TOOLS = frozenset({
+        'product_search_tool',
+        'enhanced_business_faq_search',
+        'product_faq_search_tool',
+    })
+    # The tools above report failures as text instead of raising; such a
+    # result (often a transient DB error) is returned but never cached.
+    ERROR_PREFIXES = ('Error', '⚠️ Error', 'An unexpected error occurred')
+
+    FAQ_VERSION_CACHE_KEY = 'faq_version:{}'
+
+    _entries: 'OrderedDict[Tuple[str, str, int, Any, Any], Tuple[float, Any]]' = OrderedDict()
+    _lock = Lock()
+    _hits: Counter = Counter()
+    _misses: Counter = Counter()
+
+    @classmethod
+    def make_key(cls, tool, args: Dict[str, Any], tenant_id: int) -> Tuple[str, str, int, Any, Any]:
+        """Build the cache key, filling schema defaults so omitted and explicit defaults match."""
+        schema = getattr(tool, 'args_schema', None)
+        if isinstance(schema, type):
+            try:
+                args = schema(**args).model_dump()
+            except Exception:
+                pass
+        return (tool.name, json.dumps(args, sort_keys=True, default=str), tenant_id, *cls.versions(tenant_id))
+
+    @classmethod
+    def versions(cls, tenant_id: int) -> Tuple[Any, Any]:
+        """The tenant's shared (catalog, FAQ) versions, in one cache round trip."""
+        keys = [VERSION_CACHE_KEY.format(tenant_id), cls.FAQ_VERSION_CACHE_KEY.format(tenant_id)]
+        versions = cache.get_many(keys)
+        if len(versions) < len(keys):
+            # Seed missing counters, so a version lost to eviction never matches older entries.
+            for key in keys:
+                if key not in versions:
+                    cache.add(key, time.time_ns(), timeout=None)
+            versions = cache.get_many(keys)
+        return versions.get(keys[0]), versions.get(keys[1])
+
+    @classmethod
+    def invoke(cls, tool, args: Dict[str, Any], tenant_id: Optional[int], compute: Callable[[], Any]) -> Any:
+        """Return the memoized result for this call, running ``compute`` on a miss."""
+        if tenant_id is None or tool.name not in cls.CACHEABLE_TOOLS:
+            return compute()
+
+        key = cls.make_key(tool, args, tenant_id)
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > now:
+                cls._entries.move_to_end(key)
+                cls._hits[tool.name] += 1
+                return entry[1]
+            cls._misses[tool.name] += 1
+
+        result = compute()
+        if cls.is_error(result):
+            return result
+        with cls._lock:
+            cls._entries[key] = (now + cls.TTL_SECONDS, result)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+        return result
+
+    @classmethod
+    def is_error(cls, result: Any) -> bool:
+        content = getattr(result, 'content', result)
+        return isinstance(content, str) and content.lstrip().startswith(cls.ERROR_PREFIXES)
+
+    @classmethod
+    def invalidate_faqs(cls, tenant_id: int):
+        """Make every worker miss the cached results of ``tenant_id`` after an FAQ write."""
+        bump_version(cls.FAQ_VERSION_CACHE_KEY.format(tenant_id))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._hits.clear()
+            cls._misses.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Hit/miss counters of this worker process, overall and per tool."""
+        with cls._lock:
+            tools = {}
+            for name in sorted(set(cls._hits) | set(cls._misses)):
+                hits, misses = cls._hits[name], cls._misses[name]
+                tools[name] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 3)}
+            hits, misses = sum(cls._hits.values()), sum(cls._misses.values())
+            return {
+                'entries': len(cls._entries),
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                'tools': tools,
+            }
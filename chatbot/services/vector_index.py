@@ -0,0 +1,348 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+import time
+
+from chatbot.models import BulkIndexCheckpoint, VectorIndexOutbox
+from chatbot.services.embedding_cache import text_hash
+
+logger = logging.getLogger(__name__)
+
+# Indexed models, with the lookup path to the business owner whose collection holds their vectors.
+INDEXED_SOURCES = {
+    'knowledge_base.FAQ': 'category__user_id',
+    'business.Product': 'user_id',
+    'business.ProductFAQ': 'product__user_id',
+}
+
+
+def document_id(source_type: str, source_id: int) -> str:
+    """Stable ID of a source row in the vector index, e.g. 'business.Product:42'."""
+    return f"{source_type}:{source_id}"
+
+
+def _owner_of(instance) -> Optional[int]:
+    value = instance
+    for attr in INDEXED_SOURCES[instance._meta.label].split('__'):
+        value = getattr(value, attr)
+        if value is None:
+            return None
+    return value
+
+
+def _has_embedding_column(model) -> bool:
+    try:
+        model._meta.get_field('embedding')
+        return True
+    except FieldDoesNotExist:
+        return False
+
+
+def _enqueue(entries: Iterable[VectorIndexOutbox]):
+    # One pending entry per source row: a newer change replaces an older one.
+    VectorIndexOutbox.objects.bulk_create(
+        list(entries),
+        update_conflicts=True,
+        unique_fields=['source_type', 'source_id'],
+        update_fields=['owner_id', 'operation', 'enqueued_at', 'attempts', 'last_error'],
+    )
+
+
+def queue_upsert(instance, update_fields=None):
+    """
+    Record that ``instance`` must be (re-)embedded, in the caller's transaction,
+    and wake the indexer once it commits.
+    """
+    # VectorIndexer writes the embedding column itself; that must not queue the row again.
+    if update_fields and set(update_fields) <= {'embedding'}:
+        return
+    _enqueue([VectorIndexOutbox(
+        source_type=instance._meta.label, source_id=instance.pk, owner_id=_owner_of(instance),
+        operation=VectorIndexOutbox.Operation.UPSERT, enqueued_at=timezone.now(),
+    )])
+    transaction.on_commit(VectorIndexer.notify)
+
+
+def queue_delete(instance):
+    """Record that ``instance``'s vector must be removed. Call before the row is deleted."""
+    _enqueue([VectorIndexOutbox(
+        source_type=instance._meta.label, source_id=instance.pk, owner_id=_owner_of(instance),
+        operation=VectorIndexOutbox.Operation.DELETE, enqueued_at=timezone.now(),
+    )])
+    transaction.on_commit(VectorIndexer.notify)
+
+
+def write_vectors(label: str, rows: List, texts: List[str], vectors: List[List[float]], store_for: Callable):
+    """
+    Store the embeddings of ``rows`` (annotated with ``index_owner_id``): in
+    their ``embedding`` column when the model has one, and in each owner's
+    PGVector collection under ``document_id``.
+    """
+    model = apps.get_model(label)
+    if _has_embedding_column(model):
+        for row, vector in zip(rows, vectors):
+            row.embedding = vector
+        # bulk_update sends no post_save, so this does not queue the rows again.
+        model.objects.bulk_update(rows, ['embedding'])
+
+    by_owner: Dict[int, List[Tuple[object, str, List[float]]]] = {}
+    for row, text, vector in zip(rows, texts, vectors):
+        by_owner.setdefault(row.index_owner_id, []).append((row, text, vector))
+    for owner_id, documents in by_owner.items():
+        store = store_for(owner_id) if owner_id is not None else None
+        if store is None:
+            continue
+        store.upsert_embeddings(
+            ids=[document_id(label, row.pk) for row, _, _ in documents],
+            texts=[text for _, text, _ in documents],
+            embeddings=[vector for _, _, vector in documents],
+            metadatas=[
+                {'source_type': label, 'source_id': row.pk, 'user_id': owner_id, 'content_hash': text_hash(text)}
+                for row, text, _ in documents
+            ],
+        )
+
+
+def indexable_rows(label: str):
+    """Rows of ``label`` annotated with ``index_owner_id``, without their (large) embedding column."""
+    model = apps.get_model(label)
+    rows = model.objects.annotate(index_owner_id=F(INDEXED_SOURCES[label]))
+    return rows.defer('embedding') if _has_embedding_column(model) else rows
+
+
+def _batches(rows, size: int) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_index(label: str, owner_id: Optional[int] = None, embedder=None, store_for: Callable = None,
+               batch_size: int = 64, chunk_size: int = 500, workers: int = 4, restart: bool = False,
+               progress: Callable[[int, float], None] = None) -> int:
+    """
+    (Re-)index every row of ``label``, or only ``owner_id``'s, and return the
+    number of rows written.
+
+    Rows are streamed in primary key order with a server-side cursor, embedded
+    in batches of ``batch_size`` on ``workers`` threads, and written batch by
+    batch in order. After each batch the highest key written is saved in a
+    ``BulkIndexCheckpoint``, so a run that is interrupted resumes after it
+    (unless ``restart``); the checkpoint is removed once the run completes.
+    ``progress`` is called after each batch with the rows written so far and
+    the elapsed seconds.
+    """
+    embedder, store_for = VectorIndexer._defaults(embedder, store_for)
+    run_key = f"{label}|user={'*' if owner_id is None else owner_id}"
+    if restart:
+        BulkIndexCheckpoint.objects.filter(run_key=run_key).delete()
+    checkpoint, _ = BulkIndexCheckpoint.objects.get_or_create(run_key=run_key)
+
+    rows = indexable_rows(label).filter(pk__gt=checkpoint.last_id).order_by('pk')
+    if owner_id is not None:
+        rows = rows.filter(index_owner_id=owner_id)
+
+    def embed(batch, texts):
+        try:
+            return batch, texts, embedder.embed_batch(texts)
+        finally:
+            # Embedding caches may query the database from this worker thread.
+            connection.close()
+
+    started = time.perf_counter()
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-index') as pool:
+        # Bounded read-ahead: at most two batches per worker are held in memory.
+        pending = deque()
+        for batch in _batches(rows.iterator(chunk_size=chunk_size), batch_size):
+            pending.append(pool.submit(embed, batch, [row.document_text for row in batch]))
+            if len(pending) < workers * 2:
+                continue
+            written += _write_batch(label, pending.popleft().result(), store_for, checkpoint)
+            if progress:
+                progress(written, time.perf_counter() - started)
+        while pending:
+            written += _write_batch(label, pending.popleft().result(), store_for, checkpoint)
+            if progress:
+                progress(written, time.perf_counter() - started)
+
+    checkpoint.delete()
+    return written
+
+
+def _write_batch(label: str, embedded, store_for: Callable, checkpoint: BulkIndexCheckpoint) -> int:
+    batch, texts, vectors = embedded
+    write_vectors(label, batch, texts, vectors, store_for)
+    checkpoint.last_id = batch[-1].pk
+    checkpoint.indexed += len(batch)
+    checkpoint.save(update_fields=['last_id', 'indexed', 'updated_at'])
+    return len(batch)
+
+
+class VectorIndexer:
+    """
+    Applies the vector index outbox.
+
+    Each indexed row is embedded from its ``document_text`` (identical texts
+    are served by the embedding cache), written to its ``embedding`` column
+    when the model has one, and upserted into its owner's PGVector collection
+    under ``document_id``. Entries are removed only if they were not re-queued
+    while being applied, and failures stay in the outbox with their error, so
+    no change is lost across restarts. A daemon worker applies the outbox after
+    each committed change; ``reconcile`` repairs whatever bypassed the signals.
+    """
+
+    BATCH_SIZE = 64
+
+    _lock = Lock()
+    _wakeup = Event()
+    _worker: Optional[Thread] = None
+
+    @classmethod
+    def notify(cls):
+        with cls._lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = Thread(target=cls._run, name='vector-indexer', daemon=True)
+                cls._worker.start()
+        cls._wakeup.set()
+
+    @staticmethod
+    def _defaults(embedder=None, store_for=None):
+        if embedder is None:
+            from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+            embedder = HuggingFaceEmbeddingService()
+        if store_for is None:
+            from chatbot.services.llm.vector_store import VectorStoreManager
+            store_for = VectorStoreManager.for_tenant
+        return embedder, store_for
+
+    @classmethod
+    def process(cls, embedder=None, store_for: Callable = None) -> int:
+        """Apply every pending entry in the calling thread. Returns the number applied."""
+        embedder, store_for = cls._defaults(embedder, store_for)
+        applied = 0
+        failed = set()
+        while True:
+            entries = list(VectorIndexOutbox.objects.exclude(pk__in=failed)[:cls.BATCH_SIZE])
+            if not entries:
+                return applied
+            try:
+                cls._apply(entries, embedder, store_for)
+            except Exception as e:
+                logger.error(f"Vector index batch failed: {str(e)}", exc_info=True)
+                VectorIndexOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                    attempts=F('attempts') + 1, last_error=str(e)[:2000]
+                )
+                failed.update(entry.pk for entry in entries)
+                continue
+
+            done = Q()
+            for entry in entries:
+                done |= Q(pk=entry.pk, enqueued_at=entry.enqueued_at)
+            VectorIndexOutbox.objects.filter(done).delete()
+            applied += len(entries)
+
+    @classmethod
+    def _apply(cls, entries: List[VectorIndexOutbox], embedder, store_for: Callable):
+        upserts: Dict[str, List[int]] = {}
+        deletes: Dict[int, List[str]] = {}
+        for entry in entries:
+            if entry.operation == VectorIndexOutbox.Operation.UPSERT:
+                upserts.setdefault(entry.source_type, []).append(entry.source_id)
+            elif entry.owner_id is not None:
+                deletes.setdefault(entry.owner_id, []).append(document_id(entry.source_type, entry.source_id))
+
+        for label, ids in upserts.items():
+            # A row deleted meanwhile has its own delete entry (it replaced this one
+            # unless the delete came after this batch was read), so it is skipped here.
+            rows = list(indexable_rows(label).filter(pk__in=ids))
+            if not rows:
+                continue
+            texts = [row.document_text for row in rows]
+            write_vectors(label, rows, texts, embedder.embed_batch(texts), store_for)
+
+        for owner_id, doc_ids in deletes.items():
+            store = store_for(owner_id)
+            if store is not None and not store.delete_documents(doc_ids):
+                raise RuntimeError(f"Could not delete {len(doc_ids)} vectors of user {owner_id}")
+
+    @classmethod
+    def reconcile(cls, source_types: Iterable[str] = None, owner_ids: Iterable[int] = None,
+                  store_for: Callable = None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Queue every difference between the source tables and the index: rows
+        whose content hash is missing or stale in their owner's collection or
+        whose embedding column is empty, and indexed documents whose row is gone.
+        Returns the number of upserts and deletes queued (found, with ``dry_run``).
+        """
+        _, store_for = cls._defaults(embedder=False, store_for=store_for)
+        owner_ids = set(owner_ids or [])
+        now = timezone.now()
+        queued: Dict[Tuple[str, int], VectorIndexOutbox] = {}
+
+        def queue(label, source_id, owner_id, operation):
+            queued[(label, source_id)] = VectorIndexOutbox(
+                source_type=label, source_id=source_id, owner_id=owner_id, operation=operation, enqueued_at=now
+            )
+
+        for label in source_types or INDEXED_SOURCES:
+            model = apps.get_model(label)
+            rows = model.objects.annotate(index_owner_id=F(INDEXED_SOURCES[label]))
+            if owner_ids:
+                rows = rows.filter(index_owner_id__in=owner_ids)
+
+            if _has_embedding_column(model):
+                for pk, owner_id in rows.filter(embedding__isnull=True).values_list('pk', 'index_owner_id'):
+                    queue(label, pk, owner_id, VectorIndexOutbox.Operation.UPSERT)
+                rows = rows.defer('embedding')
+
+            expected: Dict[int, Dict[str, Tuple[int, str]]] = {}
+            for row in rows.iterator(chunk_size=500):
+                expected.setdefault(row.index_owner_id, {})[document_id(label, row.pk)] = (
+                    row.pk, text_hash(row.document_text)
+                )
+
+            for owner_id in set(expected) | owner_ids:
+                store = store_for(owner_id) if owner_id is not None else None
+                if store is None:
+                    continue
+                indexed = store.indexed_metadata(id_prefix=f"{label}:")
+                for doc_id, (pk, content_hash) in expected.get(owner_id, {}).items():
+                    if indexed.get(doc_id) != content_hash:
+                        queue(label, pk, owner_id, VectorIndexOutbox.Operation.UPSERT)
+                for doc_id in set(indexed) - set(expected.get(owner_id, {})):
+                    queue(label, int(doc_id.rsplit(':', 1)[1]), owner_id, VectorIndexOutbox.Operation.DELETE)
+
+        if not dry_run:
+            _enqueue(queued.values())
+        operations = [entry.operation for entry in queued.values()]
+        return {
+            'upsert': operations.count(VectorIndexOutbox.Operation.UPSERT),
+            'delete': operations.count(VectorIndexOutbox.Operation.DELETE),
+        }
+
+    @classmethod
+    def _run(cls):
+        while True:
+            cls._wakeup.wait()
+            cls._wakeup.clear()
+            close_old_connections()
+            try:
+                applied = cls.process()
+                if applied:
+                    logger.info(f"Applied {applied} vector index changes")
+            except Exception as e:
+                logger.error(f"Vector indexing failed: {str(e)}", exc_info=True)
+            finally:
+                close_old_connections()
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from typing import List, Optional
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def ann_search(ef_search: Optional[int] = None, exact: bool = False, probes: Optional[int] = None):
+    """
+    Run the enclosed vector queries with a per-query HNSW ``ef_search`` and
+    IVFFlat ``probes``, or as exact scans when ``exact`` is set.
+
+    The parameters are SET LOCAL, so the block runs in a transaction (a
+    savepoint inside an outer one) and nothing leaks to later queries on the
+    connection. Querysets must be evaluated inside the block.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if exact:
+                # HNSW and IVFFlat only serve plain index scans; filters can still use bitmap scans.
+                cursor.execute("SET LOCAL enable_indexscan = off")
+            else:
+                cursor.execute(
+                    "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+                    [str(ef_search or settings.VECTOR_HNSW_EF_SEARCH), str(probes or settings.VECTOR_IVFFLAT_PROBES)],
+                )
+        yield
+
+
+def nearest(queryset, limit: int, ef_search: Optional[int] = None) -> List:
+    """
+    Evaluate ``queryset``, ordered by vector distance, up to ``limit`` rows.
+
+    The ANN index is searched with ``ef_search`` of at least ``limit``. Filters
+    such as the tenant are applied to the index's candidates afterwards, so when
+    they leave fewer than ``limit`` rows the search is repeated as an exact scan
+    of the filtered rows, which is what a small tenant in a large table needs.
+    """
+    ef_search = max(ef_search or settings.VECTOR_HNSW_EF_SEARCH, limit)
+    with ann_search(ef_search):
+        rows = list(queryset[:limit])
+    if len(rows) < limit:
+        with ann_search(exact=True):
+            rows = list(queryset[:limit])
+    return rows
+
+
+# settings.VECTOR_QUANTIZATION values and the pgvector type the index stores.
+QUANTIZED_TYPES = {
+    'float16': 'halfvec',
+}
+
+
+def quantized_column(column: str, quantization: str = '', dimensions: int = None) -> str:
+    """SQL of ``column`` as stored in the ANN index: itself, or cast to the quantized type."""
+    if not quantization:
+        return column
+    if quantization not in QUANTIZED_TYPES:
+        raise ImproperlyConfigured(f"Unknown VECTOR_QUANTIZATION '{quantization}'")
+    return f"({column}::{QUANTIZED_TYPES[quantization]}({int(dimensions or settings.EMBEDDING_DIMENSIONS)}))"
+
+
+def quantization_of_index(indexdef: str) -> str:
+    """The VECTOR_QUANTIZATION value an ANN index was built with, from its ``pg_indexes.indexdef``."""
+    for quantization, vector_type in QUANTIZED_TYPES.items():
+        if f"{vector_type}_cosine_ops" in indexdef:
+            return quantization
+    return ''
+
+
+def check_quantization_support(quantization: str):
+    """Raise ImproperlyConfigured when the server's pgvector cannot store ``quantization``."""
+    if not quantization:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+    version = tuple(int(part) for part in row[0].split('.')[:2]) if row else (0, 0)
+    if version < (0, 7):
+        raise ImproperlyConfigured(
+            f"VECTOR_QUANTIZATION '{quantization}' needs pgvector 0.7 or later (installed: {row[0] if row else 'none'})"
+        )
+
+
+def index_method_sql(index_type: str, m: int = None, ef_construction: int = None, lists: int = None,
+                     quantization: str = '', dimensions: int = None) -> str:
+    """``USING ... WITH (...)`` clause of a cosine ANN index of the given type, on quantized vectors if requested."""
+    column = quantized_column('embedding', quantization, dimensions)
+    opclass = f"{QUANTIZED_TYPES[quantization] if quantization else 'vector'}_cosine_ops"
+    if index_type == 'hnsw':
+        return (
+            f"USING hnsw ({column} {opclass}) WITH "
+            f"(m = {int(m or settings.VECTOR_HNSW_M)}, "
+            f"ef_construction = {int(ef_construction or settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+    if index_type == 'ivfflat':
+        return f"USING ivfflat ({column} {opclass}) WITH (lists = {int(lists or settings.VECTOR_IVFFLAT_LISTS)})"
+    raise ValueError(f"Unknown vector index type '{index_type}'")
@@ -1,3 +1,536 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+from threading import Barrier
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from langchain_core.messages import AIMessage
+from pgvector.django import CosineDistance
+from business.catalog import bump_catalog_version
+from business.models import Product, ProductFAQ
+from customer.models import Customer
+from customer.services.order_service import place_order
+from knowledge_base.models import Category, FAQ
+from knowledge_base.tests import FakeEmbedder
+from messaging.enums import PLATFORM
+from messaging.models import SocialMediaUser
+from .langgraph.nodes import make_take_action
+from .langgraph.tools.get_order_history_tool import ORDER_HISTORY_LIMIT, GetOrderHistoryTool
+from .langgraph.tools.product_search_tool import ProductSearchTool
+from .models import BulkIndexCheckpoint, EmbeddingCacheEntry, VectorIndexOutbox
+from .services.embedding_cache import CachedEmbeddings, EmbeddingCache
+from .services.embedding_service import MicroBatcher
+from .services.faiss_index import TenantFAISSIndex
+from .services.llm.vector_store import VectorStoreManager
+from .services.tool_result_cache import ToolResultCache
+from .services.vector_index import VectorIndexer, bulk_index
+from .services.vector_search import check_quantization_support, index_method_sql, nearest, quantization_of_index
+
+User = get_user_model()
+
+
+class GetOrderHistoryToolTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Rahim', phone='01700000000', city='Dhaka', police_station='Mirpur'
+        )
+        self.social_user = SocialMediaUser.objects.create(
+            name='Rahim', social_media_id='123', platform=PLATFORM.FACEBOOK, customer=self.customer
+        )
+        phone = Product.objects.create(user=self.user, name='iPhone 14', price=999, stock=100)
+        case = Product.objects.create(user=self.user, name='Case', price=15, stock=100)
+        self.orders = [
+            place_order(self.user, self.customer, [(phone.id, 1), (case.id, 2)])
+            for _ in range(ORDER_HISTORY_LIMIT + 2)
+        ]
+
+    def _tool(self):
+        return GetOrderHistoryTool(
+            user=self.user, social_user=SocialMediaUser.objects.get(pk=self.social_user.pk)
+        )
+
+    def test_last_order_lists_its_items(self):
+        tool = self._tool()
+        with self.assertNumQueries(3):
+            response = tool._run()
+        self.assertIn(self.orders[-1].order_number, response)
+        self.assertIn('iPhone 14 (x1)', response)
+        self.assertIn('Case (x2)', response)
+        self.assertIn('full history', response)
+
+    def test_history_is_bounded_and_cached_for_the_turn(self):
+        tool = self._tool()
+        tool._run()
+        with self.assertNumQueries(0):
+            response = tool._run(show_more=True)
+        self.assertEqual(response.count('Order: '), ORDER_HISTORY_LIMIT)
+        self.assertNotIn(self.orders[0].order_number, response)
+
+    def test_order_number_lookup_is_scoped_to_the_business(self):
+        tool = GetOrderHistoryTool(user=User.objects.create_user(email='other@example.com', password='testpass123'))
+        self.assertIn("couldn't find", tool._run(order_number=self.orders[0].order_number))
+        self.assertIn('iPhone 14 (x1)', self._tool()._run(order_number=self.orders[0].order_number.lower()))
+
+
+class ToolResultCacheTest(TestCase):
+    def setUp(self):
+        ToolResultCache.clear()
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.phone = Product.objects.create(user=self.user, name='iPhone 14', price=999, stock=3)
+        self.take_action = make_take_action([ProductSearchTool(user=self.user)], self.user)
+
+    def _search(self, **args):
+        state = {'messages': [AIMessage(content='', tool_calls=[
+            {'id': 'call-1', 'name': 'product_search_tool', 'args': args}
+        ])]}
+        return self.take_action(state)['messages'][0].content
+
+    def test_identical_calls_run_the_query_once(self):
+        first = self._search(name='iphone')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._search(name='iphone', limit=10), first)
+        stats = ToolResultCache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['tools']['product_search_tool']['hit_rate'], 0.5)
+
+    def test_catalog_write_invalidates_the_tenant(self):
+        self.assertIn('Stock: 3', self._search(name='iphone'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.stock = 7
+            self.phone.save()
+        self.assertIn('Stock: 7', self._search(name='iphone'))
+
+    def test_error_results_are_not_cached(self):
+        tool = ProductSearchTool(user=self.user)
+        results = iter(["Error: database is restarting", "iPhone 14"])
+        self.assertEqual(ToolResultCache.invoke(tool, {'name': 'x'}, self.user.id, lambda: next(results)),
+                         "Error: database is restarting")
+        self.assertEqual(ToolResultCache.invoke(tool, {'name': 'x'}, self.user.id, lambda: next(results)),
+                         "iPhone 14")
+        self.assertEqual(ToolResultCache.stats()['entries'], 1)
+
+    def test_shared_version_bumps_invalidate_the_tenant(self):
+        # A bump made by any worker reaches this one through the shared cache.
+        self._search(name='iphone')
+        for bump in (bump_catalog_version, ToolResultCache.invalidate_faqs):
+            Product.objects.filter(pk=self.phone.pk).update(stock=F('stock') + 1)
+            bump(self.user.id)
+            self.assertIn(f'Stock: {self.phone.stock + 1}', self._search(name='iphone'))
+            self.phone.refresh_from_db()
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        bump_catalog_version(other.id)
+        ToolResultCache.invalidate_faqs(other.id)
+        with self.assertNumQueries(0):
+            self._search(name='iphone')
+
+
+class MicroBatcherTest(SimpleTestCase):
+    def test_concurrent_calls_share_forward_passes(self):
+        batch_sizes = []
+
+        def encode(texts):
+            batch_sizes.append(len(texts))
+            return [[float(len(text))] for text in texts]
+
+        batcher = MicroBatcher(encode, max_batch_size=8, max_wait_ms=50)
+        barrier = Barrier(16)
+
+        def embed(text):
+            barrier.wait()
+            return batcher.submit(text).result(timeout=5)
+
+        texts = ['x' * n for n in range(1, 17)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            vectors = list(executor.map(embed, texts))
+
+        self.assertEqual(vectors, [[float(n)] for n in range(1, 17)])
+        self.assertEqual(sum(batch_sizes), 16)
+        self.assertLess(len(batch_sizes), 16)
+        self.assertLessEqual(max(batch_sizes), 8)
+
+    def test_encoder_errors_reach_every_caller(self):
+        def encode(texts):
+            raise RuntimeError("model crashed")
+
+        batcher = MicroBatcher(encode, max_wait_ms=1)
+        with self.assertRaisesMessage(RuntimeError, "model crashed"):
+            batcher.submit('hello').result(timeout=5)
+
+
+class CountingEmbeddings:
+    model_name = 'test-model'
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[len(text) / 100, 0.5, -0.25] for text in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [1.0, 0.0, 0.0]
+
+
+class EmbeddingCacheTest(TestCase):
+    def setUp(self):
+        EmbeddingCache.clear_local()
+        self.model = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.model)
+
+    def test_unchanged_texts_are_embedded_once(self):
+        first = self.embeddings.embed_documents(['Q: Refunds?\nA: Within 7 days.', 'Q: Delivery?', 'Q:  Delivery? '])
+        self.assertEqual(self.model.embedded, ['Q: Refunds?\nA: Within 7 days.', 'Q: Delivery?'])
+        self.assertEqual(first[1], first[2])
+        self.assertEqual(EmbeddingCacheEntry.objects.filter(model_name='test-model').count(), 2)
+
+        EmbeddingCache.clear_local()
+        again = self.embeddings.embed_documents(['Q: Delivery?', 'Q: Refunds?\nA: Within 7 days.'])
+        self.assertEqual(len(self.model.embedded), 2)
+        for cached, fresh in zip(again, [first[1], first[0]]):
+            self.assertTrue(all(abs(a - b) < 1e-3 for a, b in zip(cached, fresh)))
+
+        with self.assertNumQueries(0):
+            self.embeddings.embed_documents(['Q: Delivery?'])
+
+    def test_queries_are_cached_separately_from_documents(self):
+        self.embeddings.embed_documents(['delivery time'])
+        self.assertEqual(self.embeddings.embed_query('delivery time'), [1.0, 0.0, 0.0])
+        self.embeddings.embed_query('delivery time')
+        self.assertEqual(self.model.embedded, ['delivery time', 'delivery time'])
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.documents = {}
+
+    def upsert_embeddings(self, ids, texts, embeddings, metadatas):
+        for doc_id, metadata in zip(ids, metadatas):
+            self.documents[doc_id] = metadata
+        return ids
+
+    def delete_documents(self, ids):
+        for doc_id in ids:
+            self.documents.pop(doc_id, None)
+        return True
+
+    def indexed_metadata(self, id_prefix='', key='content_hash'):
+        return {
+            doc_id: metadata[key] for doc_id, metadata in self.documents.items() if doc_id.startswith(id_prefix)
+        }
+
+
+@mock.patch('chatbot.services.vector_index.Thread')
+class VectorIndexerTest(TestCase):
+    def setUp(self):
+        self.embedder = FakeEmbedder()
+        self.stores = {}
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(user=self.user, name='Delivery')
+            self.faq = FAQ.objects.create(category=self.category, question='How long is delivery?', answer='2-3 days.')
+            self.phone = Product.objects.create(user=self.user, name='iPhone 14', price=999, stock=2)
+            self.phone_faq = ProductFAQ.objects.create(product=self.phone, question='Battery?', answer='20 hours.')
+            self.other_product = Product.objects.create(user=self.other_user, name='Galaxy S23', price=799, stock=1)
+
+    def _store_for(self, owner_id):
+        return self.stores.setdefault(owner_id, FakeVectorStore())
+
+    def _process(self):
+        return VectorIndexer.process(embedder=self.embedder, store_for=self._store_for)
+
+    def test_committed_changes_reach_each_owners_collection(self, thread):
+        self.assertEqual(VectorIndexOutbox.objects.count(), 4)
+        self.assertEqual(self._process(), 4)
+        self.assertFalse(VectorIndexOutbox.objects.exists())
+        self.assertEqual(
+            sorted(self.stores[self.user.id].documents),
+            [f'business.Product:{self.phone.pk}', f'business.ProductFAQ:{self.phone_faq.pk}', f'knowledge_base.FAQ:{self.faq.pk}']
+        )
+        self.assertEqual(list(self.stores[self.other_user.id].documents), [f'business.Product:{self.other_product.pk}'])
+        self.assertFalse(FAQ.objects.filter(embedding__isnull=True).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(self._process(), 1)
+        self.assertNotIn(f'knowledge_base.FAQ:{self.faq.pk}', self.stores[self.user.id].documents)
+
+    def test_failed_batches_stay_queued(self, thread):
+        class BrokenEmbedder:
+            def embed_batch(self, texts):
+                raise ConnectionError("embedding API unavailable")
+
+        self.assertEqual(VectorIndexer.process(embedder=BrokenEmbedder(), store_for=self._store_for), 0)
+        self.assertEqual(set(VectorIndexOutbox.objects.values_list('attempts', 'last_error')), {(1, 'embedding API unavailable')})
+        self.assertEqual(self._process(), 4)
+
+    def test_reconcile_queues_missed_and_orphaned_documents(self, thread):
+        self._process()
+        store = self.stores[self.user.id]
+        # Bulk updates bypass the signals.
+        Product.objects.filter(pk=self.phone.pk).update(description='Now with USB-C')
+        store.documents['business.Product:999999'] = {'content_hash': 'gone'}
+        FAQ.objects.filter(pk=self.faq.pk).update(embedding=None)
+
+        counts = VectorIndexer.reconcile(store_for=self._store_for, dry_run=True)
+        self.assertEqual(counts, {'upsert': 2, 'delete': 1})
+        self.assertFalse(VectorIndexOutbox.objects.exists())
+
+        VectorIndexer.reconcile(store_for=self._store_for)
+        self.assertEqual(self._process(), 3)
+        self.assertNotIn('business.Product:999999', store.documents)
+        self.assertFalse(FAQ.objects.filter(embedding__isnull=True).exists())
+        self.assertEqual(VectorIndexer.reconcile(store_for=self._store_for), {'upsert': 0, 'delete': 0})
+
+    def test_bulk_index_resumes_after_the_last_written_batch(self, thread):
+        products = [self.phone, self.other_product] + [
+            Product.objects.create(user=self.user, name=f'Case {i}', price=10, stock=1) for i in range(3)
+        ]
+
+        class RecordingEmbedder(FakeEmbedder):
+            def __init__(self, fail_on=None):
+                self.fail_on = fail_on
+                self.embedded = []
+
+            def embed_batch(self, texts):
+                if self.fail_on in texts:
+                    raise ConnectionError("embedding API unavailable")
+                self.embedded.extend(texts)
+                return super().embed_batch(texts)
+
+        with self.assertRaises(ConnectionError):
+            bulk_index('business.Product', embedder=RecordingEmbedder(fail_on='Case 1'), store_for=self._store_for,
+                       batch_size=2, workers=1)
+        checkpoint = BulkIndexCheckpoint.objects.get(run_key='business.Product|user=*')
+        self.assertEqual((checkpoint.last_id, checkpoint.indexed), (products[1].pk, 2))
+
+        embedder = RecordingEmbedder()
+        self.assertEqual(bulk_index('business.Product', embedder=embedder, store_for=self._store_for, batch_size=2), 3)
+        self.assertEqual(embedder.embedded, ['Case 0', 'Case 1', 'Case 2'])
+        self.assertEqual(
+            sorted(self.stores[self.user.id].indexed_metadata(id_prefix='business.Product:')),
+            sorted(f'business.Product:{product.pk}' for product in products if product.user_id == self.user.id)
+        )
+        self.assertFalse(BulkIndexCheckpoint.objects.exists())
+        self.assertEqual(bulk_index('business.Product', owner_id=self.other_user.id, embedder=self.embedder, store_for=self._store_for), 1)
+
+
+class PGVectorStoreTest(TransactionTestCase):
+    def setUp(self):
+        db = connection.settings_dict
+        self.url = f"postgresql+psycopg://{db['USER']}:{db['PASSWORD']}@{db['HOST']}:{db['PORT'] or 5432}/{db['NAME']}"
+        VectorStoreManager._tenant_stores.clear()
+        with override_settings(DATABASE_URL=self.url):
+            self.store = VectorStoreManager.for_tenant(7)
+            self.other_store = VectorStoreManager.for_tenant(8)
+
+    def tearDown(self):
+        VectorStoreManager._tenant_stores.clear()
+        for store in (self.store, self.other_store):
+            store.store.delete_collection()
+            store.store._engine.dispose()
+
+    def test_upsert_and_delete_are_scoped_to_the_collection(self):
+        vector = [1.0] + [0.0] * 767
+        self.store.upsert_embeddings(['business.Product:1'], ['Phone'], [vector], [{'content_hash': 'a'}])
+        self.other_store.upsert_embeddings(['business.Product:2'], ['Cable'], [vector], [{'content_hash': 'c'}])
+        self.store.upsert_embeddings(['business.Product:1'], ['Phone v2'], [vector], [{'content_hash': 'b'}])
+
+        self.assertEqual(self.store.indexed_metadata('business.Product:'), {'business.Product:1': 'b'})
+        self.assertEqual(self.store.indexed_metadata('knowledge_base.FAQ:'), {})
+        self.assertEqual(self.store.get_collection_stats()['document_count'], 1)
+
+        self.assertTrue(self.store.delete_documents(['business.Product:1', 'business.Product:2']))
+        self.assertEqual(self.store.indexed_metadata(), {})
+        self.assertEqual(self.other_store.indexed_metadata(), {'business.Product:2': 'c'})
+
+    def test_stores_do_not_build_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {VectorStoreManager.ANN_INDEX_NAME}")
+        VectorStoreManager._indexes_checked = False
+        self.assertFalse(VectorStoreManager.check_indexes())
+        VectorStoreManager._tenant_stores.clear()
+        with override_settings(DATABASE_URL=self.url):
+            store = VectorStoreManager.for_tenant(9)
+        self.addCleanup(store.store._engine.dispose)
+        self.addCleanup(store.store.delete_collection)
+        self.assertNotIn(VectorStoreManager.ANN_INDEX_NAME, self._index_names())
+
+        statements = VectorStoreManager.ensure_indexes()
+        self.assertTrue(all('CONCURRENTLY' in statement for statement in statements if 'INDEX' in statement))
+        self.assertTrue(VectorStoreManager.check_indexes())
+
+    def test_search_is_tenant_filtered_and_indexed(self):
+        VectorStoreManager.ensure_indexes()
+        self.assertIn(VectorStoreManager.ANN_INDEX_NAME, self._index_names())
+        near, far = [1.0] + [0.0] * 767, [0.0, 1.0] + [0.0] * 766
+        self.store.upsert_embeddings(
+            ['business.Product:1', 'business.Product:2', 'upload:1'], ['Phone', 'Cable', 'Untagged'], [far, near, near],
+            [{'user_id': 7}, {'user_id': 7}, {}]
+        )
+
+        results = self.store.search_by_vector(near, k=5)
+        self.assertEqual([doc.id for doc, _ in results], ['business.Product:2', 'business.Product:1'])
+        self.assertAlmostEqual(results[0][1], 0.0)
+        self.assertEqual(results[0][0].metadata, {'user_id': 7})
+        self.assertEqual(self.store.search_by_vector(near, k=1, ef_search=10), results[:1])
+        self.assertEqual(self.other_store.search_by_vector(near, k=5), [])
+
+    def test_search_follows_the_existing_index(self):
+        try:
+            check_quantization_support('float16')
+        except ImproperlyConfigured as e:
+            self.skipTest(str(e))
+        VectorStoreManager.ensure_indexes(rebuild=True, quantization='float16')
+        self.assertEqual(VectorStoreManager.index_quantization, 'float16')
+
+        # Workers read the index, not settings.VECTOR_QUANTIZATION ('').
+        VectorStoreManager.index_quantization = ''
+        self.assertTrue(VectorStoreManager.check_indexes())
+        self.assertEqual(VectorStoreManager.index_quantization, 'float16')
+
+        # IF NOT EXISTS keeps the halfvec index; searches keep matching it.
+        VectorStoreManager.ensure_indexes(quantization='')
+        self.assertEqual(VectorStoreManager.index_quantization, 'float16')
+        VectorStoreManager.ensure_indexes(rebuild=True, quantization='')
+        self.assertEqual(VectorStoreManager.index_quantization, '')
+
+    def _index_names(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'langchain_pg_embedding'")
+            return {name for (name,) in cursor.fetchall()}
+
+
+class NearestTest(TestCase):
+    def test_underfilled_ann_results_are_searched_exactly(self):
+        user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        category = Category.objects.create(user=user, name='Delivery')
+        FAQ.objects.create(category=category, question='Delivery time?', answer='2 days', embedding=[1.0] * 768)
+        queryset = FAQ.objects.filter(category__user=user).order_by(CosineDistance('embedding', [1.0] * 768))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(nearest(queryset, 5)), 1)
+        executed = ' '.join(query['sql'] for query in queries)
+        self.assertIn("set_config('hnsw.ef_search', '40', true)", executed)
+        self.assertIn('enable_indexscan = off', executed)
+
+    def test_float16_indexes_store_halfvec_copies(self):
+        self.assertEqual(
+            index_method_sql('hnsw', m=16, ef_construction=64, quantization='float16', dimensions=768),
+            "USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+        # As pg_indexes.indexdef reports them, which is where searches take their quantization from.
+        self.assertEqual(quantization_of_index(
+            "CREATE INDEX langchain_pg_embedding_ann ON public.langchain_pg_embedding "
+            "USING hnsw (((embedding)::halfvec(768)) halfvec_cosine_ops) WITH (m='16', ef_construction='64')"
+        ), 'float16')
+        self.assertEqual(quantization_of_index(
+            "CREATE INDEX langchain_pg_embedding_ann ON public.langchain_pg_embedding "
+            "USING hnsw (embedding vector_cosine_ops) WITH (m='16', ef_construction='64')"
+        ), '')
+
+
+class BagOfWordsEmbeddings:
+    model_name = 'bag-of-words'
+
+    def __init__(self):
+        self.embedder = FakeEmbedder()
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return self.embedder.embed_batch(texts)
+
+    def embed_query(self, text):
+        return self.embedder.embed_text(text)
+
+
+@mock.patch('chatbot.services.vector_index.Thread')
+class TenantFAISSIndexTest(TestCase):
+    def setUp(self):
+        try:
+            import faiss  # noqa: F401
+        except ImportError:
+            self.skipTest("faiss is not installed")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(TenantFAISSIndex._loaded.clear)
+        settings_override = override_settings(FAISS_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        category = Category.objects.create(user=self.user, name='Shipping')
+        self.delivery = FAQ.objects.create(category=category, question='How long is delivery?', answer='2-3 days.')
+        self.refund = FAQ.objects.create(category=category, question='Can I get a refund?', answer='Within 7 days.')
+        FAQ.objects.create(
+            category=Category.objects.create(user=other_user, name='Shipping'),
+            question='How long is delivery?', answer='A week.'
+        )
+        self.embeddings = BagOfWordsEmbeddings()
+
+    def test_persisted_per_tenant_and_updated_incrementally(self, thread):
+        index = TenantFAISSIndex(self.embeddings, self.user.id)
+        results = index.search('how long is delivery', k=5)
+        self.assertEqual([faq_id for faq_id, _ in results], [self.delivery.id, self.refund.id])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(len(self.embeddings.embedded), 2)
+
+        # A new process maps the saved index instead of embedding again.
+        TenantFAISSIndex._loaded.clear()
+        fresh = BagOfWordsEmbeddings()
+        self.assertEqual(TenantFAISSIndex(fresh, self.user.id).search('refund', k=1)[0][0], self.refund.id)
+        self.assertEqual(fresh.embedded, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.refund.answer = 'Refunds are accepted within 14 days.'
+            self.refund.save()
+            self.delivery.delete()
+        results = TenantFAISSIndex(fresh, self.user.id).search('refund days', k=5)
+        self.assertEqual([faq_id for faq_id, _ in results], [self.refund.id])
+        self.assertEqual(fresh.embedded, [self.refund.document_text])
+
+    def test_loaded_vectors_are_mapped_not_copied(self, thread):
+        import faiss
+        index = TenantFAISSIndex(self.embeddings, self.user.id)
+        index.search('delivery', k=1)
+
+        loaded = faiss.downcast_index(TenantFAISSIndex._loaded[index.index_path][1].index)
+        self.assertEqual(loaded.ntotal, 2)
+        self.assertFalse(loaded.codes.is_owned)
+
+    def test_quantized_index_rescores_and_rebuilds_on_change(self, thread):
+        import faiss
+        for quantization in ('float16', 'int8'):
+            with self.subTest(quantization=quantization):
+                TenantFAISSIndex._loaded.clear()
+                index = TenantFAISSIndex(self.embeddings, self.user.id, quantization=quantization)
+                index.sync()
+                exact = TenantFAISSIndex(BagOfWordsEmbeddings(), self.user.id, model_name='exact', quantization='')
+                for query in ('how long is delivery', 'refund'):
+                    quantized, reference = index.search(query, k=2), exact.search(query, k=2)
+                    self.assertEqual([faq_id for faq_id, _ in quantized], [faq_id for faq_id, _ in reference])
+                    # Re-scored scores are the full-precision ones.
+                    for (_, score), (_, expected) in zip(quantized, reference):
+                        self.assertAlmostEqual(score, expected, places=5)
+
+                # The codes and the float32 copy are mapped, not copied into the process.
+                refine = faiss.downcast_index(TenantFAISSIndex._loaded[index.index_path][1].index)
+                self.assertFalse(faiss.downcast_index(refine.base_index).codes.is_owned)
+                self.assertFalse(faiss.downcast_index(refine.refine_index).codes.is_owned)
+
+        embedded = len(self.embeddings.embedded)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delivery.delete()
+        index = TenantFAISSIndex(self.embeddings, self.user.id, quantization='int8')
+        self.assertEqual([faq_id for faq_id, _ in index.search('delivery refund', k=5)], [self.refund.id])
+        self.assertEqual(len(self.embeddings.embedded), embedded)
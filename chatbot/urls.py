@@ -1,5 +1,5 @@
 from django.urls import include, path
-from .views import AIConfigurationView, chat_with_ai, ChatMessageAPIView, AIModelViewSet, AdvanceChatAPIView, LangGraphChatAPIView
+from .views import AIConfigurationView, chat_with_ai, ChatMessageAPIView, AIModelViewSet, AdvanceChatAPIView, LangGraphChatAPIView, ToolCacheStatsAPIView
 from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
 router.register(r'ai-models', AIModelViewSet, basename='aimodel')
@@ -13,6 +13,7 @@ urlpatterns = [
     path('ai-config/', AIConfigurationView.as_view(), name='ai-configuration'),
     path("auto-response/", ChatMessageAPIView.as_view(), name="auto-response"),
     path("advance-chat/", AdvanceChatAPIView.as_view(), name="advance-chat"),
-    path("langgraph-chat/", LangGraphChatAPIView.as_view(), name="langgraph-chat")
+    path("langgraph-chat/", LangGraphChatAPIView.as_view(), name="langgraph-chat"),
+    path("tool-cache-stats/", ToolCacheStatsAPIView.as_view(), name="tool-cache-stats"),
 ]
 
@@ -179,4 +179,13 @@ class LangGraphChatAPIView(APIView):
             return Response({'response': ai_response, 'status': 'success'}, status=status.HTTP_200_OK)
 
         except Exception as e:
-            return Response({'error': str(e), 'status': 'error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'error': str(e), 'status': 'error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+from account.permissions import IsAuthenticatedAndVerifiedSuperAdmin
+from chatbot.services.tool_result_cache import ToolResultCache
+class ToolCacheStatsAPIView(APIView):
+    """Hit-rate counters of the agent tool result cache in the serving process."""
+    permission_classes = [IsAuthenticatedAndVerifiedSuperAdmin]
+
+    def get(self, request):
+        return Response(ToolResultCache.stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,11 @@
+class OrderPlacementError(Exception):
+    """Raised when an order cannot be placed"""
+    pass
+
+class ProductNotFoundError(OrderPlacementError):
+    """Raised when an ordered product does not exist for the business"""
+    pass
+
+class InsufficientStockError(OrderPlacementError):
+    """Raised when there is not enough stock left to reserve"""
+    pass
@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import Sum
+from django.db.models import F, Sum
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
@@ -95,6 +95,13 @@ class Customer(models.Model):
         self.orders_count = stats['count'] or 0
         self.total_spent = stats['total'] or 0
         self.save(update_fields=['orders_count', 'total_spent'])
+
+    def record_order(self, total):
+        """Count one new order without re-aggregating all of the customer's orders"""
+        Customer.objects.filter(pk=self.pk).update(
+            orders_count=F('orders_count') + 1,
+            total_spent=F('total_spent') + total
+        )
         
         
     def get_platforms(self):
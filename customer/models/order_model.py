@@ -93,7 +93,9 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         is_new = self._state.adding
         super().save(*args, **kwargs)
-        if is_new or self.has_important_changes():
+        if is_new:
+            self.customer.record_order(self.total)
+        elif self.has_important_changes():
             self.customer.update_stats()
 
     def has_important_changes(self):
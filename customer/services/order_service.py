@@ -0,0 +1,98 @@
+import logging
+import uuid
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from business.catalog import bump_catalog_version
+from business.models import Product
+from customer.exceptions import InsufficientStockError, ProductNotFoundError, OrderPlacementError
+from customer.models import Customer, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def generate_order_number() -> str:
+    return f"ORD-{timezone.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
+
+
+def place_order(user, customer: Customer, items: Iterable[Tuple[int, int]], source=Order.Source.MANUAL) -> Order:
+    """
+    Create an order for ``customer`` and reserve its stock atomically.
+
+    Args:
+        user: Business owner the products must belong to
+        customer: Customer placing the order
+        items: (product_id, quantity) pairs; repeated products are merged
+        source: Order source channel
+
+    Returns:
+        Order: the created order
+
+    Raises:
+        ProductNotFoundError: If a product does not exist for this business
+        InsufficientStockError: If any product has less stock than requested
+
+    All products are fetched and row-locked with a single ``SELECT ... FOR
+    UPDATE`` ordered by id, so concurrent orders over overlapping products
+    always lock in the same order and cannot deadlock. Stock is then decremented
+    by one conditional UPDATE that only matches rows that still have enough
+    stock; if any row is missing from the update, the whole order rolls back.
+    """
+    quantities: Dict[int, int] = {}
+    for product_id, quantity in items:
+        if quantity <= 0:
+            raise OrderPlacementError(f"Quantity for product {product_id} must be positive.")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise OrderPlacementError("Order items list cannot be empty.")
+
+    with transaction.atomic():
+        products = (
+            Product.objects.select_for_update()
+            .filter(user=user)
+            .order_by('pk')
+            .only('id', 'name', 'price', 'stock')
+            .in_bulk(sorted(quantities))
+        )
+        for product_id in quantities:
+            if product_id not in products:
+                raise ProductNotFoundError(f"Product with ID {product_id} not found.")
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            if product.stock < quantity:
+                raise InsufficientStockError(
+                    f"Not enough stock for product '{product.name}'. Available: {product.stock}."
+                )
+
+        has_stock = Q()
+        for product_id, quantity in quantities.items():
+            has_stock |= Q(pk=product_id, stock__gte=quantity)
+        reserved = Product.objects.filter(has_stock).update(
+            stock=Case(*[When(pk=pid, then=F('stock') - qty) for pid, qty in quantities.items()])
+        )
+        if reserved != len(quantities):
+            raise InsufficientStockError("Stock changed while the order was being placed. Please try again.")
+        # The queryset update sends no signals; snapshots and memoized searches show stock.
+        transaction.on_commit(lambda: bump_catalog_version(user.id))
+
+        total = sum((products[pid].price * qty for pid, qty in quantities.items()), Decimal('0'))
+        order = Order.objects.create(
+            order_number=generate_order_number(),
+            customer=customer,
+            items=sum(quantities.values()),
+            total=total,
+            status=Order.Status.PENDING,
+            payment_status=Order.PaymentStatus.PENDING,
+            source=source,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[pid], quantity=qty)
+            for pid, qty in quantities.items()
+        ])
+
+    logger.info(f"Order {order.order_number} created for customer {customer.id}.")
+    return order
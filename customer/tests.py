@@ -1,3 +1,93 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from business.models import Product
+from .exceptions import InsufficientStockError, ProductNotFoundError
+from .models import Customer, Order, OrderItem
+from .services.order_service import place_order
+
+User = get_user_model()
+
+
+class PlaceOrderTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.customer = Customer.objects.create(user=self.user, name='Rahim', city='Dhaka', police_station='Mirpur')
+        self.phone = Product.objects.create(user=self.user, name='iPhone 14', price='999.00', stock=3)
+        self.case = Product.objects.create(user=self.user, name='Case', price='15.50', stock=10)
+
+    def test_reserves_stock_and_updates_counters(self):
+        order = place_order(self.user, self.customer, [(self.phone.id, 1), (self.case.id, 2), (self.case.id, 1)])
+
+        self.assertEqual(order.items, 4)
+        self.assertEqual(str(order.total), '1045.50')
+        self.assertEqual(
+            dict(OrderItem.objects.filter(order=order).values_list('product_id', 'quantity')),
+            {self.phone.id: 1, self.case.id: 3}
+        )
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.stock, self.case.stock), (2, 7))
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.orders_count, str(self.customer.total_spent)), (1, '1045.50'))
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        with self.assertRaises(InsufficientStockError):
+            place_order(self.user, self.customer, [(self.case.id, 1), (self.phone.id, 4)])
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_other_business_products_are_not_found(self):
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        foreign = Product.objects.create(user=other, name='Foreign', price=1, stock=5)
+        with self.assertRaises(ProductNotFoundError):
+            place_order(self.user, self.customer, [(foreign.id, 1)])
+
+
+class ConcurrentOrderStressTest(TransactionTestCase):
+    THREADS = 12
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.customer = Customer.objects.create(user=self.user, name='Rahim', city='Dhaka', police_station='Mirpur')
+        self.first = Product.objects.create(user=self.user, name='Last units', price='10.00', stock=5)
+        self.second = Product.objects.create(user=self.user, name='Plenty', price='1.00', stock=1000)
+
+    def _run_concurrently(self, orders):
+        barrier = Barrier(len(orders))
+
+        def attempt(items):
+            try:
+                barrier.wait()
+                place_order(self.user, self.customer, items)
+                return True
+            except InsufficientStockError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(orders)) as executor:
+            return list(executor.map(attempt, orders))
+
+    def test_last_units_are_never_oversold(self):
+        results = self._run_concurrently([[(self.first.id, 1)]] * self.THREADS)
+
+        self.assertEqual(results.count(True), 5)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 0)
+        self.assertEqual(Order.objects.count(), 5)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.orders_count, 5)
+
+    def test_overlapping_orders_in_any_item_order_do_not_deadlock(self):
+        forward = [(self.first.id, 1), (self.second.id, 1)]
+        backward = [(self.second.id, 1), (self.first.id, 1)]
+        results = self._run_concurrently([forward, backward] * (self.THREADS // 2))
+
+        self.assertEqual(results.count(True), 5)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.stock, 995)
@@ -43,6 +43,10 @@ python manage.py seed_promotions || true
 python manage.py seed_faqs || true
 python manage.py seed_aimodels || true
 
+# Vector indexes are built here, concurrently, never inside a request
+echo "vector indexes"
+python manage.py vector_indexes || true
+
 
 # Collect static only in prod
 if [ "$DJANGO_ENV" = "production" ]; then
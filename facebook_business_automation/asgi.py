@@ -12,6 +12,10 @@ django_asgi_app = get_asgi_application()
 
 from .middlewares import JWTAuthMiddlewareStack
 from messaging.routing import websocket_urlpatterns
+from messaging.services.media_download_service import MediaDownloader
+
+# Resume media downloads left pending when the previous process stopped.
+MediaDownloader.notify()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
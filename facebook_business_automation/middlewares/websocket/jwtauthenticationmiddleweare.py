@@ -1,24 +1,28 @@
 """Authentication classes for channels."""
 from urllib.parse import parse_qs
 
-from channels.auth import AuthMiddlewareStack
-from channels.db import database_sync_to_async
-from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from django.db import close_old_connections
-from jwt import InvalidSignatureError, ExpiredSignatureError, DecodeError
-from jwt import decode as jwt_decode
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.token_user import CachedTokenUser, UserCache
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-User = get_user_model()
-
 
 class JWTAuthMiddleware:
-    """Middleware to authenticate user for channels"""
+    """
+    Middleware to authenticate user for channels.
+
+    The ``token`` query parameter is validated like the REST API validates
+    access tokens (signature, expiry, token type), and the user is built
+    from its claims. Whether the account still exists and is active comes
+    from UserCache, so a reconnect storm after a deploy costs at most one
+    query per user instead of one per connect.
+    """
 
     def __init__(self, app):
         """Initializing the app."""
@@ -26,56 +30,37 @@ class JWTAuthMiddleware:
 
     async def __call__(self, scope, receive, send):
         """Authenticate the user based on jwt."""
-        close_old_connections()
-        try:
-            # Decode the query string and get token parameter from it.
-            query_string = scope.get("query_string", b"").decode("utf-8")
-            query_params = parse_qs(query_string)
-            token = query_params.get("token", [None])[0]
-            # token = parse_qs(scope["query_string"].decode("utf8")).get('token', None)[0]
-            
-            if not token:
-                raise ValueError("No token provided")
-
-            # Decode the token to get the user id from it.
-            payload = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-
-            # data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            if payload.get('token_type') != 'access':
-                raise ValueError("Invalid token type")
-            
-            # Get the user from database based on user id and add it to the scope.
-            # scope['user'] = await self.get_user(data['user_id'])
-            scope['user'] = await self.get_user(payload['user_id'])
+        scope = dict(scope, user=await self.authenticate(scope))
+        return await self.app(scope, receive, send)
 
-        # except (TypeError, KeyError, InvalidSignatureError, ExpiredSignatureError, DecodeError):
-        #     # Set the user to Anonymous if token is not valid or expired.
-        #     scope['user'] = AnonymousUser()
+    async def authenticate(self, scope):
+        """The CachedTokenUser of the connect's access token, or AnonymousUser."""
+        query_params = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+        token = query_params.get("token", [None])[0]
+        if not token:
+            logger.debug("Token validation error: No token provided")
+            return AnonymousUser()
 
-        except (ValueError, IndexError, KeyError) as e:
+        try:
+            validated = AccessToken(token)
+        except TokenError as e:
             logger.debug(f"Token validation error: {str(e)}")
-            scope['user'] = AnonymousUser()
-        except (InvalidSignatureError, DecodeError):
-            logger.warning("Invalid token signature")
-            scope['user'] = AnonymousUser()
-        except ExpiredSignatureError:
-            logger.debug("Token expired")
-            scope['user'] = AnonymousUser()
-        except Exception as e:
-            logger.error(f"Unexpected authentication error: {str(e)}")
-            scope['user'] = AnonymousUser()
-            
-        return await self.app(scope, receive, send)
+            return AnonymousUser()
 
-    @database_sync_to_async
-    def get_user(self, user_id):
-        """Return the user based on user id."""
         try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
+            fields = await UserCache.get(validated[api_settings.USER_ID_CLAIM])
+        except Exception as e:
+            logger.error(f"Unexpected authentication error: {str(e)}")
+            return AnonymousUser()
+        if not fields or not fields['is_active']:
+            logger.debug(f"Token of unknown or inactive user {validated.get(api_settings.USER_ID_CLAIM)}")
             return AnonymousUser()
+        return CachedTokenUser(validated, fields)
 
 
 def JWTAuthMiddlewareStack(app):
-    """This function wrap channels authentication stack with JWTAuthMiddleware."""
-    return JWTAuthMiddleware(AuthMiddlewareStack(app))
\ No newline at end of file
+    """
+    Wrap ``app`` in JWTAuthMiddleware. Websocket clients authenticate with
+    tokens only, so no session or cookie middleware runs on connect.
+    """
+    return JWTAuthMiddleware(app)
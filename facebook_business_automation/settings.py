@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     "corsheaders",
     "phonenumber_field",
@@ -171,6 +172,30 @@ DATABASES = {
 # Redis settings for caching and message history
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+# Cross-worker state lives in the cache: catalog and FAQ versions (business/catalog.py,
+# chatbot/services/tool_result_cache.py), websocket auth (account/token_user.py), API
+# throttling. gunicorn runs several workers, so production shares Redis; local development
+# runs one process. Set SHARED_CACHE_ENABLED=0 to run without Redis, e.g. tests with DEBUG off.
+SHARED_CACHE_ENABLED = os.environ.get('SHARED_CACHE_ENABLED', '0' if DEBUG else '1') == '1'
+if not SHARED_CACHE_ENABLED:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get('REDIS_URL', 'redis://redis:6379/0'),
+            "KEY_PREFIX": "fba",
+        }
+    }
+
+# Serve product filters from per-process numpy snapshots of each catalog (business/catalog.py)
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED') == '1'
+CATALOG_SNAPSHOT_MAX_AGE = 300  # Seconds a snapshot is served before it is rebuilt, even without a version bump
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -224,6 +249,22 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Messenger attachment downloads (messaging/services/media_download_service.py)
+MEDIA_DOWNLOAD_CONCURRENCY = 16  # Downloads in flight per worker process
+MEDIA_DOWNLOAD_PER_HOST = 4  # Downloads in flight per CDN host and worker process
+MEDIA_DOWNLOAD_MAX_ATTEMPTS = 6
+MEDIA_DOWNLOAD_RETRY_BASE = 2  # Seconds; retry n waits a random time up to base * 2**n (full jitter)
+MEDIA_DOWNLOAD_RETRY_CAP = 300  # Longest wait between two attempts, in seconds
+MEDIA_DOWNLOAD_TIMEOUT = 30  # Seconds without progress before a download attempt fails
+MEDIA_DOWNLOAD_SPOOL_SIZE = 1024 * 1024  # Downloads are kept in memory up to this size, then in a temp file
+MEDIA_THUMBNAIL_SIZE = 320  # Longest side of WebP thumbnails and video posters, in pixels
+MEDIA_THUMBNAIL_WORKERS = 2  # Processes rendering thumbnails per worker process
+
+# Media proxy (messaging/utils/media_response.py)
+MEDIA_PROXY_SENDFILE = os.environ.get('MEDIA_PROXY_SENDFILE', '')  # '', 'x-accel-redirect' (nginx) or 'x-sendfile'
+MEDIA_PROXY_ACCEL_PREFIX = '/protected-media/'  # nginx `internal` location aliased to MEDIA_ROOT
+MEDIA_PROXY_MAX_AGE = 24 * 60 * 60  # Seconds browsers may reuse a proxied media file
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -309,6 +350,13 @@ else:
         },
     }
 
+# Chat websocket (messaging/consumers.py)
+WEBSOCKET_HEARTBEAT_INTERVAL = 30  # Seconds between server pings
+WEBSOCKET_HEARTBEAT_TIMEOUT = 40  # Seconds without any client frame before the connection is closed (4002)
+WEBSOCKET_MAX_CONNECTIONS_PER_USER = 10  # Further connections are closed with 4004
+WEBSOCKET_AUTH_CACHE_TTL = 60  # Seconds a connect trusts the cached account state of a token's user
+
+
 
 AUTH_USER_MODEL = "account.User"
 
@@ -405,11 +453,39 @@ EMBEDDING_DEVICE = "auto"  # Automatically detects GPU/CPU
 # Optional: Model cache directory
 HF_HOME = "/path/to/model_cache"  # For offline usage
 EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"  # Best general-purpose model
+EMBEDDING_DIMENSIONS = 768  # Output size of EMBEDDING_MODEL; must match the vector columns
+# 'endpoint' (HuggingFace inference API), or run EMBEDDING_MODEL in-process on CPU:
+# 'sentence-transformers' (PyTorch) or 'onnx' (ONNX Runtime); both need sentence-transformers installed
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'endpoint')
+EMBEDDING_MAX_BATCH_SIZE = 32  # Texts per request/forward pass
+EMBEDDING_BATCH_WAIT_MS = 5  # How long a local embed_text call waits for others to share its forward pass
 HUGGINGFACEHUB_API_TOKEN = os.environ.get('HUGGINGFACEHUB_API_TOKEN') #  for HuggingFaceEndpointEmbeddings
 
+# Approximate nearest-neighbour indexes on the vector columns (chatbot/services/vector_search.py).
+# Changing the HNSW build parameters needs a migration for the model columns and
+# `manage.py vector_indexes --rebuild` for langchain_pg_embedding.
+VECTOR_INDEX_TYPE = os.environ.get('VECTOR_INDEX_TYPE', 'hnsw')  # langchain_pg_embedding: 'hnsw' or 'ivfflat'
+VECTOR_HNSW_M = 16  # Links per graph node; higher improves recall at the cost of index size and build time
+VECTOR_HNSW_EF_CONSTRUCTION = 64  # Candidate list size while building the graph
+VECTOR_HNSW_EF_SEARCH = 40  # Default candidate list size per query (raised to at least k)
+VECTOR_IVFFLAT_LISTS = 100  # IVFFlat clusters; about rows / 1000 up to 1M rows, sqrt(rows) beyond
+VECTOR_IVFFLAT_PROBES = 10  # IVFFlat clusters scanned per query
+# Quantized ANN search: candidates are found on compact vectors and the top k * VECTOR_RESCORE_FACTOR
+# are re-scored at full precision. langchain_pg_embedding: '' or 'float16' (a halfvec index;
+# needs pgvector >= 0.7 and `manage.py vector_indexes --rebuild`).
+VECTOR_QUANTIZATION = os.environ.get('VECTOR_QUANTIZATION', '')
+VECTOR_RESCORE_FACTOR = 4
+# Per-owner FAISS FAQ indexes (chatbot/services/faiss_index.py); needs faiss-cpu. Share it between workers.
+FAISS_INDEX_DIR = os.environ.get('FAISS_INDEX_DIR', os.path.join(BASE_DIR, 'faiss_indexes'))
+FAISS_QUANTIZATION = os.environ.get('FAISS_QUANTIZATION', '')  # '', 'float16' or 'int8' (see VECTOR_RESCORE_FACTOR)
+
 
 # =============== Whitenoise ========================================
 STORAGES = {
+    # Overriding STORAGES drops Django's default; without it no FileField can be saved.
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     }
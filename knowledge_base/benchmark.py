@@ -0,0 +1,215 @@
+"""
+Retrieval benchmark over the data created by ``seed_faqs`` and ``seed_products``.
+
+Each labelled query names the FAQ question or product that should be
+retrieved for it. Every backend runs every query: once untimed, so caches and
+indexes are warm, then ``repeat`` timed times. The report holds, per corpus
+and backend, recall@k and MRR (reciprocal rank of the expected document in the
+top k, 0 when missing), p50/p99 latency and the database queries issued per
+search. It is plain JSON, so runs on two commits can be diffed.
+"""
+import logging
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from business.models import Product
+from .models import FAQ
+from .retrieval import CANDIDATE_MULTIPLIER, HybridFAQRetriever, reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+# Customer phrasings of the FAQs created by seed_faqs, labelled with the
+# question they should retrieve.
+FAQ_QUERIES = [
+    ("are these original products or fake", "Are your products authentic?"),
+    ("is there any warranty on the items", "Do you offer product warranties?"),
+    ("item out of stock, can you bring it back", "Can I request a product that is out of stock?"),
+    ("which size should I choose", "How do I find the right size or variant?"),
+    ("how can I sign up my shop", "How do I register my business on your platform?"),
+    ("do I have to pay to list products", "Is there a fee for listing products?"),
+    ("can I change stock and prices on my own", "Can I manage inventory and pricing myself?"),
+    ("where can I see my sales analytics", "Do you provide sales reports?"),
+]
+
+# Customer phrasings of the products created by seed_products, labelled with the product name.
+PRODUCT_QUERIES = [
+    ("iphone 14 er dam koto", "Apple iPhone 14"),
+    ("android phone with 5g", "Samsung Galaxy A54"),
+    ("noise cancelling headphones", "Sony WH-1000XM4"),
+    ("power bank for my phone", "Anker PowerCore 10000"),
+    ("slim fit jeans", "Levi's 511 Slim Jeans"),
+    ("t-shirt for gym training", "Nike Dri-FIT T-Shirt"),
+    ("cotton hoodie", "H&M Cotton Hoodie"),
+    ("cooking oil 1 litre", "Fresh Soyabean Oil 1L"),
+    ("tea 400g packet", "Brooke Bond Taaza Tea 400g"),
+    ("book about building good habits", "Atomic Habits by James Clear"),
+    ("paulo coelho novel", "The Alchemist by Paulo Coelho"),
+]
+
+BACKENDS = ['icontains', 'fulltext', 'pgvector', 'faiss', 'hybrid']
+CORPORA = ['faq', 'product']
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class _LangChainEmbeddings:
+    """The embedding service under the LangChain interface TenantFAISSIndex expects."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.model_name = getattr(embedder, 'model_name', None) or settings.EMBEDDING_MODEL
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedder.embed_text(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedder.embed_batch(texts)
+
+
+class RetrievalBenchmark:
+    """
+    Runs the labelled queries of one business owner against each backend.
+
+    ``embedder`` defaults to the shared HuggingFaceEmbeddingService and
+    ``store_for`` to ``VectorStoreManager.for_tenant`` (the product vectors).
+    A backend that does not exist for a corpus or cannot run here is reported
+    with an ``error`` instead of metrics.
+    """
+
+    def __init__(self, user, k: int = 3, repeat: int = 5, embedder=None, store_for: Callable = None):
+        self.user = user
+        self.k = k
+        self.repeat = repeat
+        self._embedder = embedder
+        self._store_for = store_for
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+            self._embedder = HuggingFaceEmbeddingService()
+        return self._embedder
+
+    def run(self, corpora: Iterable[str] = None, backends: Iterable[str] = None) -> Dict:
+        report = {'k': self.k, 'repeat': self.repeat, 'corpora': {}}
+        for corpus in corpora or CORPORA:
+            queries = self.labelled_queries(corpus)
+            results = report['corpora'][corpus] = {'queries': len(queries), 'backends': {}}
+            for backend in backends or BACKENDS:
+                search = getattr(self, f'_{corpus}_{backend}', None)
+                if search is None:
+                    results['backends'][backend] = {'error': f"no {backend} search for {corpus} retrieval"}
+                    continue
+                try:
+                    results['backends'][backend] = self.measure(search, queries)
+                except Exception as e:
+                    logger.warning(f"{backend} {corpus} retrieval failed: {str(e)}")
+                    results['backends'][backend] = {'error': str(e)}
+        return report
+
+    def labelled_queries(self, corpus: str) -> List[tuple]:
+        """(query, expected id) pairs whose labelled document exists for this owner."""
+        if corpus == 'faq':
+            labelled = FAQ_QUERIES
+            ids = dict(FAQ.objects.filter(category__user=self.user).values_list('question', 'id'))
+        else:
+            labelled = PRODUCT_QUERIES
+            ids = dict(Product.objects.filter(user=self.user).values_list('name', 'id'))
+        return [(query, ids[label]) for query, label in labelled if label in ids]
+
+    def measure(self, search: Callable[[str, int], List[int]], queries: List[tuple]) -> Dict:
+        if not queries:
+            return {'error': "no labelled documents found; run seed_faqs and seed_products"}
+        reciprocal_ranks, latencies, query_counts, misses = [], [], [], []
+        for query, expected_id in queries:
+            found = search(query, self.k)
+            for _ in range(self.repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    found = search(query, self.k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                query_counts.append(len(captured))
+            found = list(found)[:self.k]
+            reciprocal_ranks.append(1.0 / (found.index(expected_id) + 1) if expected_id in found else 0.0)
+            if expected_id not in found:
+                misses.append(query)
+
+        return {
+            f'recall@{self.k}': round(sum(rank > 0 for rank in reciprocal_ranks) / len(queries), 4),
+            'mrr': round(statistics.mean(reciprocal_ranks), 4),
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'queries_per_search': round(statistics.mean(query_counts), 2),
+            'misses': misses,
+        }
+
+    # FAQ backends
+
+    def _faq_icontains(self, query: str, k: int) -> List[int]:
+        # The keyword lookup the chatbot used before ranked search: any word in question or answer.
+        condition = Q()
+        for word in query.lower().split():
+            condition |= Q(question__icontains=word) | Q(answer__icontains=word)
+        faqs = FAQ.objects.filter(category__user=self.user).filter(condition).distinct()
+        return list(faqs.values_list('id', flat=True)[:k])
+
+    def _faq_retriever(self) -> HybridFAQRetriever:
+        return HybridFAQRetriever(self.user, embedder=self.embedder)
+
+    def _faq_fulltext(self, query: str, k: int) -> List[int]:
+        return [faq['id'] for faq in self._faq_retriever().search(query, limit=k, mode='standard')]
+
+    def _faq_pgvector(self, query: str, k: int) -> List[int]:
+        return [faq['id'] for faq in self._faq_retriever().search(query, limit=k, mode='semantic')]
+
+    def _faq_hybrid(self, query: str, k: int) -> List[int]:
+        return [faq['id'] for faq in self._faq_retriever().search(query, limit=k, mode='hybrid')]
+
+    def _faq_faiss(self, query: str, k: int) -> List[int]:
+        from chatbot.services.faiss_index import TenantFAISSIndex
+        index = TenantFAISSIndex(_LangChainEmbeddings(self.embedder), self.user.id)
+        return [faq_id for faq_id, _ in index.search(query, k=k)]
+
+    # Product backends
+
+    def _product_icontains(self, query: str, k: int) -> List[int]:
+        # The product tool's lookup: the whole phrase in name, description or category.
+        products = Product.objects.filter(user=self.user).filter(
+            Q(name__icontains=query) | Q(description__icontains=query) | Q(category__name__icontains=query)
+        )
+        return list(products.values_list('id', flat=True)[:k])
+
+    def _product_fulltext(self, query: str, k: int) -> List[int]:
+        return list(Product.objects.filter(user=self.user).search(query).values_list('id', flat=True)[:k])
+
+    def _product_pgvector(self, query: str, k: int) -> List[int]:
+        store = self._product_store()
+        results = store.search_by_vector(
+            self.embedder.embed_text(query), k=k, filter={'source_type': Product._meta.label}
+        )
+        return [int(document.metadata['source_id']) for document, _ in results]
+
+    def _product_hybrid(self, query: str, k: int) -> List[int]:
+        candidates = k * CANDIDATE_MULTIPLIER
+        rankings = [self._product_fulltext(query, candidates), self._product_pgvector(query, candidates)]
+        fused = reciprocal_rank_fusion([ranking for ranking in rankings if ranking])
+        return sorted(fused, key=fused.get, reverse=True)[:k]
+
+    def _product_store(self):
+        store_for = self._store_for
+        if store_for is None:
+            from chatbot.services.llm.vector_store import VectorStoreManager
+            store_for = VectorStoreManager.for_tenant
+        store = store_for(self.user.id)
+        if store is None:
+            raise RuntimeError("no vector store configured (DATABASE_URL is not set)")
+        return store
@@ -0,0 +1,58 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from knowledge_base.benchmark import BACKENDS, CORPORA, RetrievalBenchmark
+
+User = get_user_model()
+"""
+python manage.py seed_faqs && python manage.py seed_products && python manage.py bulk_index_vectors
+python manage.py benchmark_retrieval
+python manage.py benchmark_retrieval --corpus faq --backend fulltext --backend hybrid --k 5
+python manage.py benchmark_retrieval --json retrieval.json   # diff against another commit's run
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k, MRR, p50/p99 latency and queries issued of each FAQ and product "
+        "retrieval backend on the seeded data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='t@t.com', help="Business owner whose data is searched")
+        parser.add_argument('--k', type=int, default=3, help="Number of results considered")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query")
+        parser.add_argument('--corpus', action='append', choices=CORPORA, help="Only this corpus (repeatable)")
+        parser.add_argument('--backend', action='append', choices=BACKENDS, help="Only this backend (repeatable)")
+        parser.add_argument('--json', metavar='PATH', help="Write the report as JSON ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f"No user {options['email']}; create it and run the seed commands first")
+
+        report = RetrievalBenchmark(user, k=options['k'], repeat=options['repeat']).run(
+            corpora=options['corpus'], backends=options['backend']
+        )
+        if options['json']:
+            output = json.dumps(report, indent=2, sort_keys=True)
+            if options['json'] == '-':
+                self.stdout.write(output)
+                return
+            with open(options['json'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(f"Report written to {options['json']}")
+
+        k = options['k']
+        for corpus, results in report['corpora'].items():
+            self.stdout.write(f"\n{corpus} ({results['queries']} labelled queries x {options['repeat']})")
+            for backend, metrics in results['backends'].items():
+                if 'error' in metrics:
+                    self.stdout.write(self.style.WARNING(f"  {backend:<10} skipped: {metrics['error']}"))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f"  {backend:<10} recall@{k}={metrics[f'recall@{k}']:.2f} mrr={metrics['mrr']:.2f} "
+                    f"p50={metrics['p50_ms']:.1f}ms p99={metrics['p99_ms']:.1f}ms "
+                    f"queries={metrics['queries_per_search']:g}"
+                ))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from knowledge_base.models import Category, FAQ 
+from knowledge_base.retrieval import index_faq_embeddings
 
 User = get_user_model()
 """
@@ -75,4 +76,10 @@ class Command(BaseCommand):
                 else:
                     self.stdout.write(f"FAQ already exists: {faq.question}")
 
+        try:
+            indexed = index_faq_embeddings(FAQ.objects.filter(category__user=user, embedding__isnull=True))
+            self.stdout.write(self.style.SUCCESS(f"Embedded {indexed} FAQs for semantic search"))
+        except Exception as e:
+            self.stderr.write(self.style.WARNING(f"⚠️ Could not embed FAQs, semantic search will skip them: {e}"))
+
         self.stdout.write(self.style.SUCCESS("Product & Business FAQ seeding complete!"))
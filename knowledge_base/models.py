@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth import get_user_model
+from pgvector.django import HnswIndex, VectorField
+from business.search import SEARCH_CONFIG
 User = get_user_model()
 
 class Category(models.Model):
@@ -18,12 +23,31 @@ class FAQ(models.Model):
     question = models.CharField(max_length=255)
     answer = models.TextField()
     category = models.ForeignKey(Category, related_name='faqs', on_delete=models.CASCADE)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('question', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('answer', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Embedding of ``document_text``; NULL until the FAQ has been indexed.
+    embedding = VectorField(dimensions=settings.EMBEDDING_DIMENSIONS, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['question']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='kb_faq_search_gin'),
+            HnswIndex(
+                fields=['embedding'], name='kb_faq_embedding_hnsw', opclasses=['vector_cosine_ops'],
+                m=settings.VECTOR_HNSW_M, ef_construction=settings.VECTOR_HNSW_EF_CONSTRUCTION,
+            ),
+        ]
 
     def __str__(self):
         return self.question
 
-
-
+    @property
+    def document_text(self) -> str:
+        """Text that is embedded for semantic search."""
+        return f"Q: {self.question}\nA: {self.answer}"
@@ -0,0 +1,148 @@
+"""
+Tenant-scoped FAQ retrieval.
+
+Two rankers run over the FAQs of one business:
+
+- full-text: the stored ``search_vector`` ranked with cover-density ``ts_rank_cd``
+  normalized by document length, a BM25-like score that favours short FAQs
+  matching many query terms;
+- semantic: cosine distance between the query embedding and ``FAQ.embedding``.
+
+Hybrid search merges both rankings with reciprocal rank fusion (RRF), which only
+looks at positions, so the two incomparable score scales never have to be mixed.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F
+from pgvector.django import CosineDistance
+
+from business.search import build_prefix_query
+from chatbot.services.vector_search import nearest
+from .models import FAQ
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+# Each ranker contributes this many candidates per requested result to fusion.
+CANDIDATE_MULTIPLIER = 4
+# ts_rank_cd normalization flag 1: divide the rank by 1 + log(document length).
+LENGTH_NORMALIZATION = 1
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = RRF_K) -> Dict[int, float]:
+    """Fuse ranked id lists: ``score(d) = sum(1 / (k + rank_i(d)))`` with 1-based ranks."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + position)
+    return scores
+
+
+def index_faq_embeddings(faqs: Iterable[FAQ], embedder=None, batch_size: int = 32) -> int:
+    """Embed ``document_text`` for the given FAQs and store it. Returns the number updated."""
+    if embedder is None:
+        from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+        embedder = HuggingFaceEmbeddingService()
+
+    faqs = list(faqs)
+    for start in range(0, len(faqs), batch_size):
+        batch = faqs[start:start + batch_size]
+        vectors = embedder.embed_batch([faq.document_text for faq in batch])
+        for faq, vector in zip(batch, vectors):
+            faq.embedding = vector
+        FAQ.objects.bulk_update(batch, ['embedding'])
+    return len(faqs)
+
+
+class HybridFAQRetriever:
+    """Full-text, semantic and fused FAQ search for a single business owner."""
+
+    def __init__(self, user, embedder=None):
+        self.user = user
+        self._embedder = embedder
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+            self._embedder = HuggingFaceEmbeddingService()
+        return self._embedder
+
+    def base_queryset(self):
+        return FAQ.objects.filter(category__user=self.user)
+
+    def keyword_ranking(self, query: str, limit: int) -> Dict[int, float]:
+        """FAQ ids ordered by full-text rank, mapped to that rank."""
+        search_query = build_prefix_query(query)
+        if search_query is None:
+            return {}
+        rank = SearchRank(F('search_vector'), search_query, cover_density=True, normalization=LENGTH_NORMALIZATION)
+        rows = (
+            self.base_queryset()
+            .filter(search_vector=search_query)
+            .annotate(rank=rank)
+            .order_by('-rank', 'id')
+            .values_list('id', 'rank')[:limit]
+        )
+        return {faq_id: float(rank) for faq_id, rank in rows}
+
+    def semantic_ranking(self, query: str, limit: int) -> Dict[int, float]:
+        """FAQ ids ordered by cosine similarity, mapped to that similarity."""
+        query_embedding = self._embed_query(query)
+        if query_embedding is None:
+            return {}
+        rows = nearest(
+            self.base_queryset()
+            .filter(embedding__isnull=False)
+            .annotate(distance=CosineDistance('embedding', query_embedding))
+            .order_by('distance')
+            .values_list('id', 'distance'),
+            limit,
+        )
+        return {faq_id: 1.0 - float(distance) for faq_id, distance in rows}
+
+    def search(self, query: str, limit: int = 5, mode: str = 'hybrid') -> List[Dict]:
+        """
+        Return up to ``limit`` FAQs as dicts with a ``relevance`` score in [0, 1].
+
+        ``standard`` uses full-text only and ``semantic`` uses embeddings only.
+        ``hybrid`` fuses both and falls back to full-text alone when the query
+        cannot be embedded.
+        """
+        candidates = limit * CANDIDATE_MULTIPLIER
+
+        if mode == 'standard':
+            ranks = self.keyword_ranking(query, limit)
+            top = max(ranks.values(), default=0.0) or 1.0
+            scores = {faq_id: rank / top for faq_id, rank in ranks.items()}
+        elif mode == 'semantic':
+            scores = self.semantic_ranking(query, limit)
+        else:
+            keyword = list(self.keyword_ranking(query, candidates))
+            semantic = list(self.semantic_ranking(query, candidates))
+            fused = reciprocal_rank_fusion([ranking for ranking in (keyword, semantic) if ranking])
+            # Best possible fused score: first place in every ranking used.
+            best = sum(1.0 / (RRF_K + 1) for ranking in (keyword, semantic) if ranking)
+            scores = {faq_id: score / best for faq_id, score in fused.items()}
+
+        ordered_ids = sorted(scores, key=lambda faq_id: scores[faq_id], reverse=True)[:limit]
+        faqs = self.base_queryset().select_related('category').in_bulk(ordered_ids)
+        return [
+            {
+                'id': faq_id,
+                'question': faqs[faq_id].question,
+                'answer': faqs[faq_id].answer,
+                'category': faqs[faq_id].category.name,
+                'relevance': scores[faq_id],
+            }
+            for faq_id in ordered_ids if faq_id in faqs
+        ]
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        try:
+            return self.embedder.embed_text(query)
+        except Exception as e:
+            logger.warning(f"FAQ query embedding failed, skipping semantic ranking: {str(e)}")
+            return None
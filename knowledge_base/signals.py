@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from chatbot.services import vector_index
+from chatbot.services.faiss_index import TenantFAISSIndex
+from chatbot.services.tool_result_cache import ToolResultCache
+from .models import Category, FAQ
+
+
+def _invalidate_faq_caches(owner_id):
+    ToolResultCache.invalidate_faqs(owner_id)
+    TenantFAISSIndex.mark_stale(owner_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_tool_results(sender, instance, **kwargs):
+    """Drop memoized FAQ search results and FAISS indexes of the owner once the change is committed."""
+    transaction.on_commit(lambda: _invalidate_faq_caches(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=FAQ)
+def invalidate_faq_tool_results(sender, instance, **kwargs):
+    owner_id = Category.objects.filter(pk=instance.category_id).values_list('user_id', flat=True).first()
+    if owner_id is not None:
+        transaction.on_commit(lambda: _invalidate_faq_caches(owner_id))
+
+
+@receiver(post_save, sender=FAQ)
+def queue_faq_vector_upsert(sender, instance, update_fields=None, **kwargs):
+    """Queue the FAQ for (re-)embedding in the same transaction as the edit."""
+    vector_index.queue_upsert(instance, update_fields)
+
+
+@receiver(pre_delete, sender=FAQ)
+def queue_faq_vector_delete(sender, instance, **kwargs):
+    vector_index.queue_delete(instance)
@@ -1,3 +1,107 @@
+import hashlib
+import math
+
+import json
+
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from business.models import Product
+from .benchmark import RetrievalBenchmark
+from .models import Category, FAQ
+from .retrieval import HybridFAQRetriever, index_faq_embeddings, reciprocal_rank_fusion
+
+User = get_user_model()
+
+
+class FakeEmbedder:
+    """Deterministic bag-of-words embedder so tests never call the embedding API."""
+
+    def embed_text(self, text):
+        vector = [0.0] * settings.EMBEDDING_DIMENSIONS
+        for word in text.lower().replace('?', ' ').split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % len(vector)] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_batch(self, texts):
+        return [self.embed_text(text) for text in texts]
+
+
+class ReciprocalRankFusionTest(TestCase):
+    def test_documents_ranked_by_both_lists_win(self):
+        scores = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+        self.assertEqual(sorted(scores, key=scores.get, reverse=True), [1, 3, 2])
+        self.assertAlmostEqual(scores[1], 1 / 61 + 1 / 62)
+
+
+class HybridFAQRetrieverTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        shipping = Category.objects.create(user=self.user, name='Shipping')
+        self.delivery = FAQ.objects.create(
+            category=shipping, question='How long does delivery take?',
+            answer='Orders inside Dhaka arrive within 2 days.'
+        )
+        self.returns = FAQ.objects.create(
+            category=shipping, question='What is your return policy?',
+            answer='Unused items can be returned within 7 days.'
+        )
+        FAQ.objects.create(
+            category=Category.objects.create(user=self.other_user, name='Shipping'),
+            question='How long does delivery take?', answer='Another shop answer.'
+        )
+        self.embedder = FakeEmbedder()
+        index_faq_embeddings(FAQ.objects.all(), embedder=self.embedder)
+        self.retriever = HybridFAQRetriever(self.user, embedder=self.embedder)
+
+    def test_results_are_scoped_to_the_tenant(self):
+        for mode in ('standard', 'semantic', 'hybrid'):
+            results = self.retriever.search('delivery', limit=5, mode=mode)
+            self.assertTrue(results, mode)
+            self.assertTrue(all(r['id'] in (self.delivery.id, self.returns.id) for r in results), mode)
+
+    def test_hybrid_ranks_best_match_first(self):
+        results = self.retriever.search('how long does delivery take', limit=2)
+        self.assertEqual(results[0]['id'], self.delivery.id)
+        self.assertAlmostEqual(results[0]['relevance'], 1.0)
+
+    def test_hybrid_falls_back_to_full_text_without_embeddings(self):
+        class BrokenEmbedder:
+            def embed_text(self, text):
+                raise ConnectionError("embedding API unavailable")
+
+        retriever = HybridFAQRetriever(self.user, embedder=BrokenEmbedder())
+        results = retriever.search('return policy', limit=2)
+        self.assertEqual([r['id'] for r in results], [self.returns.id])
+
+
+class RetrievalBenchmarkTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='t@t.com', password='testpass123')
+        category = Category.objects.create(user=self.user, name='Platform')
+        FAQ.objects.create(category=category, question='Is there a fee for listing products?', answer='Listing is free.')
+        FAQ.objects.create(category=category, question='Do you provide sales reports?', answer='Yes, see Analytics.')
+        Product.objects.create(user=self.user, name='H&M Cotton Hoodie', price=30, stock=5)
+        Product.objects.create(user=self.user, name='Apple iPhone 14', price=999, stock=2)
+        index_faq_embeddings(FAQ.objects.all(), embedder=FakeEmbedder())
+
+    def test_reports_each_backend_as_diffable_json(self):
+        report = RetrievalBenchmark(self.user, k=2, repeat=2, embedder=FakeEmbedder(), store_for=lambda user_id: None).run(
+            backends=['icontains', 'fulltext', 'pgvector', 'hybrid']
+        )
+        self.assertEqual(json.loads(json.dumps(report)), report)
+
+        faq = report['corpora']['faq']
+        self.assertEqual(faq['queries'], 2)
+        for backend in ('icontains', 'fulltext', 'pgvector', 'hybrid'):
+            metrics = faq['backends'][backend]
+            self.assertEqual(set(metrics), {'recall@2', 'mrr', 'p50_ms', 'p99_ms', 'queries_per_search', 'misses'})
+            self.assertGreaterEqual(metrics['queries_per_search'], 1)
+        self.assertEqual(faq['backends']['fulltext']['recall@2'], 1.0)
 
-# Create your tests here.
+        product = report['corpora']['product']
+        self.assertEqual(product['queries'], 2)
+        self.assertEqual(product['backends']['fulltext']['mrr'], 1.0)
+        self.assertIn('no vector store', product['backends']['pgvector']['error'])
@@ -6,9 +6,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
-import numpy as np
+from chatbot.services.embedding_cache import CachedEmbeddings
 import logging
 logger = logging.getLogger(__name__)
 
@@ -22,7 +21,8 @@ class AIConfiguration:
         response_tone: str = 'professional',
         brand_persona: str = 'helpful assistant',
         learn_from_history: bool = True,
-        faq_threshold: float = 0.5
+        faq_threshold: float = 0.5,
+        user_id: int = None
     ):
         self.ai_model = ai_model
         self.api_key = api_key
@@ -30,15 +30,22 @@ class AIConfiguration:
         self.brand_persona = brand_persona
         self.learn_from_history = learn_from_history
         self.faq_threshold = faq_threshold
+        self.user_id = user_id  # Business owner whose FAQs are searched
 
 
 
 class FAQVectorSearch:
-    """Vector search implementation for FAQs"""
-    def __init__(self, embeddings: Embeddings = None):
+    """Vector search over one business owner's FAQs, in a persistent FAISS index"""
+    def __init__(self, embeddings: Embeddings = None, user_id: int = None):
         self.embeddings = embeddings or self._get_default_embeddings()
-        self.vector_store = None
-        self._initialize_vector_store()
+        if self.embeddings:
+            self.embeddings = CachedEmbeddings(self.embeddings)
+        self.user_id = user_id
+        self.index = None
+        if self.embeddings and user_id is not None:
+            from chatbot.services.faiss_index import TenantFAISSIndex
+            # Loaded (and brought up to date) lazily on the first search.
+            self.index = TenantFAISSIndex(self.embeddings, user_id)
 
     def _get_default_embeddings(self):
         """Get default embedding model"""
@@ -52,35 +59,20 @@ class FAQVectorSearch:
             logger.warning("GoogleGenerativeAIEmbeddings not available")
             return None
 
-    def _initialize_vector_store(self):
-        """Initialize vector store with FAQs"""
-        from knowledge_base.models import FAQ
-        faqs = FAQ.objects.all()
-        if not faqs:
-            return
-
-        texts = [f"Q: {faq.question}\nA: {faq.answer}" for faq in faqs]
-        metadatas = [{"id": faq.id} for faq in faqs]
-
-        if self.embeddings:
-            self.vector_store = FAISS.from_texts(
-                texts=texts,
-                embedding=self.embeddings,
-                metadatas=metadatas
-            )
-
     def search(self, query: str, k: int = 3) -> List[Dict]:
-        """Search FAQs using vector similarity"""
-        if not self.vector_store:
+        """Search FAQs using vector similarity; scores are cosine similarities"""
+        if self.index is None:
             return []
 
         try:
-            docs = self.vector_store.similarity_search_with_score(query, k=k)
+            from knowledge_base.models import FAQ
+            hits = self.index.search(query, k=k)
+            faqs = FAQ.objects.in_bulk([faq_id for faq_id, _ in hits])
             return [{
-                'id': doc.metadata['id'],
-                'score': float(1 - score),
-                'content': doc.page_content
-            } for doc, score in docs]
+                'id': faq_id,
+                'score': score,
+                'content': faqs[faq_id].document_text
+            } for faq_id, score in hits if faq_id in faqs]
         except Exception as e:
             logger.error(f"Vector search failed: {str(e)}")
             return []
@@ -92,7 +84,7 @@ class LLMResponseGenerator:
     def __init__(self, ai_config: AIConfiguration):
         self.ai_config = ai_config
         self.llm = self._initialize_llm()
-        self.faq_search = FAQVectorSearch()
+        self.faq_search = FAQVectorSearch(user_id=ai_config.user_id)
         self.prompt_template = self._create_prompt_template()
         self.chain = self.prompt_template | self.llm | StrOutputParser()
 
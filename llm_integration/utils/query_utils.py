@@ -1,17 +1,11 @@
 # utils/query_utils.py
 from typing import List, Dict, Optional, Set, Union
-from django.db.models import Q, QuerySet, Count, F
-from django.contrib.postgres.search import (
-    SearchVector,
-    SearchQuery,
-    SearchRank
-)
+from django.db.models import Q, QuerySet, Count
 from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
 from account.models import User
 import logging
-import requests  # For API-based embeddings
 
 logger = logging.getLogger(__name__)
 
@@ -101,26 +95,26 @@ class DatabaseQueryTool:
     def query_products(user: User, query_text: str, limit: int = MAX_RESULTS) -> List[Dict]:
         """
         Optimized product search with:
-        - Full-text search if available
-        - Field weighting
-        - Popularity boosting
+        - The tenant's in-memory catalog snapshot when enabled
+        - Ranked full-text search on PostgreSQL
         """
+        from business.catalog import CatalogSnapshot, snapshots_enabled
         from business.models import Product
-        
+
+        snapshot = CatalogSnapshot.for_tenant(user.id) if snapshots_enabled() else None
+        if snapshot is not None:
+            return [
+                {key: row[key] for key in ('id', 'name', 'description', 'price', 'stock')}
+                for row in snapshot.rows(snapshot.search(name=query_text, limit=limit))
+            ]
+
         # Use database-specific optimizations
         if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
-            # PostgreSQL full-text search
+            # PostgreSQL full-text search on the stored search vector
             return list(
                 Product.objects
                 .filter(user=user)
-                .annotate(
-                    search=SearchVector('name', weight='A') + 
-                    SearchVector('description', weight='B') +
-                    SearchVector('category__name', weight='C')
-                )
-                .filter(search=SearchQuery(query_text))
-                .annotate(rank=SearchRank(F('search'), SearchQuery(query_text)))
-                .order_by('-rank', '-popularity_score')[:limit]
+                .search(query_text)[:limit]
                 .values('id', 'name', 'description', 'price', 'stock')
             )
         else:
@@ -138,7 +132,7 @@ class DatabaseQueryTool:
                 Product.objects
                 .filter(user=user)
                 .filter(conditions)
-                .order_by('-popularity_score', '-stock')[:limit]
+                .order_by('-stock')[:limit]
                 .values('id', 'name', 'description', 'price', 'stock')
             )
 
@@ -161,57 +155,13 @@ class DatabaseQueryTool:
 
     @staticmethod
     def _get_embedding(text: str) -> Optional[List[float]]:
-        """Generate embedding using available services"""
+        """
+        Embed ``text`` with the model behind ``FAQ.embedding`` (EMBEDDING_MODEL).
+        Repeated questions are served from the shared embedding cache.
+        """
         try:
-            # Option 1: Use OpenAI embeddings
-            if hasattr(settings, 'OPENAI_API_KEY'):
-                return DatabaseQueryTool._get_openai_embedding(text)
-            
-            # Option 2: Use HuggingFace embeddings
-            elif hasattr(settings, 'HF_API_KEY'):
-                return DatabaseQueryTool._get_hf_embedding(text)
-            
-            # Option 3: Use Sentence Transformers (local)
-            try:
-                from sentence_transformers import SentenceTransformer
-                model = SentenceTransformer('all-MiniLM-L6-v2')
-                return model.encode(text).tolist()
-            except ImportError:
-                pass
-                
-            logger.warning("No embedding service configured")
-            return None
-            
+            from chatbot.services.embedding_service import HuggingFaceEmbeddingService
+            return HuggingFaceEmbeddingService().embed_text(text)
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             return None
-
-    @staticmethod
-    def _get_openai_embedding(text: str) -> Optional[List[float]]:
-        """Get embedding from OpenAI API"""
-        try:
-            import openai
-            response = openai.Embedding.create(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-            return response['data'][0]['embedding']
-        except Exception as e:
-            logger.error(f"OpenAI embedding failed: {str(e)}")
-            return None
-
-    @staticmethod
-    def _get_hf_embedding(text: str) -> Optional[List[float]]:
-        """Get embedding from HuggingFace API"""
-        try:
-            API_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/sentence-transformers/all-MiniLM-L6-v2"
-            headers = {"Authorization": f"Bearer {settings.HF_API_KEY}"}
-            response = requests.post(
-                API_URL,
-                headers=headers,
-                json={"inputs": text}
-            )
-            return response.json()
-        except Exception as e:
-            logger.error(f"HuggingFace embedding failed: {str(e)}")
-            return None
\ No newline at end of file
@@ -1,15 +1,18 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+import asyncio
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 import json
 from datetime import datetime, timedelta
 from enum import Enum
 
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
 
 from messaging.models.conversation import Conversation
 from messaging.services import conversation_service, whatsapp_service
+from messaging.services.connection_registry import ConnectionRegistry
 from messaging.utils import facebook_api
 from messaging.validators import validate_message_content
 from business.models.integrations import FacebookIntegration
@@ -21,6 +24,14 @@ logger = logging.getLogger(__name__)
 CLOSE_CODE_UNAUTHENTICATED = 4001
 CLOSE_CODE_HEARTBEAT_TIMEOUT = 4002
 CLOSE_CODE_CONNECTION_SETUP_FAILED = 4003
+CLOSE_CODE_TOO_MANY_CONNECTIONS = 4004
+
+# Outbound batching, opted into by the client's handshake: at most this many
+# events per frame, flushed at most this many milliseconds after the first.
+BATCH_DEFAULT_MAX_EVENTS = 50
+BATCH_DEFAULT_MAX_DELAY_MS = 20
+BATCH_LIMIT_MAX_EVENTS = 500
+BATCH_LIMIT_MAX_DELAY_MS = 1000
 
 
 class MessageTypes(Enum):
@@ -30,18 +41,27 @@ class MessageTypes(Enum):
     NOTIFICATION = "notification"
     ACKNOWLEDGMENT = "acknowledgment"
     ERROR = "error"
+    MEDIA_READY = "media_ready"
+    BATCH = "batch"
 
 
 class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.last_heartbeat = None
-        self.heartbeat_timeout = 40  # seconds
-        self.heartbeat_interval = 30  # seconds
+        self.heartbeat_timeout = settings.WEBSOCKET_HEARTBEAT_TIMEOUT  # seconds
+        self.heartbeat_interval = settings.WEBSOCKET_HEARTBEAT_INTERVAL  # seconds
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.registered = False
         self.user = None
         self.group_name = None
         self.connected_at = None
         self.message_counter = 0
+        # Set when the client's handshake asks for batched frames
+        self.batch_max_events = None
+        self.batch_max_delay = None  # seconds
+        self.pending_events: List[Dict[str, Any]] = []
+        self.flush_task: Optional[asyncio.Task] = None
 
     async def connect(self):
         """Handle new WebSocket connection."""
@@ -65,9 +85,16 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
         self.group_name = f'user_{self.user.id}_chat'
 
         try:
+            if not await ConnectionRegistry.register(self.user.id, self.channel_name):
+                await self.accept()
+                await self.close(code=CLOSE_CODE_TOO_MANY_CONNECTIONS)
+                return
+            self.registered = True
+
             await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
             self.last_heartbeat = datetime.now()
+            self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
         # Send initial handshake with user info
             await self.send_json({
@@ -75,7 +102,8 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
                 "status": "authenticated",
                 "user_id": str(self.user.id),
                 "timestamp": datetime.now().isoformat(),
-                "heartbeat_interval": self.heartbeat_interval
+                "heartbeat_interval": self.heartbeat_interval,
+                "capabilities": [MessageTypes.BATCH.value],
             })
 
         except Exception as e:
@@ -90,13 +118,15 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
                 return
 
             logger.debug(f"Received message: {content}")
+            # Any frame shows the client is alive.
+            self.last_heartbeat = datetime.now()
 
             message_type = content.get("type")
 
             if message_type == MessageTypes.HEARTBEAT.value:
-                self.last_heartbeat = datetime.now()
                 logger.debug("Heartbeat received")
-                await self.send_heartbeat_response()
+                if content.get("status") != "pong":
+                    await self.send_heartbeat_response()
                 return
 
             if message_type == MessageTypes.HANDSHAKE.value:
@@ -131,6 +161,13 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
         logger.info(f"Disconnecting with code {close_code}")
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        if self.heartbeat_task is not None and self.heartbeat_task is not asyncio.current_task():
+            self.heartbeat_task.cancel()
+        if self.registered:
+            self.registered = False
+            await ConnectionRegistry.unregister(self.user.id, self.channel_name)
         if hasattr(self, "group_name") and self.group_name:
             try:
                 await self.channel_layer.group_discard(
@@ -142,6 +179,41 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
         await super().disconnect(close_code)
 
 
+    async def heartbeat(self):
+        """
+        Ping the client every ``heartbeat_interval`` and close the connection
+        once it has sent nothing for ``heartbeat_timeout``, so dead sockets
+        leave the group even if they never send again. Clients answer pings
+        with ``{"type": "heartbeat", "status": "pong"}`` (any frame counts).
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat_interval)
+                if (datetime.now() - self.last_heartbeat).total_seconds() > self.heartbeat_timeout:
+                    await self.reap()
+                    return
+                await self.send_json({
+                    "type": MessageTypes.HEARTBEAT.value,
+                    "status": "ping",
+                    "timestamp": datetime.now().isoformat(),
+                })
+                await ConnectionRegistry.refresh(self.user.id, self.channel_name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Heartbeat failed: {str(e)}")
+            await self.reap()
+
+    async def reap(self):
+        """Drop a connection whose client stopped answering."""
+        logger.warning(f"Heartbeat timeout for user {self.user.id} - closing connection")
+        # Stop group sends at once; disconnect() may only run once the socket times out.
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.registered:
+            self.registered = False
+            await ConnectionRegistry.unregister(self.user.id, self.channel_name, reason='heartbeat_timeout')
+        await self.close(code=CLOSE_CODE_HEARTBEAT_TIMEOUT)
+
     async def send_heartbeat_response(self):
         """Send heartbeat acknowledgment."""
         await self.send_json({
@@ -207,18 +279,17 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
 
     async def chat_message(self, event):
         """Handle incoming chat messages from the group."""
-        logger.debug("====================== CHAT MESSAGE =========")
-        logger.debug(f"Sender channel: {event.get('sender_channel')}")
-        logger.debug(f"Self channel: {self.channel_name}")
-
         if event.get("sender_channel") == self.channel_name:
             logger.debug("Skipping message as it originated from this channel.")
             return  # Skip if this is the sender's channel
 
         try:
-            message = json.loads(event["message"])
+            message = event["message"]
+            if isinstance(message, str):
+                # Published as a JSON string before events carried dicts.
+                message = json.loads(message)
             self.message_counter += 1
-            await self.send_json({
+            await self.send_event({
                 "type": MessageTypes.NEW_MESSAGE.value,
                 "payload": {
                     **message,
@@ -234,6 +305,47 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
             logger.error(f"Error sending message: {str(e)}")
 
 
+    async def media_ready(self, event):
+        """Forward a finished media download (see websocket_service.media_ready_notification)."""
+        await self.send_event({
+            "type": MessageTypes.MEDIA_READY.value,
+            "payload": event["payload"],
+        })
+
+    async def send_event(self, content: Dict[str, Any]):
+        """
+        Send a group event to the client: at once, or, when the client opted
+        into batching, collected into one "batch" frame sent after
+        ``batch_max_delay`` or once ``batch_max_events`` are waiting.
+        """
+        if self.batch_max_events is None:
+            await self.send_json(content)
+            return
+        self.pending_events.append(content)
+        if len(self.pending_events) >= self.batch_max_events:
+            await self.flush_events()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_events_later())
+
+    async def flush_events_later(self):
+        await asyncio.sleep(self.batch_max_delay)
+        self.flush_task = None
+        await self.flush_events()
+
+    async def flush_events(self):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None
+        events, self.pending_events = self.pending_events, []
+        if events:
+            await super().send_json({"type": MessageTypes.BATCH.value, "events": events})
+
+    async def send_json(self, content, close=False):
+        # Replies (heartbeats, acknowledgments, errors) go after the events already waiting.
+        if self.pending_events:
+            await self.flush_events()
+        await super().send_json(content, close=close)
+
     async def broadcast_message(self, payload: Dict[str, Any], conversation_id: str):
         """Broadcast message to all group members."""
         try:
@@ -256,10 +368,10 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
                 self.group_name,
                 {
                     'type': 'chat.message',
-                    'message': json.dumps({
+                    'message': {
                         "conversation_id": str(conversation_id),
-                        "message":message_data
-                    }),
+                        "message": message_data
+                    },
                     'sender_channel': self.channel_name
                 }
             )
@@ -288,20 +400,42 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     async def check_connection_health(self):
         """Close connection if no heartbeat received within timeout period"""
         if (datetime.now() - self.last_heartbeat).total_seconds() > self.heartbeat_timeout:
-            logger.warning("Heartbeat timeout - closing connection")
-            # Custom code for heartbeat timeout
-            await self.close(code=CLOSE_CODE_HEARTBEAT_TIMEOUT)
+            await self.reap()
 
     async def handle_handshake(self, data: Dict[str, Any]):
-        """Process initial client handshake."""
+        """
+        Process initial client handshake. A client that sends
+        ``"batch": true`` or ``"batch": {"max_events": n, "max_delay_ms": ms}``
+        gets group events in "batch" frames; the confirmation carries the
+        limits in effect.
+        """
         logger.info(f"Handshake received: {data}")
-        await self.send_json({
+        response = {
             "type": MessageTypes.HANDSHAKE.value,
             "status": "confirmed",
             "user_id": str(self.user.id),
             "timestamp": datetime.now().isoformat(),
             "connection_id": self.channel_name
-        })
+        }
+        batch = data.get("batch")
+        if batch:
+            options = batch if isinstance(batch, dict) else {}
+            self.batch_max_events = self._bounded(
+                options.get("max_events"), BATCH_DEFAULT_MAX_EVENTS, BATCH_LIMIT_MAX_EVENTS
+            )
+            max_delay_ms = self._bounded(
+                options.get("max_delay_ms"), BATCH_DEFAULT_MAX_DELAY_MS, BATCH_LIMIT_MAX_DELAY_MS
+            )
+            self.batch_max_delay = max_delay_ms / 1000
+            response["batch"] = {"max_events": self.batch_max_events, "max_delay_ms": max_delay_ms}
+        await self.send_json(response)
+
+    @staticmethod
+    def _bounded(value: Any, default: int, limit: int) -> int:
+        try:
+            return min(max(int(value), 1), limit)
+        except (TypeError, ValueError):
+            return default
 
     @database_sync_to_async
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
@@ -346,7 +480,7 @@ class ChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     def send_facebook_message(self, social_media_id: str, message: str):
         """Send message via Facebook API."""
         try:
-            facebook_integration = FacebookIntegration.objects.get(user=self.user)
+            facebook_integration = FacebookIntegration.objects.get(user_id=self.user.id)
             access_token = facebook_integration.access_token
             facebook_api.send_message(social_media_id, message, access_token)
         except FacebookIntegration.DoesNotExist:
@@ -2,6 +2,7 @@ from typing import Dict
 
 from messaging.handlers.base_handler import BaseMessageTypeHandlerWhatsApp
 from messaging.models import SENDER_CHOICES
+from messaging.services.whatsapp_media_cache import WhatsAppMediaCache
 
 class MediaMessageHandler(BaseMessageTypeHandlerWhatsApp):
     def extract_fields(self, message: Dict)-> None:
@@ -10,6 +11,10 @@ class MediaMessageHandler(BaseMessageTypeHandlerWhatsApp):
         self.reply_message_for_socialuser = f"Thanks for the {self.media_type}! We'll process it soon."
         self.replier = SENDER_CHOICES.BUSINESS
 
+    def handle_message_from_customer(self):
+        super().handle_message_from_customer()
+        # Fetch it while the Graph media URL is fresh; the dashboard then serves the local copy.
+        WhatsAppMediaCache.prefetch(self.media_id)
 
     def should_auto_reply(self) -> bool:
         return False    
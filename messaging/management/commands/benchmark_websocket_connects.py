@@ -0,0 +1,104 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.token_user import UserCache
+from facebook_business_automation.middlewares import JWTAuthMiddlewareStack
+from messaging.routing import websocket_urlpatterns
+
+User = get_user_model()
+"""
+python manage.py benchmark_websocket_connects
+python manage.py benchmark_websocket_connects --connects 5000 --users 500 --concurrency 1000
+"""
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Open thousands of concurrent authenticated chat websockets in-process and report connect "
+        "latency and user queries, first with a cold and then with a warm user cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connects', type=int, default=2000, help="Connections opened per round")
+        parser.add_argument('--users', type=int, default=200, help="Temporary users the connections are spread over")
+        parser.add_argument('--concurrency', type=int, default=None, help="Connects in flight at once (default: all)")
+        parser.add_argument('--timeout', type=float, default=30, help="Seconds a single connect may take")
+
+    def handle(self, *args, **options):
+        per_user = -(-options['connects'] // options['users'])
+        if per_user > settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER:
+            raise CommandError(
+                f"{per_user} connections per user exceed WEBSOCKET_MAX_CONNECTIONS_PER_USER "
+                f"({settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER}); use more --users"
+            )
+
+        run = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(email=f"ws-bench-{run}-{i}@example.com") for i in range(options['users'])
+        ])
+        try:
+            tokens = [str(AccessToken.for_user(user)) for user in users]
+            tokens = [tokens[i % len(tokens)] for i in range(options['connects'])]
+            self.stdout.write(f"{len(tokens)} connects over {len(users)} users")
+            for name in ('cold', 'warm'):
+                if name == 'cold':
+                    for user in users:
+                        UserCache.invalidate(user.pk)
+                loads = UserCache.loads
+                report = async_to_sync(self._round)(tokens, options['concurrency'] or len(tokens), options['timeout'])
+                self._write(name, report, UserCache.loads - loads)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    async def _round(self, tokens, concurrency, timeout):
+        application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        gate = asyncio.Semaphore(concurrency)
+        latencies, failures, communicators = [], [], []
+
+        async def connect(token):
+            async with gate:
+                communicator = WebsocketCommunicator(application, f"/ws/chat/?token={token}")
+                started = time.perf_counter()
+                try:
+                    connected, code = await communicator.connect(timeout=timeout)
+                except asyncio.TimeoutError:
+                    connected, code = False, 'timeout'
+                latencies.append((time.perf_counter() - started) * 1000)
+                if connected:
+                    communicators.append(communicator)
+                else:
+                    failures.append(code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(token) for token in tokens))
+        elapsed = time.perf_counter() - started
+        # All stay open until every connect finished, as during a reconnect storm.
+        await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+        return {'latencies': latencies, 'failures': failures, 'elapsed': elapsed}
+
+    def _write(self, name, report, queries):
+        latencies = report['latencies']
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:<5} p50={statistics.median(latencies):.1f}ms p99={percentile(latencies, 0.99):.1f}ms "
+            f"max={max(latencies):.1f}ms rate={len(latencies) / report['elapsed']:.0f} connects/s "
+            f"user queries={queries}"
+        ))
+        if report['failures']:
+            self.stdout.write(self.style.WARNING(
+                f"      {len(report['failures'])} connects failed (close codes: {sorted(set(map(str, report['failures'])))})"
+            ))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from messaging.services.media_blob_service import MediaBlobStore
+"""
+python manage.py gc_media_blobs --dry-run
+python manage.py gc_media_blobs
+python manage.py gc_media_blobs --grace-minutes 0
+"""
+
+
+class Command(BaseCommand):
+    help = "Delete stored media blobs that no message references any more, and stray blob files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=int(MediaBlobStore.GRACE_PERIOD.total_seconds() // 60),
+            help="Keep unreferenced blobs and files younger than this; downloads in progress may link them"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+
+    def handle(self, *args, **options):
+        result = MediaBlobStore.collect_garbage(
+            grace=timedelta(minutes=options['grace_minutes']), dry_run=options['dry_run']
+        )
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        if result['corrected']:
+            self.stdout.write(f"Corrected the reference count of {result['corrected']} blobs")
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['removed']} blobs ({result['freed_bytes'] / 2**20:.1f} MiB) "
+            f"and {result['stray_files']} stray files"
+        ))
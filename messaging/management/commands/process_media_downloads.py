@@ -0,0 +1,29 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+from messaging.models import MediaDownloadJob
+from messaging.services.media_download_service import MediaDownloader
+"""
+python manage.py process_media_downloads
+python manage.py process_media_downloads --once
+python manage.py process_media_downloads --retry-failed --once
+"""
+
+
+class Command(BaseCommand):
+    help = "Download pending Messenger media, including jobs left behind by a stopped process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when no unfinished job is left")
+        parser.add_argument('--retry-failed', action='store_true', help="Queue failed jobs again first")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = MediaDownloader.requeue_failed()
+            self.stdout.write(f"Queued {requeued} failed downloads again")
+
+        pending = MediaDownloadJob.objects.exclude(status=MediaDownloadJob.Status.FAILED).count()
+        self.stdout.write(f"{pending} downloads pending")
+        finished = asyncio.run(MediaDownloader.run(forever=not options['once']))
+        failed = MediaDownloadJob.objects.filter(status=MediaDownloadJob.Status.FAILED).count()
+        self.stdout.write(self.style.SUCCESS(f"Finished {finished} downloads, {failed} failed in total"))
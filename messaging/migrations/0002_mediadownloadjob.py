@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-19 13:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaDownloadJob',
+            fields=[
+                ('chat_message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='download_job', serialize=False, to='messaging.chatmessage')),
+                ('url', models.URLField(max_length=1000)),
+                ('host', models.CharField(help_text='Host of the URL, for per-host concurrency limits', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Lease of the worker running the job', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='media_download_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-19 13:36
+
+import django.db.models.deletion
+import messaging.models.media_blob
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_mediadownloadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file', models.FileField(max_length=255, upload_to=messaging.models.media_blob.blob_upload_to)),
+                ('size', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'created_at'], name='media_blob_orphan_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='media_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='messaging.mediablob'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.2 on 2026-10-19 13:41
+
+import messaging.models.media_blob
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, upload_to=messaging.models.media_blob.blob_upload_to),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_realtimeevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='realtimeevent',
+            index=models.Index(fields=['group', 'id'], name='realtime_event_group_idx'),
+        ),
+    ]
@@ -2,5 +2,8 @@ from .user import SocialMediaUser, PLATFORM
 from .conversation import Conversation
 from .chatmessage import ChatMessage, SENDER_CHOICES
 from .notifications import Notification
+from .media_download import MediaDownloadJob
+from .media_blob import MediaBlob
+from .realtime_event import RealtimeEvent
 
-__all__ = ['SocialMediaUser', 'Conversation', 'ChatMessage', 'SENDER_CHOICES', 'PLATFORM', 'Notification',]
+__all__ = ['SocialMediaUser', 'Conversation', 'ChatMessage', 'SENDER_CHOICES', 'PLATFORM', 'Notification', 'MediaDownloadJob', 'MediaBlob', 'RealtimeEvent',]
@@ -1,6 +1,7 @@
 from django.db import models
 
 from messaging.models.conversation import Conversation
+from messaging.models.media_blob import MediaBlob
 from django.utils.translation import gettext_lazy as _
 from messaging.enums import SENDER_CHOICES
 
@@ -25,6 +26,10 @@ class ChatMessage(models.Model):
     # for Messenger:
     messenger_media_url = models.URLField(blank=True, null=True, max_length=1000)  # Temporary CDN URL
     messenger_media_file = models.FileField(upload_to='messenger_images/', blank=True, null=True)
+    # Content-addressed copy shared with identical media; messenger_media_file then names its file.
+    media_blob = models.ForeignKey(
+        MediaBlob, on_delete=models.PROTECT, blank=True, null=True, related_name='messages'
+    )
 
     # Download tracking
     download_status = models.CharField(
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+def blob_upload_to(instance, filename):
+    # Fanned out by the first hash bytes so no directory grows too large.
+    return f"blobs/{instance.sha256[:2]}/{instance.sha256[2:4]}/{filename}"
+
+
+class MediaBlob(models.Model):
+    """
+    One stored media file, addressed by the sha256 of its content and shared
+    by every ChatMessage carrying the same bytes (see
+    messaging.services.media_blob_service). ``ref_count`` is the number of
+    linked messages; blobs left at zero are removed by ``gc_media_blobs``.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to=blob_upload_to, max_length=255)
+    # WebP thumbnail or video poster next to the file (see messaging.services.thumbnail_service)
+    thumbnail = models.FileField(upload_to=blob_upload_to, max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'created_at'], name='media_blob_orphan_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes, {self.ref_count} refs)"
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+from messaging.models.chatmessage import ChatMessage
+
+
+class MediaDownloadJob(models.Model):
+    """
+    A media attachment still to be fetched into its ChatMessage, written in the
+    same transaction as the message (see messaging.services.media_download_service).
+    The row is removed once the file is stored; failed jobs stay for inspection.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        FAILED = 'failed', 'Failed'
+
+    chat_message = models.OneToOneField(
+        ChatMessage, on_delete=models.CASCADE, primary_key=True, related_name='download_job'
+    )
+    url = models.URLField(max_length=1000)
+    host = models.CharField(max_length=255, help_text="Host of the URL, for per-host concurrency limits")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Lease of the worker running the job")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='media_download_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} download of message {self.chat_message_id}"
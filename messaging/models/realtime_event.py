@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class RealtimeEvent(models.Model):
+    """
+    A channel layer message waiting to be published: the outbox written in
+    the same transaction as the change it announces (see
+    messaging.services.realtime_outbox). Rows are deleted once sent, so
+    events of rolled-back writes never leave the database.
+    """
+    group = models.CharField(max_length=100)
+    event = models.JSONField(help_text="Message passed to group_send; its 'type' names the consumer handler")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Earlier events of a group, see RealtimeOutbox._without_held_groups.
+            models.Index(fields=['group', 'id'], name='realtime_event_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event.get('type')} to {self.group}"
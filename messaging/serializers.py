@@ -47,9 +47,10 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     text = serializers.CharField(source='message')
     time = serializers.DateTimeField(source='updated_at')
     media_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     class Meta:
         model = ChatMessage
-        fields = ['id', 'text', 'time', 'sender', 'media_id', 'media_type', 'contacts', 'media_url']
+        fields = ['id', 'text', 'time', 'sender', 'media_id', 'media_type', 'contacts', 'media_url', 'thumbnail_url']
     def get_media_url(self, obj):
         """
         Returns media URL with priority order:
@@ -63,6 +64,15 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             return obj.messenger_media_url
         return None
 
+    def get_thumbnail_url(self, obj):
+        """
+        WebP thumbnail (or video poster) of the stored media, for lists that
+        should not load the full file; None until it has been rendered.
+        """
+        if obj.media_blob_id and obj.media_blob.thumbnail:
+            return self.context['request'].build_absolute_uri(obj.media_blob.thumbnail.url)
+        return None
+
 
 class AutoReplySerializer(serializers.ModelSerializer):
     class Meta:
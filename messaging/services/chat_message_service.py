@@ -1,21 +1,16 @@
 # messaging/services/chat_message_service.py
 
-from concurrent.futures import ThreadPoolExecutor
 import os
 import time
 import re
-import requests
-import tempfile
-from io import BytesIO
 from urllib.parse import urlparse
 from django.core.files import File
-from django.db import transaction, DatabaseError
+from django.db import transaction
 from typing import TypedDict, List, Optional
 from messaging.models import ChatMessage, Conversation
 from messaging.services import websocket_service
-from threading import Lock
+from messaging.services.media_download_service import MediaDownloader
 import logging
-from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -27,24 +22,13 @@ class ChatMessageService:
     """
     Service for creating and managing ChatMessage objects with robust media handling.
     Features:
-    - Retry logic for failed downloads
-    - Sophisticated media type detection
-    - Large file handling with streaming
-    - Thread-safe async downloads
-    - Comprehensive error handling
+    - Durable background downloads of Messenger media (see MediaDownloader)
+    - Media type detection from the file content, or else the URL
+    - Comprehensive input validation
     """
 
     # Configuration constants
-    MAX_RETRIES = 3
-    RETRY_DELAY = 1  # seconds
-    SMALL_FILE_THRESHOLD = 5 * 1024 * 1024  # 5MB
-    LARGE_FILE_THRESHOLD = 20 * 1024 * 1024  # 20MB
     MAX_ALLOWED_SIZE = 25 * 1024 * 1024  # 25MB
-    DOWNLOAD_TIMEOUT = 30  # seconds
-    STALE_DOWNLOAD_THRESHOLD = timedelta(hours=1)  # Consider downloads stale after 1 hour
-
-    _executor = None
-    _executor_lock = Lock()
 
     @classmethod
     @transaction.atomic
@@ -72,16 +56,7 @@ class ChatMessageService:
         )
 
         if messenger_media_url and not messenger_media_file:
-            cls._start_async_download(
-                messenger_media_url,
-                conversation.id,
-                sender,
-                message,
-                media_id,
-                media_type,
-                contacts
-            )
-            return cls._create_message_without_file(
+            chat_message = cls._create_message_without_file(
                 conversation,
                 sender,
                 message,
@@ -90,6 +65,8 @@ class ChatMessageService:
                 contacts,
                 messenger_media_url
             )
+            MediaDownloader.enqueue(chat_message, messenger_media_url)
+            return chat_message
 
         return cls._create_message_with_file(
             conversation,
@@ -162,7 +139,7 @@ class ChatMessageService:
         )
         
         cls._send_websocket_notification(
-            conversation.id,
+            conversation,
             sender,
             message,
             media_id,
@@ -183,7 +160,7 @@ class ChatMessageService:
         contacts: Optional[List[Contact]],
         media_url: Optional[str],
     ):
-        """Send consistent websocket notifications."""
+        """Send consistent websocket notifications once the message is committed."""
         websocket_service.message_from_outside_consumer(
             conversation=conversation,
             sender=sender,
@@ -194,204 +171,6 @@ class ChatMessageService:
             media_url=media_url,
         )
 
-    @classmethod
-    def _start_async_download(
-        cls,
-        url: str,
-        conversation_id: int,
-        sender: str,
-        message: Optional[str],
-        media_id: Optional[str],
-        media_type: Optional[str],
-        contacts: Optional[List[Contact]]
-    ):
-        """Start thread-safe async download."""
-        with cls._executor_lock:
-            if cls._executor is None:
-                cls._executor = ThreadPoolExecutor(max_workers=4)
-        
-        cls._executor.submit(
-            cls._download_and_update_message,
-            url,
-            conversation_id,
-            sender,
-            message,
-            media_id,
-            media_type,
-            contacts
-        )
-
-    @classmethod
-    def _download_and_update_message(
-        cls,
-        url: str,
-        conversation_id: int,
-        sender: str,
-        message: Optional[str],
-        media_id: Optional[str],
-        media_type: Optional[str],
-        contacts: Optional[List[Contact]]
-    ):
-        """Download file and update message with comprehensive error handling."""
-        try:
-            # 1. Get message with stale download check
-            chat_message = cls._get_chat_message_for_download(
-                conversation_id,
-                sender,
-                message,
-                url
-            )
-            if not chat_message:
-                return
-
-            # 2. Download file
-            file_obj = cls._download_with_retry(url)
-            
-            # 3. Determine media type
-            detected_type = cls._determine_media_type(file_obj, url)
-            final_media_type = media_type or detected_type
-            
-            # 4. Save to message
-            with transaction.atomic():
-                chat_message.refresh_from_db()
-                if chat_message.messenger_media_file:
-                    logger.info(f"Message {chat_message.id} already has file")
-                    return
-                
-                filename = cls._get_filename(url, final_media_type)
-                chat_message.messenger_media_file.save(filename, file_obj)
-                chat_message.media_type = final_media_type
-                chat_message.download_status = 'completed'
-                chat_message.save()
-
-            # 5. Notify clients
-            websocket_service.media_ready_notification(
-                group_name=f'conversation_{conversation_id}',
-                message_id=chat_message.id
-            )
-
-        except Exception as e:
-            logger.error(f"Failed to process {url}: {str(e)}", exc_info=True)
-            cls._mark_download_failed(conversation_id, sender, message, url)
-
-    @classmethod
-    def _get_chat_message_for_download(
-        cls,
-        conversation_id: int,
-        sender: str,
-        message: Optional[str],
-        url: str
-    ) -> Optional[ChatMessage]:
-        """Retrieve message for download with error handling."""
-        try:
-            chat_message = ChatMessage.objects.get(
-                conversation_id=conversation_id,
-                sender=sender,
-                message=message,
-                messenger_media_url=url,
-                messenger_media_file=None
-            )
-            
-            # Check for stale downloads
-            if (datetime.now(chat_message.created_at.tzinfo) - chat_message.created_at > 
-                cls.STALE_DOWNLOAD_THRESHOLD):
-                logger.warning(f"Skipping stale download for message {chat_message.id}")
-                chat_message.download_status = 'failed'
-                chat_message.save()
-                return None
-                
-            return chat_message
-            
-        except ChatMessage.DoesNotExist:
-            logger.error(f"No ChatMessage found for {url}")
-            return None
-        except ChatMessage.MultipleObjectsReturned:
-            logger.error(f"Multiple messages found for {url}, using latest")
-            return ChatMessage.objects.filter(
-                conversation_id=conversation_id,
-                messenger_media_url=url,
-                messenger_media_file=None
-            ).latest('created_at')
-
-    @classmethod
-    def _mark_download_failed(
-        cls,
-        conversation_id: int,
-        sender: str,
-        message: Optional[str],
-        url: str
-    ):
-        """Update message status when download fails."""
-        try:
-            with transaction.atomic():
-                chat_message = ChatMessage.objects.get(
-                    conversation_id=conversation_id,
-                    sender=sender,
-                    message=message,
-                    messenger_media_url=url,
-                    messenger_media_file=None
-                )
-                chat_message.download_status = 'failed'
-                chat_message.save()
-        except Exception as e:
-            logger.error(f"Failed to mark download failed: {str(e)}")
-
-    @classmethod
-    def _download_with_retry(cls, url: str) -> File:
-        """Download file with retry logic."""
-        for attempt in range(1, cls.MAX_RETRIES + 1):
-            try:
-                return cls._download_file(url)
-            except Exception as e:
-                if attempt == cls.MAX_RETRIES:
-                    raise
-                logger.warning(f"Attempt {attempt} failed for {url}: {str(e)}")
-                time.sleep(cls.RETRY_DELAY * attempt)
-
-
-    @classmethod
-    def _download_file(cls, url: str) -> File:
-        """Download file with proper handling for large files"""
-        # Get content length to determine file size
-        head_response = requests.head(url, allow_redirects=True, timeout=5)
-        content_length = int(head_response.headers.get('Content-Length', 0))
-
-        if content_length > cls.MAX_ALLOWED_SIZE:  
-            raise ValueError("File too large")
-        
-        # Determine download strategy based on size
-        if content_length < cls.SMALL_FILE_THRESHOLD:
-            return cls._download_small_file(url)
-        else:
-            return cls._download_large_file(url, content_length)
-
-
-    @classmethod
-    def _download_small_file(cls, url: str) -> File:
-        """Download small files to memory."""
-        response = requests.get(url, timeout=(3.05, 10))
-        response.raise_for_status()
-        return File(BytesIO(response.content))
-
-    @classmethod
-    def _download_large_file(cls, url: str, content_length: int) -> File:
-        """Stream large files to disk safely."""
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        try:
-            with requests.get(url, stream=True, timeout=cls.DOWNLOAD_TIMEOUT) as response:
-                response.raise_for_status()
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        temp_file.write(chunk)
-            temp_file.flush()
-            return File(open(temp_file.name, 'rb'))
-        except Exception:
-            os.unlink(temp_file.name)
-            raise
-        finally:
-            temp_file.close()
-
-
     @staticmethod
     def _validate_content_type(content_type: str, media_type: str) -> bool:
         """
@@ -433,6 +212,14 @@ class ChatMessageService:
         else:
             return 'document'
 
+    @staticmethod
+    def _media_type_from_content_type(content_type: str) -> str:
+        """
+        Determine media type from a MIME type, e.g. one sniffed from the file content.
+        """
+        kind = (content_type or '').split('/')[0]
+        return kind if kind in ('image', 'video', 'audio') else 'document'
+
     @classmethod
     def _get_filename(cls, url: str, media_type: str) -> str:
         """Generate appropriate filename"""
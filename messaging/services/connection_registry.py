@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from weakref import WeakKeyDictionary
+
+import redis.asyncio
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# KEYS: the user's hash, the set of users. ARGV: now, stale after, cap, channel, user id, TTL.
+# Drops stale entries, then adds the channel unless the user is at the cap; 1 when added.
+REGISTER_SCRIPT = """
+local now, stale, cap = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+    if now - tonumber(entries[i + 1]) >= stale then
+        redis.call('HDEL', KEYS[1], entries[i])
+    end
+end
+if redis.call('HLEN', KEYS[1]) >= cap then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[4], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('SADD', KEYS[2], ARGV[5])
+return 1
+"""
+
+
+class ConnectionRegistry:
+    """
+    Open websocket connections per user, for the per-user cap and metrics.
+
+    With the Redis channel layer (production, several workers) the
+    connections of a user are the Redis hash ``ws:connections:<user_id>``
+    of ``{channel_name: last_seen}``. A Lua script checks the cap and adds
+    the connection atomically, so concurrent connects on any worker cannot
+    exceed it. The counters are a Redis hash too, so ``metrics`` covers
+    every worker. With the in-memory channel layer (a single process:
+    development, tests) the same state is kept in this process.
+
+    Each connection refreshes its entry on every heartbeat. Entries not
+    refreshed for ``stale_after()`` seconds (a worker that died) are
+    dropped, so counts heal without cleanup jobs.
+    """
+
+    KEY = 'ws:connections:{}'
+    USERS_KEY = 'ws:users'
+    COUNTERS_KEY = 'ws:counters'
+    COUNTERS = ('opened_total', 'closed_total', 'heartbeat_timeout_total', 'rejected_total')
+
+    # redis.asyncio connections belong to the loop that opened them.
+    _clients: 'WeakKeyDictionary[asyncio.AbstractEventLoop, redis.asyncio.Redis]' = WeakKeyDictionary()
+    _local: Dict[int, Dict[str, float]] = {}
+    _local_counters: Counter = Counter()
+
+    @classmethod
+    def stale_after(cls) -> float:
+        return settings.WEBSOCKET_HEARTBEAT_INTERVAL * 3
+
+    @classmethod
+    async def register(cls, user_id: int, channel_name: str) -> bool:
+        """Record a new connection; False when the user already has the maximum open."""
+        now = time.time()
+        cap = settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER
+        client = cls._redis()
+        if client is None:
+            connections = cls._local[user_id] = cls._live(cls._local.get(user_id, {}), now)
+            accepted = len(connections) < cap
+            if accepted:
+                connections[channel_name] = now
+        else:
+            accepted = bool(await client.eval(
+                REGISTER_SCRIPT, 2, cls.KEY.format(user_id), cls.USERS_KEY,
+                now, cls.stale_after(), cap, channel_name, user_id, cls._ttl(),
+            ))
+        if not accepted:
+            logger.warning(f"User {user_id} already has {cap} websocket connections")
+        await cls._increment('opened_total' if accepted else 'rejected_total')
+        return accepted
+
+    @classmethod
+    async def refresh(cls, user_id: int, channel_name: str):
+        now = time.time()
+        client = cls._redis()
+        if client is None:
+            cls._local.setdefault(user_id, {})[channel_name] = now
+            return
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(cls.KEY.format(user_id), channel_name, now)
+            pipe.expire(cls.KEY.format(user_id), cls._ttl())
+            pipe.sadd(cls.USERS_KEY, user_id)
+            await pipe.execute()
+
+    @classmethod
+    async def unregister(cls, user_id: int, channel_name: str, reason: str = 'closed'):
+        client = cls._redis()
+        if client is None:
+            removed = cls._local.get(user_id, {}).pop(channel_name, None) is not None
+        else:
+            removed = bool(await client.hdel(cls.KEY.format(user_id), channel_name))
+        if removed:
+            await cls._increment(f'{reason}_total')
+
+    @classmethod
+    async def count(cls, user_id: int) -> int:
+        return len(cls._live(await cls._connections(user_id), time.time()))
+
+    @classmethod
+    async def metrics(cls) -> Dict[str, int]:
+        """Connection counts of every worker sharing the registry."""
+        client = cls._redis()
+        now = time.time()
+        if client is None:
+            user_ids = list(cls._local)
+            counters = dict(cls._local_counters)
+        else:
+            user_ids = [int(user_id) for user_id in await client.smembers(cls.USERS_KEY)]
+            counters = {name.decode(): int(value) for name, value in (await client.hgetall(cls.COUNTERS_KEY)).items()}
+
+        per_user = {}
+        for user_id in user_ids:
+            open_connections = len(cls._live(await cls._connections(user_id), now))
+            if open_connections:
+                per_user[user_id] = open_connections
+            elif client is not None:
+                await client.srem(cls.USERS_KEY, user_id)
+        return {
+            'open_connections': sum(per_user.values()),
+            'connected_users': len(per_user),
+            'max_connections_of_a_user': max(per_user.values(), default=0),
+            'max_connections_per_user': settings.WEBSOCKET_MAX_CONNECTIONS_PER_USER,
+            **{name: counters.get(name, 0) for name in cls.COUNTERS},
+        }
+
+    @classmethod
+    def _redis(cls) -> Optional[redis.asyncio.Redis]:
+        """Client of the channel layer's Redis for the running loop; None with another layer."""
+        layer = settings.CHANNEL_LAYERS.get('default', {})
+        if not layer.get('BACKEND', '').startswith('channels_redis.'):
+            return None
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None:
+            host = (layer.get('CONFIG', {}).get('hosts') or [settings.REDIS_URL])[0]
+            client = cls._clients[loop] = redis.asyncio.Redis.from_url(
+                host if isinstance(host, str) else settings.REDIS_URL
+            )
+        return client
+
+    @classmethod
+    async def _connections(cls, user_id: int) -> Dict[str, float]:
+        client = cls._redis()
+        if client is None:
+            return dict(cls._local.get(user_id, {}))
+        entries = await client.hgetall(cls.KEY.format(user_id))
+        return {channel.decode(): float(seen) for channel, seen in entries.items()}
+
+    @classmethod
+    async def _increment(cls, counter: str):
+        client = cls._redis()
+        if client is None:
+            cls._local_counters[counter] += 1
+        else:
+            await client.hincrby(cls.COUNTERS_KEY, counter, 1)
+
+    @classmethod
+    def _ttl(cls) -> int:
+        # Whole seconds, at least one: a user's hash outlives its freshest entry.
+        return max(int(cls.stale_after()) + 1, 1)
+
+    @classmethod
+    def _live(cls, connections: Dict[str, Any], now: float) -> Dict[str, float]:
+        return {channel: float(seen) for channel, seen in connections.items() if now - float(seen) < cls.stale_after()}
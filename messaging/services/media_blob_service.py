@@ -0,0 +1,136 @@
+import logging
+import os
+from datetime import timedelta
+from typing import IO, Dict, Tuple
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from messaging.models import ChatMessage, MediaBlob
+
+logger = logging.getLogger(__name__)
+
+
+class MediaBlobStore:
+    """
+    Content-addressed media storage: identical files are written once and
+    shared through a reference-counted MediaBlob.
+
+    Callers hash the bytes while they stream them to a temporary file (see
+    MediaDownloader._fetch) and hand over the file and digest; a blob that
+    already exists is reused without touching the disk. ``link`` points a
+    message at its blob, and deleting a message releases its reference
+    (messaging.signals). ``collect_garbage`` removes unreferenced blobs.
+    """
+
+    # Unreferenced blobs and stray files younger than this are kept: a
+    # download may have stored the blob but not linked its message yet.
+    GRACE_PERIOD = timedelta(hours=1)
+
+    @classmethod
+    def store(
+        cls, content: IO[bytes], sha256: str, size: int, filename: str, content_type: str = ''
+    ) -> Tuple[MediaBlob, bool]:
+        """
+        The blob of ``content``, which hashes to ``sha256``, and whether its
+        file was written now. Call inside a transaction.
+        """
+        blob = MediaBlob.objects.select_for_update().filter(pk=sha256).first()
+        if blob is not None and blob.file.storage.exists(blob.file.name):
+            return blob, False
+
+        ext = os.path.splitext(filename)[1].lower()
+        candidate = blob or MediaBlob(sha256=sha256, size=size, content_type=content_type)
+        content.seek(0)
+        candidate.file.save(f"{sha256}{ext}", File(content), save=False)
+        if blob is not None:
+            # The row survived its file; write it again.
+            candidate.save(update_fields=['file'])
+            return candidate, True
+        try:
+            with transaction.atomic():
+                candidate.save(force_insert=True)
+            return candidate, True
+        except IntegrityError:
+            # Stored concurrently by another worker: keep theirs.
+            default_storage.delete(candidate.file.name)
+            return MediaBlob.objects.select_for_update().get(pk=sha256), False
+
+    @staticmethod
+    def link(message: ChatMessage, blob: MediaBlob):
+        """Make ``message`` one more reference of ``blob``; the caller saves the message."""
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        message.media_blob = blob
+        message.messenger_media_file.name = blob.file.name
+
+    @staticmethod
+    def release(blob_id: str):
+        MediaBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+    @classmethod
+    def collect_garbage(cls, grace: timedelta = None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Re-count references, then delete the blobs nobody links to (with their
+        thumbnails) and files under ``blobs/`` that no blob names. Returns
+        what was (or would be) done.
+        """
+        cutoff = timezone.now() - (cls.GRACE_PERIOD if grace is None else grace)
+        links = (
+            ChatMessage.objects.filter(media_blob=OuterRef('pk'))
+            .order_by().values('media_blob').annotate(count=Count('pk')).values('count')
+        )
+        corrected = 0
+        if not dry_run:
+            # Repairs counts left wrong by bulk deletes, which send no signals.
+            corrected = MediaBlob.objects.exclude(ref_count=Coalesce(Subquery(links), 0)).update(
+                ref_count=Coalesce(Subquery(links), 0)
+            )
+
+        orphans = MediaBlob.objects.filter(created_at__lt=cutoff).annotate(
+            links=Coalesce(Subquery(links), 0)
+        ).filter(links=0)
+        removed = freed = 0
+        for sha256 in list(orphans.values_list('pk', flat=True)):
+            with transaction.atomic():
+                blob = MediaBlob.objects.select_for_update(skip_locked=True).filter(pk=sha256, ref_count=0).first()
+                if blob is None or blob.messages.exists():
+                    continue
+                removed += 1
+                freed += blob.size
+                if not dry_run:
+                    blob.delete()
+                    names = [blob.file.name] + ([blob.thumbnail.name] if blob.thumbnail else [])
+                    transaction.on_commit(lambda names=names: [default_storage.delete(name) for name in names])
+
+        strays = cls._stray_files(cutoff)
+        if not dry_run:
+            for name in strays:
+                default_storage.delete(name)
+        if removed or strays:
+            logger.info(f"Media blob GC: {removed} blobs ({freed} bytes) and {len(strays)} stray files")
+        return {'corrected': corrected, 'removed': removed, 'freed_bytes': freed, 'stray_files': len(strays)}
+
+    @staticmethod
+    def _stray_files(cutoff):
+        known = set()
+        for name, thumbnail in MediaBlob.objects.values_list('file', 'thumbnail'):
+            known.update((name, thumbnail))
+        strays = []
+
+        def walk(directory):
+            if not default_storage.exists(directory):
+                return
+            subdirectories, files = default_storage.listdir(directory)
+            for name in files:
+                path = f"{directory}/{name}"
+                if path not in known and default_storage.get_modified_time(path) < cutoff:
+                    strays.append(path)
+            for subdirectory in subdirectories:
+                walk(f"{directory}/{subdirectory}")
+
+        walk('blobs')
+        return strays
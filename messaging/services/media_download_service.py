@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from threading import Event, Lock, Thread
+from typing import IO, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import filetype
+import httpx
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from messaging.models import ChatMessage, MediaDownloadJob
+from messaging.services import websocket_service
+from messaging.services.media_blob_service import MediaBlobStore
+from messaging.services.thumbnail_service import ThumbnailService
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentDownloadError(Exception):
+    """A download that retrying cannot fix (missing, forbidden, too large, expired)."""
+
+
+class DownloadedFile(NamedTuple):
+    file: IO[bytes]  # Spooled: in memory up to MEDIA_DOWNLOAD_SPOOL_SIZE, then on disk
+    sha256: str
+    size: int
+    content_type: str
+    extension: str  # Sniffed from the content, without the dot; '' when unknown
+
+
+class MediaDownloader:
+    """
+    Fetches Messenger attachments into their ChatMessage from the
+    MediaDownloadJob table.
+
+    One asyncio loop per process streams the files with httpx, at most
+    ``MEDIA_DOWNLOAD_CONCURRENCY`` at a time and ``MEDIA_DOWNLOAD_PER_HOST``
+    per CDN host, hashing them on the way so identical media is stored once
+    (see MediaBlobStore). Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``
+    under a lease, so several processes can share the table and the jobs of a
+    process that died are picked up again once their lease expires. Transient
+    failures are retried with exponential backoff and full jitter; the message
+    is marked failed after ``MEDIA_DOWNLOAD_MAX_ATTEMPTS`` or a permanent error.
+    A daemon worker starts with each ASGI process (facebook_business_automation.asgi),
+    so jobs left pending by a restart resume, and is woken when a job is
+    committed; ``process_media_downloads`` runs one in the foreground.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    LEASE = timedelta(minutes=5)
+    POLL_INTERVAL = 1  # seconds
+    # Messenger CDN URLs expire; older jobs are not worth fetching.
+    STALE_AFTER = timedelta(hours=1)
+    # Status codes worth another attempt; other 4xx responses are final.
+    RETRYABLE_STATUS = {408, 425, 429}
+    # Bytes read back to recognise the file type (filetype needs at most this many).
+    SNIFF_SIZE = 8192
+
+    _lock = Lock()
+    _wakeup = Event()
+    _worker: Optional[Thread] = None
+
+    @classmethod
+    def enqueue(cls, chat_message: ChatMessage, url: str) -> MediaDownloadJob:
+        """Record that ``url`` must be fetched into ``chat_message``, and wake the worker once that commits."""
+        job = MediaDownloadJob.objects.create(chat_message=chat_message, url=url, host=urlparse(url).netloc)
+        transaction.on_commit(cls.notify)
+        return job
+
+    @classmethod
+    def notify(cls):
+        with cls._lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = Thread(target=cls._run, name='media-downloader', daemon=True)
+                cls._worker.start()
+        cls._wakeup.set()
+
+    @classmethod
+    def requeue_failed(cls) -> int:
+        """Queue every failed job again as if it had just been created; returns how many."""
+        with transaction.atomic():
+            ChatMessage.objects.filter(download_job__status=MediaDownloadJob.Status.FAILED).update(
+                download_status='pending'
+            )
+            now = timezone.now()
+            # created_at restarts the STALE_AFTER clock; an URL that did expire fails with the CDN's 4xx.
+            requeued = MediaDownloadJob.objects.filter(status=MediaDownloadJob.Status.FAILED).update(
+                status=MediaDownloadJob.Status.PENDING, attempts=0, last_error='', next_attempt_at=now, created_at=now
+            )
+        if requeued:
+            transaction.on_commit(cls.notify)
+        return requeued
+
+    @classmethod
+    def _run(cls):
+        asyncio.run(cls.run(forever=True))
+
+    @classmethod
+    async def run(cls, forever: bool = False, transport: httpx.AsyncBaseTransport = None) -> int:
+        """
+        Process jobs as they come due. Returns the number of jobs finished
+        (stored or failed) once no unfinished job is left, unless ``forever``.
+        """
+        tasks = set()
+        finished = 0
+        in_flight: Counter = Counter()
+        timeout = httpx.Timeout(settings.MEDIA_DOWNLOAD_TIMEOUT, connect=10)
+        limits = httpx.Limits(max_connections=settings.MEDIA_DOWNLOAD_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True, transport=transport) as client:
+            while True:
+                free = settings.MEDIA_DOWNLOAD_CONCURRENCY - len(tasks)
+                busy = [host for host, count in in_flight.items() if count >= settings.MEDIA_DOWNLOAD_PER_HOST]
+                jobs = await cls._claim(free, in_flight, busy) if free > 0 else []
+                for job in jobs:
+                    in_flight[job.host] += 1
+                    task = asyncio.create_task(cls._process(client, job))
+                    task.add_done_callback(lambda _, host=job.host: in_flight.subtract([host]))
+                    tasks.add(task)
+
+                if tasks:
+                    done, tasks = await asyncio.wait(tasks, timeout=cls.POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is not None:
+                            # The job's lease expires and it is claimed again.
+                            logger.error(f"Media download job crashed: {task.exception()}")
+                        else:
+                            finished += task.result()
+                elif forever:
+                    await asyncio.to_thread(cls._wakeup.wait, cls.POLL_INTERVAL)
+                    cls._wakeup.clear()
+                elif await cls._has_unfinished():
+                    await asyncio.sleep(min(cls.POLL_INTERVAL, settings.MEDIA_DOWNLOAD_RETRY_BASE))
+                else:
+                    return finished
+
+    @classmethod
+    @database_sync_to_async
+    def _claim(cls, limit: int, in_flight: Counter, busy_hosts: Iterable[str]) -> List[MediaDownloadJob]:
+        now = timezone.now()
+        due = (
+            Q(status=MediaDownloadJob.Status.PENDING)
+            | Q(status=MediaDownloadJob.Status.RUNNING, locked_until__lt=now)
+        )
+        with transaction.atomic():
+            candidates = (
+                MediaDownloadJob.objects.select_for_update(skip_locked=True)
+                .filter(due, next_attempt_at__lte=now)
+                .exclude(host__in=list(busy_hosts))
+                .order_by('next_attempt_at')[:limit * 4]
+            )
+            claimed, per_host = [], Counter(in_flight)
+            for job in candidates:
+                if len(claimed) == limit:
+                    break
+                if per_host[job.host] >= settings.MEDIA_DOWNLOAD_PER_HOST:
+                    continue
+                per_host[job.host] += 1
+                claimed.append(job)
+            MediaDownloadJob.objects.filter(pk__in=[job.pk for job in claimed]).update(
+                status=MediaDownloadJob.Status.RUNNING, locked_until=now + cls.LEASE, attempts=F('attempts') + 1
+            )
+        for job in claimed:
+            job.attempts += 1
+        return claimed
+
+    @classmethod
+    @database_sync_to_async
+    def _has_unfinished(cls) -> bool:
+        return MediaDownloadJob.objects.exclude(status=MediaDownloadJob.Status.FAILED).exists()
+
+    @classmethod
+    async def _process(cls, client: httpx.AsyncClient, job: MediaDownloadJob) -> int:
+        """Run one attempt of ``job``; returns 1 when the job is finished, 0 when it will be retried."""
+        downloaded = None
+        try:
+            if timezone.now() - job.created_at > cls.STALE_AFTER:
+                raise PermanentDownloadError("the media URL has expired")
+            downloaded = await cls._fetch(client, job.url)
+            await cls._store(job, downloaded)
+            return 1
+        except PermanentDownloadError as e:
+            logger.warning(f"Download of message {job.pk} media failed: {str(e)}")
+            await cls._fail(job, str(e))
+            return 1
+        except Exception as e:
+            logger.warning(f"Download attempt {job.attempts} of message {job.pk} media failed: {str(e)}")
+            return await cls._retry(job, str(e) or type(e).__name__)
+        finally:
+            if downloaded is not None:
+                downloaded.file.close()
+
+    @classmethod
+    async def _fetch(cls, client: httpx.AsyncClient, url: str) -> DownloadedFile:
+        """
+        Stream ``url`` in one GET, hashing it and enforcing the size limit on
+        the bytes received, since Content-Length may be missing or wrong.
+        """
+        limit = cls._max_size()
+        async with client.stream('GET', url) as response:
+            if 400 <= response.status_code < 500 and response.status_code not in cls.RETRYABLE_STATUS:
+                raise PermanentDownloadError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            if int(response.headers.get('Content-Length') or 0) > limit:
+                raise PermanentDownloadError("file too large")
+
+            size, digest = 0, hashlib.sha256()
+            f = tempfile.SpooledTemporaryFile(max_size=settings.MEDIA_DOWNLOAD_SPOOL_SIZE, prefix='media-')
+            try:
+                async for chunk in response.aiter_bytes(cls.CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > limit:
+                        raise PermanentDownloadError("file too large")
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.seek(0)
+                kind = filetype.guess(f.read(cls.SNIFF_SIZE))
+                f.seek(0)
+            except BaseException:
+                f.close()
+                raise
+            header_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            return DownloadedFile(
+                f, digest.hexdigest(), size,
+                kind.mime if kind else header_type, kind.extension if kind else '',
+            )
+
+    @staticmethod
+    def _max_size() -> int:
+        from messaging.services.chat_message_service import ChatMessageService
+        return ChatMessageService.MAX_ALLOWED_SIZE
+
+    @classmethod
+    @database_sync_to_async
+    def _store(cls, job: MediaDownloadJob, downloaded: DownloadedFile):
+        from messaging.services.chat_message_service import ChatMessageService
+        with transaction.atomic():
+            message = ChatMessage.objects.select_for_update().select_related('conversation').get(pk=job.pk)
+            if not message.messenger_media_file:
+                media_type = cls._media_type(message.media_type, downloaded, job.url)
+                filename = ChatMessageService._get_filename(job.url, media_type)
+                if downloaded.extension:
+                    filename = f"{os.path.splitext(filename)[0]}.{downloaded.extension}"
+                blob, written = MediaBlobStore.store(
+                    downloaded.file, downloaded.sha256, downloaded.size, filename, downloaded.content_type,
+                )
+                MediaBlobStore.link(message, blob)
+                message.media_type = media_type
+                message.download_status = 'completed'
+                message.save(update_fields=[
+                    'messenger_media_file', 'media_blob', 'media_type', 'download_status', 'updated_at'
+                ])
+                if written:
+                    transaction.on_commit(lambda: ThumbnailService.schedule(blob, media_type))
+            MediaDownloadJob.objects.filter(pk=job.pk).delete()
+            websocket_service.media_ready_notification(message)
+
+    @staticmethod
+    def _media_type(declared: Optional[str], downloaded: DownloadedFile, url: str) -> str:
+        """The type the webhook declared, unless the sniffed content says otherwise; the URL extension last."""
+        from messaging.services.chat_message_service import ChatMessageService
+        if downloaded.extension:
+            if declared and ChatMessageService._validate_content_type(downloaded.content_type, declared):
+                return declared
+            return ChatMessageService._media_type_from_content_type(downloaded.content_type)
+        return declared or ChatMessageService._determine_media_type_from_url(url)
+
+    @classmethod
+    @database_sync_to_async
+    def _retry(cls, job: MediaDownloadJob, error: str) -> int:
+        if job.attempts >= settings.MEDIA_DOWNLOAD_MAX_ATTEMPTS:
+            cls._mark_failed(job, error)
+            return 1
+        delay = random.uniform(0, min(settings.MEDIA_DOWNLOAD_RETRY_CAP, settings.MEDIA_DOWNLOAD_RETRY_BASE * 2 ** job.attempts))
+        MediaDownloadJob.objects.filter(pk=job.pk).update(
+            status=MediaDownloadJob.Status.PENDING, locked_until=None, last_error=error[:2000],
+            next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        )
+        return 0
+
+    @classmethod
+    @database_sync_to_async
+    def _fail(cls, job: MediaDownloadJob, error: str):
+        cls._mark_failed(job, error)
+
+    @staticmethod
+    def _mark_failed(job: MediaDownloadJob, error: str):
+        with transaction.atomic():
+            MediaDownloadJob.objects.filter(pk=job.pk).update(
+                status=MediaDownloadJob.Status.FAILED, locked_until=None, last_error=error[:2000]
+            )
+            ChatMessage.objects.filter(pk=job.pk).update(download_status='failed', updated_at=timezone.now())
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from messaging.models import RealtimeEvent
+
+logger = logging.getLogger(__name__)
+
+
+class RealtimeOutbox:
+    """
+    Publishes channel layer events only once the writes they announce commit.
+
+    ``record`` stores the event in the caller's transaction, so a rollback
+    discards it and the transaction never waits on Redis. After commit a
+    daemon publisher sends pending events in batches, concurrently across
+    groups and in order within each group, and deletes what was sent. A
+    publisher only locks the outbox rows it is sending (others skip them),
+    so business transactions inserting new events never wait on it. Every
+    worker process runs a publisher; one leaves alone a group whose earlier
+    events another holds, so groups stay in order across processes. Events
+    that cannot be sent are retried; after ``MAX_AGE`` they are dropped,
+    since clients reload history over the REST API when they reconnect.
+    """
+
+    BATCH_SIZE = 100
+    MAX_AGE = timedelta(minutes=5)
+    RETRY_DELAY = 1  # seconds
+
+    _lock = Lock()
+    _wakeup = Event()
+    _worker: Optional[Thread] = None
+
+    @classmethod
+    def record(cls, group: str, event: dict) -> RealtimeEvent:
+        """Queue ``event`` for ``group_send(group, event)`` once the current transaction commits."""
+        entry = RealtimeEvent.objects.create(group=group, event=event)
+        transaction.on_commit(cls.notify)
+        return entry
+
+    @classmethod
+    def notify(cls):
+        with cls._lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = Thread(target=cls._run, name='realtime-outbox', daemon=True)
+                cls._worker.start()
+        cls._wakeup.set()
+
+    @classmethod
+    def publish_pending(cls, channel_layer=None) -> int:
+        """Publish every pending event in the calling thread. Returns the number sent."""
+        channel_layer = channel_layer or get_channel_layer()
+        expired, _ = RealtimeEvent.objects.filter(created_at__lt=timezone.now() - cls.MAX_AGE).delete()
+        if expired:
+            logger.warning(f"Dropped {expired} realtime events that could not be published in time")
+
+        published = 0
+        while True:
+            with transaction.atomic():
+                batch = list(RealtimeEvent.objects.select_for_update(skip_locked=True)[:cls.BATCH_SIZE])
+                if not batch:
+                    return published
+                batch = cls._without_held_groups(batch)
+                if not batch:
+                    # The rest waits for the publishers holding it.
+                    return published
+                sent = async_to_sync(cls._send)(channel_layer, batch)
+                RealtimeEvent.objects.filter(pk__in=sent).delete()
+            published += len(sent)
+            if len(sent) < len(batch):
+                # The rest is retried by the publisher.
+                return published
+
+    @staticmethod
+    def _without_held_groups(batch: List[RealtimeEvent]) -> List[RealtimeEvent]:
+        """
+        Drop the groups with events older than this batch's: being unlocked,
+        those would have been selected, so another publisher is sending them.
+        """
+        first: Dict[str, int] = {}
+        for entry in batch:
+            first.setdefault(entry.group, entry.pk)
+        older = Q()
+        for group, pk in first.items():
+            older |= Q(group=group, pk__lt=pk)
+        held = set(RealtimeEvent.objects.filter(older).values_list('group', flat=True).distinct())
+        return [entry for entry in batch if entry.group not in held]
+
+    @classmethod
+    async def _send(cls, channel_layer, batch: List[RealtimeEvent]) -> List[int]:
+        by_group: "OrderedDict[str, List[RealtimeEvent]]" = OrderedDict()
+        for entry in batch:
+            by_group.setdefault(entry.group, []).append(entry)
+
+        async def send_group(entries: List[RealtimeEvent]) -> List[int]:
+            sent = []
+            for entry in entries:
+                try:
+                    await channel_layer.group_send(entry.group, entry.event)
+                except Exception as e:
+                    # Later events of the group wait too, so clients see them in order.
+                    logger.error(f"Could not publish realtime event {entry.pk} to {entry.group}: {str(e)}")
+                    break
+                sent.append(entry.pk)
+            return sent
+
+        results = await asyncio.gather(*(send_group(entries) for entries in by_group.values()))
+        return [pk for sent in results for pk in sent]
+
+    @classmethod
+    def _run(cls):
+        retry = False
+        while True:
+            cls._wakeup.wait(cls.RETRY_DELAY if retry else None)
+            cls._wakeup.clear()
+            close_old_connections()
+            try:
+                cls.publish_pending()
+                retry = RealtimeEvent.objects.exists()
+            except Exception as e:
+                logger.error(f"Publishing realtime events failed: {str(e)}", exc_info=True)
+                retry = True
+            finally:
+                close_old_connections()
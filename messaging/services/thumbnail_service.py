@@ -0,0 +1,100 @@
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+from messaging.models import MediaBlob
+from messaging.utils.thumbnails import render_thumbnail
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailService:
+    """
+    Renders WebP thumbnails of stored images and first-frame posters of
+    videos into ``MediaBlob.thumbnail``, next to the original file.
+
+    Decoding runs in a process pool of ``MEDIA_THUMBNAIL_WORKERS`` fresh
+    interpreters, so it takes neither the request threads nor the GIL of
+    the download loop. ``schedule`` is called once a download commits and
+    returns immediately; the thumbnail is saved when the render finishes.
+    Blobs are shared, so identical media is rendered once. Video posters
+    need ``ffmpeg`` on the PATH and are skipped without it.
+    """
+
+    _pool: Optional[ProcessPoolExecutor] = None
+    _lock = Lock()
+
+    @classmethod
+    def pool(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._pool is None:
+                # Spawned, not forked: the parent runs threads (downloads, channels).
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=settings.MEDIA_THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+                )
+            return cls._pool
+
+    @staticmethod
+    def kind(blob: MediaBlob, media_type: str = None) -> Optional[str]:
+        """'image' or 'video' when ``blob`` can get a thumbnail, else None."""
+        kind = (blob.content_type or '').split('/')[0] or media_type
+        return kind if kind in ('image', 'video') else None
+
+    @classmethod
+    def schedule(cls, blob: MediaBlob, media_type: str = None) -> Optional[Future]:
+        """Render ``blob``'s thumbnail in the background, unless it has one or cannot have one."""
+        future = cls._submit(blob, media_type)
+        if future is not None:
+            future.add_done_callback(lambda done: cls._finish_in_background(blob.pk, done))
+        return future
+
+    @classmethod
+    def generate(cls, blob: MediaBlob, media_type: str = None) -> bool:
+        """Render ``blob``'s thumbnail and wait for it; returns whether one was saved."""
+        future = cls._submit(blob, media_type)
+        return future is not None and cls._finish(blob.pk, future)
+
+    @classmethod
+    def _submit(cls, blob: MediaBlob, media_type: str = None) -> Optional[Future]:
+        kind = cls.kind(blob, media_type)
+        if kind is None or blob.thumbnail:
+            return None
+        return cls.pool().submit(render_thumbnail, blob.file.path, kind, settings.MEDIA_THUMBNAIL_SIZE)
+
+    @classmethod
+    def _finish_in_background(cls, sha256: str, future: Future):
+        # Runs on the pool's management thread, which keeps its connection between renders.
+        close_old_connections()
+        cls._finish(sha256, future)
+
+    @classmethod
+    def _finish(cls, sha256: str, future: Future) -> bool:
+        try:
+            data = future.result()
+        except BrokenProcessPool as e:
+            logger.error(f"Thumbnail worker died rendering blob {sha256}: {str(e)}")
+            with cls._lock:
+                cls._pool = None
+            return False
+        except Exception as e:
+            logger.warning(f"Could not render the thumbnail of blob {sha256}: {str(e)}")
+            return False
+        if not data:
+            return False
+
+        blob = MediaBlob.objects.filter(pk=sha256, thumbnail='').first()
+        if blob is None:
+            return False
+        blob.thumbnail.save(f"{sha256}.thumb.webp", ContentFile(data), save=False)
+        if not MediaBlob.objects.filter(pk=sha256, thumbnail='').update(thumbnail=blob.thumbnail.name):
+            # Collected meanwhile, or rendered twice.
+            blob.thumbnail.storage.delete(blob.thumbnail.name)
+            return False
+        return True
@@ -1,13 +1,11 @@
 from datetime import datetime
-from channels.layers import get_channel_layer
-import json
-from asgiref.sync import async_to_sync
+from messaging.services.realtime_outbox import RealtimeOutbox
 
 
-def message_from_outside_consumer(conversation, sender, message_text, media_id=None, media_type=None, contacts=None, media_url=None):
-    channel_layer = get_channel_layer()
+# Events are recorded in the caller's transaction and sent once it commits (see RealtimeOutbox).
 
-    group_name = f'user_{conversation.user.id}_chat'
+def message_from_outside_consumer(conversation, sender, message_text, media_id=None, media_type=None, contacts=None, media_url=None):
+    group_name = f'user_{conversation.user_id}_chat'
 
     # payload = {
     #     "text": message_text,      # can be text or caption
@@ -30,11 +28,11 @@ def message_from_outside_consumer(conversation, sender, message_text, media_id=N
     # print("comming.... ======================= websocket service =================")
     # print("payload", payload)
 
-    async_to_sync(channel_layer.group_send)(
+    RealtimeOutbox.record(
         group_name,
         {
             'type': 'chat.message',  # must match method name 'chat_message' in consumer
-            'message': json.dumps({
+            'message': {
                 "conversation_id": str(conversation.id),
                 "message": {
                     "id": f"ws-{int(datetime.now().timestamp() * 1000)}",
@@ -48,7 +46,7 @@ def message_from_outside_consumer(conversation, sender, message_text, media_id=N
                     # "conversation_id": str(conversation.id),
                 }
 
-            })
+            }
         }
     )
 
@@ -73,3 +71,21 @@ def message_from_outside_consumer(conversation, sender, message_text, media_id=N
     #         'sender_channel': self.channel_name
     #     }
     # )
+
+
+def media_ready_notification(chat_message):
+    """Tell the owner's open chats that a message's media has been stored and can be shown."""
+    conversation = chat_message.conversation
+
+    RealtimeOutbox.record(
+        f'user_{conversation.user_id}_chat',
+        {
+            'type': 'media.ready',  # handled by 'media_ready' in the consumer
+            'payload': {
+                "conversation_id": str(conversation.id),
+                "message_id": chat_message.id,
+                "media_type": chat_message.media_type,
+                "media_url": chat_message.messenger_media_file.url if chat_message.messenger_media_file else None,
+            },
+        }
+    )
@@ -0,0 +1,147 @@
+import fcntl
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Dict, Tuple
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WhatsAppMediaCache:
+    """
+    WhatsApp media kept under ``MEDIA_ROOT/whatsapp/`` by media id.
+
+    Graph API media URLs are short-lived and need the access token, so each
+    media is resolved and downloaded once, either when the webhook delivers it
+    (``prefetch``) or on its first view, and served from disk afterwards.
+    ``<media_id>`` holds the bytes and ``<media_id>.json`` the content type;
+    both are written atomically. Concurrent first requests for the same media
+    wait for one download: threads of a process on an in-process lock, other
+    processes on a file lock.
+    """
+
+    DIRECTORY = 'whatsapp'
+    CHUNK_SIZE = 64 * 1024
+    TIMEOUT = 30  # seconds
+    MEDIA_ID = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+    _locks: Dict[str, Lock] = {}
+    _locks_guard = Lock()
+
+    @classmethod
+    def directory(cls) -> Path:
+        return Path(settings.MEDIA_ROOT) / cls.DIRECTORY
+
+    @classmethod
+    def get(cls, media_id: str) -> Tuple[Path, str]:
+        """The local path and content type of ``media_id``, downloading it if it is not cached yet."""
+        if not cls.MEDIA_ID.match(media_id or ''):
+            raise ValueError(f"Invalid WhatsApp media id '{media_id}'")
+        cached = cls._cached(media_id)
+        if cached is not None:
+            return cached
+
+        with cls._media_lock(media_id), cls._file_lock(media_id):
+            # Whoever held the locks before us may have fetched it.
+            cached = cls._cached(media_id)
+            if cached is None:
+                cached = cls._download(media_id)
+            return cached
+
+    @classmethod
+    def prefetch(cls, media_id: str):
+        """Download ``media_id`` in the background so its first view is served locally."""
+        def fetch():
+            try:
+                cls.get(media_id)
+            except Exception as e:
+                logger.warning(f"Could not prefetch WhatsApp media {media_id}: {str(e)}")
+
+        Thread(target=fetch, name=f'whatsapp-media-{media_id}', daemon=True).start()
+
+    @classmethod
+    def _cached(cls, media_id: str):
+        path = cls.directory() / media_id
+        try:
+            meta = json.loads(path.with_name(f"{media_id}.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if not path.exists():
+            return None
+        return path, meta.get('content_type') or 'application/octet-stream'
+
+    @classmethod
+    def _download(cls, media_id: str) -> Tuple[Path, str]:
+        from messaging.services.chat_message_service import ChatMessageService
+        headers = {"Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}"}
+
+        response = requests.get(
+            f"{settings.WHATSAPP_API_BASE_URL}/{settings.WHATSAPP_API_VERSION}/{media_id}",
+            headers=headers, timeout=cls.TIMEOUT,
+        )
+        response.raise_for_status()
+        info = response.json()
+        if not info.get('url'):
+            raise ValueError(f"No URL returned for WhatsApp media {media_id}")
+        if int(info.get('file_size') or 0) > ChatMessageService.MAX_ALLOWED_SIZE:
+            raise ValueError(f"WhatsApp media {media_id} exceeds {ChatMessageService.MAX_ALLOWED_SIZE} bytes")
+
+        path = cls.directory() / media_id
+        tmp = path.with_name(f"{media_id}.{os.getpid()}.part")
+        with requests.get(info['url'], headers=headers, stream=True, timeout=cls.TIMEOUT) as media_response:
+            media_response.raise_for_status()
+            content_type = (
+                info.get('mime_type') or media_response.headers.get('Content-Type') or 'application/octet-stream'
+            )
+            size = 0
+            try:
+                with open(tmp, 'wb') as f:
+                    for chunk in media_response.iter_content(cls.CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > ChatMessageService.MAX_ALLOWED_SIZE:
+                            raise ValueError(
+                                f"WhatsApp media {media_id} exceeds {ChatMessageService.MAX_ALLOWED_SIZE} bytes"
+                            )
+                        f.write(chunk)
+                os.replace(tmp, path)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+
+        # The metadata goes last: a file without it counts as not cached.
+        meta_tmp = path.with_name(f"{media_id}.json.{os.getpid()}.part")
+        meta_tmp.write_text(json.dumps({'content_type': content_type, 'size': size}))
+        os.replace(meta_tmp, path.with_name(f"{media_id}.json"))
+        logger.info(f"Cached WhatsApp media {media_id} ({size} bytes)")
+        return path, content_type
+
+    @classmethod
+    @contextmanager
+    def _media_lock(cls, media_id: str):
+        with cls._locks_guard:
+            lock = cls._locks.setdefault(media_id, Lock())
+        with lock:
+            yield
+        with cls._locks_guard:
+            if not lock.locked():
+                cls._locks.pop(media_id, None)
+
+    @classmethod
+    @contextmanager
+    def _file_lock(cls, media_id: str):
+        directory = cls.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        lock_path = directory / f"{media_id}.lock"
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
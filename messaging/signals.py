@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from messaging.services.media_blob_service import MediaBlobStore
+from .models import ChatMessage
+
+
+@receiver(post_delete, sender=ChatMessage)
+def release_media_blob(sender, instance, **kwargs):
+    """Drop the deleted message's reference to its media blob; gc_media_blobs removes unreferenced ones."""
+    if instance.media_blob_id:
+        MediaBlobStore.release(instance.media_blob_id)
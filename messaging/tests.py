@@ -1,3 +1,663 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+import warnings
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from messaging.consumers import (
+    CLOSE_CODE_HEARTBEAT_TIMEOUT, CLOSE_CODE_TOO_MANY_CONNECTIONS, ChatAsyncJsonWebsocketConsumer,
+)
+from messaging.enums import PLATFORM
+from messaging.models import ChatMessage, Conversation, MediaBlob, MediaDownloadJob, RealtimeEvent, SocialMediaUser
+from messaging.services.media_blob_service import MediaBlobStore
+from messaging.services.chat_message_service import ChatMessageService
+from messaging.services.connection_registry import ConnectionRegistry
+from messaging.services.media_download_service import MediaDownloader
+from messaging.services.realtime_outbox import RealtimeOutbox
+from messaging.services.thumbnail_service import ThumbnailService
+from messaging.services.whatsapp_media_cache import WhatsAppMediaCache
+from messaging.serializers import ChatMessageSerializer
+from messaging.utils.media_response import media_file_response
+
+User = get_user_model()
+
+
+def png_bytes(size=(1200, 800)):
+    image = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(image, 'PNG')
+    return image.getvalue()
+
+
+PNG = png_bytes((40, 30))
+
+
+class StubCDN(ThreadingHTTPServer):
+    """
+    Serves /<name>.jpg slowly, recording concurrency per Host header; /flaky-* fail once, /missing-* 404,
+    every /sticker-* has the same content, /upload-* is a PNG without extension or image Content-Type
+    and /endless-* streams 4 MiB without Content-Length.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubCDNHandler)
+        self.lock = threading.Lock()
+        self.active = Counter()
+        self.peak = Counter()
+        self.peak_total = 0
+        self.requests = Counter()
+
+
+class StubCDNHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server, host = self.server, self.headers['Host'].split(':')[0]
+        with server.lock:
+            server.active[host] += 1
+            server.requests[self.path] += 1
+            server.peak[host] = max(server.peak[host], server.active[host])
+            server.peak_total = max(server.peak_total, sum(server.active.values()))
+            attempt = server.requests[self.path]
+        try:
+            time.sleep(0.02)
+            if self.path.startswith('/missing-'):
+                self.send_response(404)
+                self.end_headers()
+            elif self.path.startswith('/flaky-') and attempt == 1:
+                self.send_response(503)
+                self.end_headers()
+            elif self.path.startswith('/upload-'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.end_headers()
+                self.wfile.write(PNG)
+            elif self.path.startswith('/endless-'):
+                # No Content-Length: only the bytes received can be checked.
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.end_headers()
+                for _ in range(64):
+                    self.wfile.write(b'x' * 65536)
+            else:
+                body = b'sticker' * 1000 if self.path.startswith('/sticker-') else self.path.encode() * 1000
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active[host] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    MEDIA_DOWNLOAD_CONCURRENCY=12, MEDIA_DOWNLOAD_PER_HOST=5,
+    MEDIA_DOWNLOAD_RETRY_BASE=0.01, MEDIA_DOWNLOAD_MAX_ATTEMPTS=3, MEDIA_DOWNLOAD_SPOOL_SIZE=8192,
+)
+@mock.patch('messaging.services.media_download_service.MediaDownloader.notify')
+@mock.patch('messaging.services.realtime_outbox.RealtimeOutbox.notify')
+class MediaDownloaderTest(TransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        thumbnails = mock.patch('messaging.services.media_download_service.ThumbnailService.schedule')
+        self.schedule_thumbnail = thumbnails.start()
+        self.addCleanup(thumbnails.stop)
+
+        self.cdn = StubCDN()
+        threading.Thread(target=self.cdn.serve_forever, daemon=True).start()
+        self.addCleanup(self.cdn.server_close)
+        self.addCleanup(self.cdn.shutdown)
+
+        user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        socialuser = SocialMediaUser.objects.create(name='Rahim', social_media_id='psid-1', platform=PLATFORM.FACEBOOK)
+        self.conversation = Conversation.objects.create(user=user, socialuser=socialuser)
+
+    def _message(self, url):
+        return ChatMessageService.create_message(
+            self.conversation, 'customer', media_type='image', messenger_media_url=url
+        )
+
+    def test_hundreds_of_attachments_download_concurrently(self, publish, notify):
+        port = self.cdn.server_address[1]
+        urls = [
+            f"http://{host}:{port}/{kind}-{i}.jpg"
+            for i in range(150)
+            for host, kind in (('127.0.0.1', 'photo'), ('localhost', 'flaky' if i % 10 == 0 else 'photo'))
+        ] + [f"http://127.0.0.1:{port}/missing-1.jpg"]
+        messages = [self._message(url) for url in urls]
+        self.assertEqual(notify.call_count, len(urls))
+        self.assertEqual(MediaDownloadJob.objects.count(), len(urls))
+
+        # Jobs a crashed process was running are taken over once their lease expires.
+        crashed = [message.pk for message in messages[:5]]
+        MediaDownloadJob.objects.filter(pk__in=crashed).update(
+            status=MediaDownloadJob.Status.RUNNING, attempts=1, locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        with mock.patch('messaging.services.websocket_service.media_ready_notification') as media_ready:
+            finished = asyncio.run(MediaDownloader.run())
+        self.assertEqual(finished, len(urls))
+        self.assertEqual(media_ready.call_count, len(urls) - 1)
+
+        statuses = Counter(ChatMessage.objects.values_list('download_status', flat=True))
+        self.assertEqual(statuses, Counter({'completed': len(urls) - 1, 'failed': 1}))
+        failed = MediaDownloadJob.objects.get()
+        self.assertEqual((failed.chat_message.messenger_media_url, failed.attempts, failed.last_error),
+                         (urls[-1], 1, 'HTTP 404'))
+
+        stored = ChatMessage.objects.get(messenger_media_url=urls[0])
+        with stored.messenger_media_file.open('rb') as f:
+            self.assertEqual(f.read(), b'/photo-0.jpg' * 1000)
+        self.assertEqual(self.cdn.requests['/flaky-0.jpg'], 2)
+        self.assertLessEqual(max(self.cdn.peak.values()), 5)
+        self.assertLessEqual(self.cdn.peak_total, 10)
+        self.assertGreater(self.cdn.peak_total, 5)
+
+    def test_failed_jobs_from_an_outage_can_be_retried(self, publish, notify):
+        message = self._message(f"http://127.0.0.1:{self.cdn.server_address[1]}/photo-2.jpg")
+        MediaDownloadJob.objects.filter(pk=message.pk).update(
+            status=MediaDownloadJob.Status.FAILED, attempts=5, last_error='HTTP 503',
+            created_at=timezone.now() - MediaDownloader.STALE_AFTER * 2,
+        )
+        ChatMessage.objects.filter(pk=message.pk).update(download_status='failed')
+
+        call_command('process_media_downloads', '--retry-failed', '--once', stdout=io.StringIO())
+        message.refresh_from_db()
+        self.assertEqual(message.download_status, 'completed')
+        self.assertFalse(MediaDownloadJob.objects.exists())
+
+    def test_identical_media_is_stored_once_and_collected_when_unreferenced(self, publish, notify):
+        port = self.cdn.server_address[1]
+        messages = [self._message(f"http://127.0.0.1:{port}/sticker-{i}.png") for i in range(4)]
+        messages.append(self._message(f"http://127.0.0.1:{port}/photo-1.jpg"))
+        asyncio.run(MediaDownloader.run())
+
+        sticker, photo = MediaBlob.objects.order_by('size')
+        # Rendered once per stored file, not per message.
+        self.assertEqual(
+            sorted(call.args[0].pk for call in self.schedule_thumbnail.call_args_list), sorted([sticker.pk, photo.pk])
+        )
+        self.assertEqual((sticker.ref_count, photo.ref_count), (4, 1))
+        self.assertEqual(sticker.content_type, 'image/jpeg')
+        self.assertEqual(
+            set(ChatMessage.objects.filter(pk__in=[m.pk for m in messages[:4]]).values_list('messenger_media_file', flat=True)),
+            {sticker.file.name},
+        )
+        self.assertTrue(sticker.file.name.startswith(f"blobs/{sticker.sha256[:2]}/{sticker.sha256[2:4]}/{sticker.sha256}"))
+        with sticker.file.open('rb') as f:
+            self.assertEqual(f.read(), b'sticker' * 1000)
+
+        ChatMessage.objects.filter(pk__in=[m.pk for m in messages[:3]]).delete()
+        sticker.refresh_from_db()
+        self.assertEqual(sticker.ref_count, 1)
+        self.assertEqual(MediaBlobStore.collect_garbage(grace=timedelta(0))['removed'], 0)
+
+        messages[3].refresh_from_db()
+        messages[3].delete()
+        stray = default_storage.save('blobs/00/00/leftover.png', ContentFile(b'x'))
+        # Bulk deletes send no signal; the collector re-counts.
+        MediaBlob.objects.filter(pk=photo.pk).update(ref_count=0)
+        result = MediaBlobStore.collect_garbage(grace=timedelta(0))
+        self.assertEqual(result, {'corrected': 1, 'removed': 1, 'freed_bytes': sticker.size, 'stray_files': 1})
+        self.assertEqual(list(MediaBlob.objects.values_list('pk', flat=True)), [photo.pk])
+        self.assertFalse(default_storage.exists(sticker.file.name))
+        self.assertFalse(default_storage.exists(stray))
+        self.assertTrue(default_storage.exists(photo.file.name))
+
+    def test_type_is_sniffed_and_size_enforced_on_the_bytes_received(self, publish, notify):
+        port = self.cdn.server_address[1]
+        upload = ChatMessageService.create_message(
+            self.conversation, 'customer', messenger_media_url=f"http://127.0.0.1:{port}/upload-1"
+        )
+        endless = self._message(f"http://127.0.0.1:{port}/endless-1.jpg")
+        with mock.patch.object(ChatMessageService, 'MAX_ALLOWED_SIZE', 1024 * 1024):
+            self.assertEqual(asyncio.run(MediaDownloader.run()), 2)
+
+        upload.refresh_from_db()
+        self.assertEqual((upload.download_status, upload.media_type), ('completed', 'image'))
+        self.assertTrue(upload.messenger_media_file.name.endswith('.png'))
+        self.assertEqual(upload.media_blob.content_type, 'image/png')
+        self.assertEqual(self.cdn.requests['/upload-1'], 1)
+
+        endless.refresh_from_db()
+        self.assertEqual((endless.download_status, endless.download_job.last_error), ('failed', 'file too large'))
+        self.assertEqual(endless.download_job.attempts, 1)
+
+    def test_persistent_failures_give_up_after_max_attempts(self, publish, notify):
+        message = self._message("http://127.0.0.1:9/unreachable.jpg")
+        self.assertEqual(asyncio.run(MediaDownloader.run()), 1)
+        job = MediaDownloadJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (MediaDownloadJob.Status.FAILED, 3))
+        message.refresh_from_db()
+        self.assertEqual(message.download_status, 'failed')
+
+
+class FakeGraphResponse:
+    def __init__(self, payload=None, body=b''):
+        self.payload, self.body, self.headers = payload, body, {'Content-Type': 'image/jpeg'}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class WhatsAppMediaCacheTest(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name, WHATSAPP_ACCESS_TOKEN='token')
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.graph_calls = Counter()
+        patcher = mock.patch('messaging.services.whatsapp_media_cache.requests.get', side_effect=self._graph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _graph(self, url, headers=None, stream=False, timeout=None):
+        self.assertEqual(headers, {'Authorization': 'Bearer token'})
+        self.graph_calls[url] += 1
+        time.sleep(0.05)
+        if stream:
+            return FakeGraphResponse(body=b'jpeg' * 50000)
+        return FakeGraphResponse({'url': 'https://lookaside.example/media/123', 'mime_type': 'image/png'})
+
+    def test_concurrent_first_views_download_once_then_serve_the_local_copy(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(WhatsAppMediaCache.get('123'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(sorted(self.graph_calls.values()), [1, 1])
+
+        response = self.client.get(reverse('media_proxy'), {'media_id': '123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(response.streaming_content), b'jpeg' * 50000)
+        self.assertEqual(sum(self.graph_calls.values()), 2)
+
+    def test_rejects_media_ids_that_are_not_plain_names(self):
+        response = self.client.get(reverse('media_proxy'), {'media_id': '../settings'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(self.graph_calls)
+
+
+class MediaFileResponseTest(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.body = bytes(range(256)) * 1000
+        self.path = os.path.join(media_root.name, 'whatsapp', '42')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(self.body)
+
+    def _get(self, **headers):
+        return media_file_response(RequestFactory().get('/media-proxy', **headers), self.path, 'video/mp4')
+
+    def test_full_response_streams_with_validators(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Last-Modified', response)
+
+        not_modified = self._get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_ranges(self):
+        etag = self._get()['ETag']
+        cases = [
+            ('bytes=100-199', 206, 'bytes 100-199/256000', self.body[100:200]),
+            ('bytes=-10', 206, 'bytes 255990-255999/256000', self.body[-10:]),
+            ('bytes=255000-', 206, 'bytes 255000-255999/256000', self.body[255000:]),
+            ('bytes=300000-', 416, 'bytes */256000', b''),
+        ]
+        for header, status, content_range, body in cases:
+            with self.subTest(header):
+                response = self._get(HTTP_RANGE=header, HTTP_IF_RANGE=etag)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['Content-Range'], content_range)
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                self.assertEqual(content, body)
+
+        # A stale If-Range or several ranges get the whole file.
+        self.assertEqual(self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+        self.assertEqual(self._get(HTTP_RANGE='bytes=0-9,20-29').status_code, 200)
+
+    async def test_asgi_responses_stream_without_buffering(self):
+        etag = (await sync_to_async(self._get)())['ETag']
+        for headers, body in (({}, self.body), ({'Range': 'bytes=100-70000', 'If-Range': etag}, self.body[100:70001])):
+            with self.subTest(headers):
+                request = AsyncRequestFactory().get('/media-proxy', headers=headers)
+                response = await sync_to_async(media_file_response)(request, self.path, 'video/mp4')
+                self.assertTrue(response.is_async)
+                self.assertEqual(int(response['Content-Length']), len(body))
+                with warnings.catch_warnings():
+                    # Django warns when it has to buffer a sync iterator.
+                    warnings.simplefilter('error')
+                    chunks = [chunk async for chunk in response]
+                self.assertEqual(b''.join(chunks), body)
+                self.assertLessEqual(max(map(len, chunks)), 64 * 1024)
+
+    def test_web_server_sends_the_file(self):
+        with override_settings(MEDIA_PROXY_SENDFILE='x-accel-redirect'):
+            response = self._get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/whatsapp/42')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_PROXY_SENDFILE='x-sendfile'):
+            self.assertEqual(self._get()['X-Sendfile'], os.path.realpath(self.path))
+
+
+class ThumbnailServiceTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        socialuser = SocialMediaUser.objects.create(name='Rahim', social_media_id='psid-1', platform=PLATFORM.FACEBOOK)
+        self.conversation = Conversation.objects.create(user=user, socialuser=socialuser)
+
+    def _blob(self, data, content_type):
+        blob = MediaBlob(sha256=f"{len(data):064x}", size=len(data), content_type=content_type, ref_count=1)
+        blob.file.save(f"{blob.sha256}.bin", ContentFile(data))
+        return blob
+
+    def test_images_get_a_webp_thumbnail_in_a_worker_process(self):
+        blob = self._blob(png_bytes(), 'image/png')
+        message = ChatMessage.objects.create(
+            conversation=self.conversation, media_type='image', media_blob=blob, messenger_media_file=blob.file.name
+        )
+        self.assertIsNone(ChatMessageSerializer(message, context={'request': RequestFactory().get('/')}).data['thumbnail_url'])
+
+        self.assertTrue(ThumbnailService.generate(blob))
+        blob.refresh_from_db()
+        self.assertEqual(blob.thumbnail.name, f"blobs/{blob.sha256[:2]}/{blob.sha256[2:4]}/{blob.sha256}.thumb.webp")
+        with Image.open(blob.thumbnail.path) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (320, 213)))
+
+        message.refresh_from_db()
+        data = ChatMessageSerializer(message, context={'request': RequestFactory().get('/')}).data
+        self.assertEqual(data['thumbnail_url'], f"http://testserver/media/{blob.thumbnail.name}")
+        # Already rendered: nothing to do.
+        self.assertIsNone(ThumbnailService.schedule(blob))
+
+    def test_media_that_is_not_an_image_or_video_is_skipped(self):
+        self.assertIsNone(ThumbnailService.schedule(self._blob(b'%PDF-1.4', 'application/pdf')))
+        self.assertFalse(ThumbnailService.generate(self._blob(b'not an image', 'image/jpeg')))
+
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class FlakyChannelLayer:
+    def __init__(self, failing_group):
+        self.failing_group = failing_group
+        self.sent = []
+
+    async def group_send(self, group, event):
+        if group == self.failing_group:
+            raise ConnectionError("redis is down")
+        self.sent.append((group, event['n']))
+
+
+class RealtimeOutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='testpass123')
+        socialuser = SocialMediaUser.objects.create(name='Rahim', social_media_id='psid-1', platform=PLATFORM.FACEBOOK)
+        self.conversation = Conversation.objects.create(user=self.user, socialuser=socialuser)
+        self.group = f"user_{self.user.id}_chat"
+
+    def test_events_of_rolled_back_writes_are_never_sent(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                ChatMessageService.create_message(
+                    self.conversation, 'customer', media_type='image', messenger_media_url='https://cdn.example/a.jpg'
+                )
+                raise RuntimeError("rolled back")
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RealtimeEvent.objects.exists())
+
+    @override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+    def test_committed_events_are_published_after_commit(self):
+        layer = get_channel_layer()
+        async_to_sync(layer.group_add)(self.group, 'dashboard')
+        with self.captureOnCommitCallbacks() as callbacks:
+            message = ChatMessageService.create_message(
+                self.conversation, 'customer', media_type='image', messenger_media_url='https://cdn.example/a.jpg'
+            )
+            self.assertEqual(RealtimeEvent.objects.count(), 1)
+        self.assertIn(RealtimeOutbox.notify, callbacks)
+
+        self.assertEqual(RealtimeOutbox.publish_pending(), 1)
+        event = async_to_sync(layer.receive)('dashboard')
+        self.assertEqual(event['type'], 'chat.message')
+        self.assertEqual(event['message']['conversation_id'], str(self.conversation.id))
+        self.assertFalse(RealtimeEvent.objects.exists())
+        self.assertEqual(message.download_job.status, MediaDownloadJob.Status.PENDING)
+
+    def test_failed_groups_keep_their_events_in_order_and_stale_ones_expire(self):
+        for n in range(4):
+            RealtimeOutbox.record('user_1_chat' if n % 2 else 'user_2_chat', {'type': 'chat.message', 'n': n})
+        stale = RealtimeOutbox.record('user_2_chat', {'type': 'chat.message', 'n': 99})
+        RealtimeEvent.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        layer = FlakyChannelLayer(failing_group='user_1_chat')
+        self.assertEqual(RealtimeOutbox.publish_pending(layer), 2)
+        self.assertEqual(layer.sent, [('user_2_chat', 0), ('user_2_chat', 2)])
+        self.assertEqual(list(RealtimeEvent.objects.values_list('event__n', flat=True)), [1, 3])
+
+        layer.failing_group = None
+        self.assertEqual(RealtimeOutbox.publish_pending(layer), 2)
+        self.assertEqual(layer.sent[2:], [('user_1_chat', 1), ('user_1_chat', 3)])
+
+
+class RealtimeOutboxPublishersTest(TransactionTestCase):
+    @mock.patch('messaging.services.realtime_outbox.RealtimeOutbox.notify')
+    def test_a_group_held_by_another_publisher_is_left_alone(self, notify):
+        first = RealtimeOutbox.record('user_1_chat', {'type': 'chat.message', 'n': 0})
+        for n in range(1, 4):
+            RealtimeOutbox.record('user_1_chat' if n % 2 else 'user_2_chat', {'type': 'chat.message', 'n': n})
+        held, release = threading.Event(), threading.Event()
+
+        def other_publisher():
+            # Holds the first event of user_1_chat as if it were still sending it.
+            with transaction.atomic():
+                list(RealtimeEvent.objects.select_for_update().filter(pk=first.pk))
+                held.set()
+                release.wait(5)
+            connection.close()
+
+        thread = threading.Thread(target=other_publisher)
+        thread.start()
+        held.wait(5)
+        layer = FlakyChannelLayer(failing_group=None)
+        try:
+            self.assertEqual(RealtimeOutbox.publish_pending(layer), 1)
+            self.assertEqual(layer.sent, [('user_2_chat', 2)])
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(RealtimeOutbox.publish_pending(layer), 3)
+        self.assertEqual(layer.sent[1:], [('user_1_chat', 0), ('user_1_chat', 1), ('user_1_chat', 3)])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatConsumerFramesTest(SimpleTestCase):
+    group = 'user_7_chat'
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(ChatAsyncJsonWebsocketConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = SimpleNamespace(id=7, email='shop@example.com')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        handshake = await communicator.receive_json_from()
+        self.assertEqual(handshake['capabilities'], ['batch'])
+        return communicator
+
+    async def _publish(self, n):
+        await get_channel_layer().group_send(self.group, {
+            'type': 'chat.message', 'message': {'conversation_id': '1', 'message': {'text': f"m{n}"}},
+        })
+
+    async def test_events_are_sent_one_per_frame_by_default(self):
+        communicator = await self._connect()
+        await self._publish(0)
+        # Events queued before dicts were published are still understood.
+        await get_channel_layer().group_send(self.group, {
+            'type': 'chat.message', 'message': '{"conversation_id": "1", "message": {"text": "legacy"}}',
+        })
+        first, second = await communicator.receive_json_from(), await communicator.receive_json_from()
+        self.assertEqual((first['type'], first['payload']['message'], first['payload']['sequence_id']),
+                         ('new_message', {'text': 'm0'}, 1))
+        self.assertEqual(second['payload']['message'], {'text': 'legacy'})
+        await communicator.disconnect()
+
+    async def test_batching_negotiated_in_the_handshake(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'type': 'handshake', 'batch': {'max_events': 3, 'max_delay_ms': 5000}})
+        confirmed = await communicator.receive_json_from()
+        self.assertEqual(confirmed['batch'], {'max_events': 3, 'max_delay_ms': 1000})
+
+        for n in range(4):
+            await self._publish(n)
+        full = await communicator.receive_json_from()
+        self.assertEqual(full['type'], 'batch')
+        self.assertEqual([event['payload']['message']['text'] for event in full['events']], ['m0', 'm1', 'm2'])
+        self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+
+        # A reply flushes the events waiting before it.
+        await communicator.send_json_to({'type': 'heartbeat'})
+        waiting, heartbeat = await communicator.receive_json_from(), await communicator.receive_json_from()
+        self.assertEqual([event['payload']['sequence_id'] for event in waiting['events']], [4])
+        self.assertEqual(heartbeat['type'], 'heartbeat')
+
+        await communicator.send_json_to({'type': 'handshake', 'batch': {'max_events': 10, 'max_delay_ms': 20}})
+        await communicator.receive_json_from()
+        await self._publish(4)
+        await self._publish(5)
+        timed = await communicator.receive_json_from(timeout=1)
+        self.assertEqual(len(timed['events']), 2)
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, WEBSOCKET_HEARTBEAT_INTERVAL=0.05,
+                   WEBSOCKET_HEARTBEAT_TIMEOUT=0.12, WEBSOCKET_MAX_CONNECTIONS_PER_USER=2)
+class ChatConsumerHeartbeatTest(SimpleTestCase):
+    def setUp(self):
+        ConnectionRegistry._local.clear()
+
+    async def _connect(self, user_id=8):
+        communicator = WebsocketCommunicator(ChatAsyncJsonWebsocketConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = SimpleNamespace(id=user_id, email='shop@example.com')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def _close_code(self, communicator):
+        while True:
+            output = await communicator.receive_output(timeout=2)
+            if output['type'] == 'websocket.close':
+                return output.get('code')
+
+    async def test_silent_connection_is_reaped(self):
+        before = await ConnectionRegistry.metrics()
+        communicator = await self._connect()
+        self.assertEqual(await ConnectionRegistry.count(8), 1)
+
+        self.assertEqual(await self._close_code(communicator), CLOSE_CODE_HEARTBEAT_TIMEOUT)
+        self.assertEqual(await ConnectionRegistry.count(8), 0)
+        after = await ConnectionRegistry.metrics()
+        self.assertEqual(after['heartbeat_timeout_total'] - before['heartbeat_timeout_total'], 1)
+        self.assertEqual(after['open_connections'], before['open_connections'])
+        await communicator.disconnect()
+
+    async def test_pongs_keep_the_connection_open(self):
+        communicator = await self._connect()
+        await communicator.receive_json_from()  # handshake
+        pings = 0
+        while pings < 5:
+            frame = await communicator.receive_json_from(timeout=1)
+            if (frame['type'], frame.get('status')) == ('heartbeat', 'ping'):
+                pings += 1
+                await communicator.send_json_to({'type': 'heartbeat', 'status': 'pong'})
+        self.assertEqual(await ConnectionRegistry.count(8), 1)
+        await communicator.disconnect()
+        self.assertEqual(await ConnectionRegistry.count(8), 0)
+
+    @override_settings(WEBSOCKET_HEARTBEAT_INTERVAL=30, WEBSOCKET_HEARTBEAT_TIMEOUT=40)
+    async def test_connections_per_user_are_capped(self):
+        before = await ConnectionRegistry.metrics()
+        first, second = await self._connect(), await self._connect()
+        other_user = await self._connect(user_id=9)
+
+        third = await self._connect()
+        self.assertEqual(await self._close_code(third), CLOSE_CODE_TOO_MANY_CONNECTIONS)
+        metrics = await ConnectionRegistry.metrics()
+        self.assertEqual(metrics['rejected_total'] - before['rejected_total'], 1)
+        self.assertEqual(metrics['open_connections'] - before['open_connections'], 3)
+        self.assertEqual(metrics['max_connections_of_a_user'], 2)
+
+        # A closed connection frees its slot.
+        await first.disconnect()
+        fourth = await self._connect()
+        self.assertEqual((await fourth.receive_json_from())['type'], 'handshake')
+        for communicator in (second, other_user, third, fourth):
+            await communicator.disconnect()
+        self.assertEqual((await ConnectionRegistry.metrics())['open_connections'], before['open_connections'])
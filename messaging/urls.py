@@ -1,7 +1,7 @@
 from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
-from .views import ConversationViewSet, ChatMessageViewSet, send_message, AutoReplyToggleView, SocialMediaUserViewSet, media_proxy
+from .views import ConversationViewSet, ChatMessageViewSet, send_message, AutoReplyToggleView, SocialMediaUserViewSet, media_proxy, ConnectionMetricsView
 
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
@@ -17,4 +17,5 @@ urlpatterns = [
     path('webhook/messenger/', messenger_webhook, name='messenger-messaging-webhook'),
     path('webhook/whatsapp/', whatsapp_webhook, name='whatsapp-messaging-webhook'),
     path('media-proxy', media_proxy, name='media_proxy'),
+    path('websocket-metrics/', ConnectionMetricsView.as_view(), name='websocket-metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os
+import re
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+CHUNK_SIZE = 64 * 1024
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_file_response(request, path: Path, content_type: str):
+    """
+    Serve a local media file with validators, conditional requests and ranges.
+
+    The response carries an ETag (modification time and size, like nginx)
+    and Last-Modified; a matching ``If-None-Match``/``If-Modified-Since``
+    gets a 304. A single ``Range: bytes=a-b`` gets a 206 with just those
+    bytes (416 when unsatisfiable), unless ``If-Range`` no longer matches.
+    The body is streamed in ``CHUNK_SIZE`` blocks; under ASGI through an
+    async iterator, since Django buffers a sync one whole in memory there.
+
+    With ``settings.MEDIA_PROXY_SENDFILE`` set to 'x-accel-redirect' (nginx,
+    files under ``MEDIA_PROXY_ACCEL_PREFIX``) or 'x-sendfile' (Apache,
+    lighttpd) the web server sends the body and handles ranges itself.
+    """
+    stat = os.stat(path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _body_response(request, path, content_type, stat.st_size, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # A media id always names the same bytes.
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_PROXY_MAX_AGE)
+    return response
+
+
+def _body_response(request, path: Path, content_type: str, size: int, etag: str):
+    mode = settings.MEDIA_PROXY_SENDFILE
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        relative = Path(path).resolve().relative_to(Path(settings.MEDIA_ROOT).resolve())
+        response['X-Accel-Redirect'] = f"{settings.MEDIA_PROXY_ACCEL_PREFIX.rstrip('/')}/{relative.as_posix()}"
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = str(Path(path).resolve())
+        return response
+
+    byte_range = _requested_range(request, size, etag)
+    if byte_range is None and isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_aread_range(path, 0, size - 1), content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.block_size = CHUNK_SIZE
+    elif byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+    else:
+        start, end = byte_range
+        chunks = _aread_range(path, start, end) if isinstance(request, ASGIRequest) else _read_range(path, start, end)
+        response = StreamingHttpResponse(chunks, status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _requested_range(request, size: int, etag: str):
+    """(first, last) byte to send; None for the whole file; False when unsatisfiable."""
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range.strip() != etag:
+        # The client's partial copy is of another version.
+        return None
+    match = RANGE.match(header)
+    if match is None or match.groups() == ('', ''):
+        # Malformed or several ranges: ignoring the header is allowed.
+        return None
+    first, last = match.groups()
+    if first == '':
+        # The last N bytes.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path: Path, start: int, end: int):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _aread_range(path: Path, start: int, end: int):
+    # Each read runs in a thread, so the event loop never waits on the disk.
+    chunks = _read_range(path, start, end)
+    read = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await read(chunks, None)) is not None:
+            yield chunk
+    finally:
+        chunks.close()
@@ -0,0 +1,52 @@
+"""
+Thumbnail rendering, run in worker processes by messaging.services.thumbnail_service.
+
+Nothing here imports Django: the pool starts fresh interpreters, and each
+task gets file paths in and returns the encoded WebP bytes.
+"""
+import io
+import shutil
+import subprocess
+from typing import Optional
+
+WEBP_QUALITY = 80
+# Longest time spent extracting a video's first frame, in seconds.
+FFMPEG_TIMEOUT = 30
+
+
+def render_thumbnail(source_path: str, kind: str, size: int) -> Optional[bytes]:
+    """WebP thumbnail of an image, or poster of a video's first frame, at most ``size`` pixels wide and high."""
+    if kind == 'image':
+        with open(source_path, 'rb') as f:
+            return _to_webp(f, size)
+    if kind == 'video':
+        frame = _first_frame(source_path)
+        return _to_webp(io.BytesIO(frame), size) if frame else None
+    return None
+
+
+def _to_webp(source, size: int) -> bytes:
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        # draft() lets JPEG decode at a reduced scale instead of full size.
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+        return output.getvalue()
+
+
+def _first_frame(source_path: str) -> Optional[bytes]:
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        return None
+    result = subprocess.run(
+        [ffmpeg, '-nostdin', '-loglevel', 'error', '-i', source_path, '-frames:v', '1',
+         '-f', 'image2pipe', '-vcodec', 'png', '-'],
+        capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+    return result.stdout if result.returncode == 0 and result.stdout else None
@@ -2,4 +2,5 @@ from .auto_reply import AutoReplyToggleView
 from .conversation_view import ConversationViewSet, ChatMessageViewSet, send_message
 from .social_media_user_view import SocialMediaUserViewSet
 from .media_proxy_view import media_proxy
-__all__ = ['ChatMessageViewSet', 'ConversationViewSet', 'send_message', 'AutoReplyToggleView']
\ No newline at end of file
+from .connection_metrics_view import ConnectionMetricsView
+__all__ = ['ChatMessageViewSet', 'ConversationViewSet', 'send_message', 'AutoReplyToggleView', 'ConnectionMetricsView']
\ No newline at end of file
@@ -0,0 +1,14 @@
+from asgiref.sync import async_to_sync
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from account.permissions import IsAuthenticatedAndVerifiedSuperAdmin
+from messaging.services.connection_registry import ConnectionRegistry
+
+
+class ConnectionMetricsView(APIView):
+    """Chat websocket connection counts of all worker processes."""
+    permission_classes = [IsAuthenticatedAndVerifiedSuperAdmin]
+
+    def get(self, request):
+        return Response(async_to_sync(ConnectionRegistry.metrics)())
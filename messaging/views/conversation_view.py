@@ -34,7 +34,7 @@ class ConversationViewSet(viewsets.ReadOnlyModelViewSet):  # Read-only for now
 
 
 class ChatMessageViewSet(viewsets.ModelViewSet):
-    queryset = ChatMessage.objects.all()
+    queryset = ChatMessage.objects.select_related('media_blob')
     serializer_class = ChatMessageSerializer
     pagination_class = None
     permission_classes = [IsAuthenticated]
@@ -63,9 +63,9 @@ def send_message(request):
 
         
         websocket_service.message_from_outside_consumer(
-            conversation_id=conversation_id,
+            conversation=conversation,
             sender='business',
-            message=message,
+            message_text=message,
         )
 
 
@@ -1,29 +1,19 @@
-import requests
-from django.conf import settings
-from django.http import HttpResponse, HttpResponseNotFound
-from messaging.models import ChatMessage
+from django.http import HttpResponseNotFound
+from django.views.decorators.http import require_safe
+from messaging.services.whatsapp_media_cache import WhatsAppMediaCache
+from messaging.utils.media_response import media_file_response
 
+@require_safe
 def media_proxy(request):
     media_id = request.GET.get('media_id')
     if not media_id:
         return HttpResponseNotFound("Missing media_id")
 
     try:
-        # Step 1: Get media URL from API
-        url = f"https://graph.facebook.com/v23.0/{media_id}"
-        headers = {
-            "Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}"
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        media_url = response.json().get('url')
-
-        # Step 2: Download actual media
-        media_response = requests.get(media_url, headers=headers, stream=True)
-        media_response.raise_for_status()
-
-        content_type = media_response.headers.get('Content-Type', 'application/octet-stream')
-        return HttpResponse(media_response.content, content_type=content_type)
-
+        # Downloaded from the Graph API on first view (unless prefetched at ingestion), then served locally
+        path, content_type = WhatsAppMediaCache.get(media_id)
     except Exception as e:
         return HttpResponseNotFound(f"Failed to fetch media: {str(e)}")
+
+    # Streamed in chunks, with Range/206, ETag/Last-Modified/304 and optional X-Accel-Redirect/X-Sendfile
+    return media_file_response(request, path, content_type)